@@ -36,6 +36,17 @@ class Camera(halModule.HalModule):
     """
     Controller for a single camera.
     """
+    handled_messages = {"configuration",
+                        "configure1",
+                        "current parameters",
+                        "get functionality",
+                        "new parameters",
+                        "shutter clicked",
+                        "start camera",
+                        "start film",
+                        "stop camera",
+                        "stop film"}
+
     def __init__(self, module_params = None, qt_settings = None, **kwds):
         super().__init__(**kwds)
         self.film_settings = None
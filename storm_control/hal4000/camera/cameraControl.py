@@ -50,6 +50,11 @@ class CameraControl(QtCore.QThread):
         # The current frame number, this gets reset by startCamera().
         self.frame_number = 0
 
+        # Re-usable storage for the frame data. Cameras that copy the
+        # data from the camera driver should copy it into buffers from
+        # this pool rather than allocating new storage for each frame.
+        self.frame_pool = frame.FramePool(n_buffers = config.get("frame_pool_size", 100))
+
         # The camera parameters.
         self.parameters = params.StormXMLObject()
 
@@ -242,7 +247,11 @@ class CameraControl(QtCore.QThread):
         """
         Data from the camera should go through this method on it's
         way to the camera functionality object.
+
+        Once all the (directly connected) consumers have handled the
+        new frame signals we release our references to the frames.
         """
+        new_frames = []
         for frame in frames:
             if self.film_length is not None:
 
@@ -250,8 +259,13 @@ class CameraControl(QtCore.QThread):
                 # of newFrame signals.
                 if (frame.frame_number >= self.film_length):
                     break
-                
-            self.camera_functionality.newFrame.emit(frame)
+            new_frames.append(frame)
+
+        if (len(new_frames) > 0):
+            self.camera_functionality.emitFrames(new_frames)
+            
+        for frame in frames:
+            frame.release()
 
     def newParameters(self, parameters):
         """
@@ -380,6 +394,11 @@ class HWCameraControl(CameraControl):
         #       only then set self.running. Otherwise HAL might think the
         #       camera is running when it is not.
         #
+        # Cameras that copy the frames out of the driver buffers copy them
+        # into buffers from our frame pool.
+        #
+        if hasattr(self.camera, "setFramePool"):
+            self.camera.setFramePool(self.frame_pool)
         self.camera.startAcquisition()
         self.running = True
         self.thread_started = True
@@ -393,14 +412,20 @@ class HWCameraControl(CameraControl):
             # Check if we got new frame data.
             if (len(frames) > 0):
 
-                # Create frame objects.
+                # Create frame objects. If the camera gave us frame buffers
+                # the frame objects take over the references to them.
                 frame_data = []
                 for cam_frame in frames:
+                    if isinstance(cam_frame, frame.FrameBuffer):
+                        frame_buffer = cam_frame
+                    else:
+                        frame_buffer = None
                     aframe = frame.Frame(cam_frame.getData(),
                                          self.frame_number,
                                          frame_size[0],
                                          frame_size[1],
-                                         self.camera_name)
+                                         self.camera_name,
+                                         frame_buffer = frame_buffer)
                     frame_data.append(aframe)
                     self.frame_number += 1
 
@@ -24,9 +24,28 @@ class CameraFunctionality(halFunctionality.HalFunctionality):
 
     During a parameter change feed.feed and display.display disconnect
     from camera functionalities and then request new ones.
+
+    New frames are available with three different signals:
+
+      newFrame - Emitted once for each frame.
+
+      newFrames - Emitted once for each group of frames from the camera
+                  with a list of frames. Consumers that need every frame
+                  should use this at high frame rates as it is a lot less
+                  Qt signal overhead.
+
+      newLatestFrame - Emitted once for each group of frames from the
+                       camera with the most recent frame. This is for
+                       consumers such as live displays that don't need
+                       every frame.
+
+    Note that frames are only guaranteed to be valid while the signal is
+    being handled, see camera/frame.py.
     """
     emccdGain = QtCore.pyqtSignal(int)
     newFrame = QtCore.pyqtSignal(object)
+    newFrames = QtCore.pyqtSignal(list)
+    newLatestFrame = QtCore.pyqtSignal(object)
     parametersChanged = QtCore.pyqtSignal()
     shutter = QtCore.pyqtSignal(bool)
     started = QtCore.pyqtSignal()
@@ -72,6 +91,16 @@ class CameraFunctionality(halFunctionality.HalFunctionality):
         # Not used, kept because it may be useful for enforcing invalid functionalities?
         return copy.deepcopy(self)
 
+    def emitFrames(self, frames):
+        """
+        Emit all the new frame signals for a (non-empty) list of frames.
+        """
+        if (self.receivers(self.newFrame) > 0):
+            for frame in frames:
+                self.newFrame.emit(frame)
+        self.newFrames.emit(frames)
+        self.newLatestFrame.emit(frames[-1])
+
     def getCameraName(self):
         return self.camera_name
 
@@ -6,9 +6,23 @@ or the data from a feed and it's meta-information.
 Notes: 
  (1) The numpy data field (np_data) is expected to
      be of type numpy.uint16.
+
+ (2) Frames can be backed by a FrameBuffer from a FramePool. The
+     buffer is returned to the pool when the last reference to it
+     is released. Consumers that keep a frame after handling the
+     newFrame signal (the display, the spot counter, etc.) must
+     call acquire() on the frame and release() when they are done
+     with it. For frames that are not from a pool these are no-ops.
+
+ (3) The data of a feed frame may be a (non-contiguous) view of
+     the camera frame. Consumers that need C contiguous data should
+     use getDataPtr() or numpy.ascontiguousarray().
  
 Hazen 3/17
 """
+import numpy
+import threading
+
 
 class Frame(object):
     """
@@ -16,7 +30,7 @@ class Frame(object):
     and it's meta-information.
     """
 
-    def __init__(self, np_data, frame_number, image_x, image_y, which_camera):
+    def __init__(self, np_data, frame_number, image_x, image_y, which_camera, frame_buffer = None):
         """
         Create a camera frame object.
         FIXME: Are we consistent in the use of master vs. camera1?
@@ -25,8 +39,11 @@ class Frame(object):
         frame_number - The frame number of this frame.
         image_x - The size of the frame in pixels in x.
         image_y - The size of the frame in pixels in y.
+        frame_buffer - The FrameBuffer (if any) that np_data is (a view of)
+                       the storage of. The frame takes over one reference to
+                       the frame buffer.
         """
-
+        self.frame_buffer = frame_buffer
         self.image_x = image_x
         self.image_y = image_y
         self.np_data = np_data
@@ -42,10 +59,128 @@ class Frame(object):
     def getDataPtr(self):
         """
         Returns a C style pointer to the physical address of the
-        camera frame data in the computers memory.
+        camera frame data in the computers memory. The data is
+        copied first if it is not C contiguous.
+        """
+        if not self.np_data.flags["C_CONTIGUOUS"]:
+            self.np_data = numpy.ascontiguousarray(self.np_data)
+        return self.np_data.ctypes.data
+
+    def acquire(self):
+        """
+        Keep the storage of this frame from being re-used.
+        """
+        if self.frame_buffer is not None:
+            self.frame_buffer.acquire()
+
+    def release(self):
         """
+        Release a reference to the storage of this frame.
+        """
+        if self.frame_buffer is not None:
+            self.frame_buffer.release()
+
+
+class FrameBuffer(object):
+    """
+    Storage for the data of a single frame, these are created by
+    a FramePool. This has the same getData() / getDataPtr() interface
+    as the camera data objects in sc_hardware.
+    """
+    def __init__(self, frame_pool = None, generation = None, size = None, **kwds):
+        """
+        generation - The pool generation this buffer belongs to, None
+                     if the buffer should not be returned to the pool.
+        """
+        super().__init__(**kwds)
+        self.frame_pool = frame_pool
+        self.generation = generation
+        self.np_data = numpy.empty(size, dtype = numpy.uint16)
+        self.ref_count = 0
+
+    def acquire(self):
+        self.frame_pool.acquire(self)
+        
+    def getData(self):
+        return self.np_data
+
+    def getDataPtr(self):
         return self.np_data.ctypes.data
 
+    def getRefCount(self):
+        return self.ref_count
+    
+    def release(self):
+        self.frame_pool.release(self)
+
+
+class FramePool(object):
+    """
+    A pool of re-usable frame buffers. This is thread safe, the
+    buffers are typically borrowed by the camera thread and released
+    in the main thread, or in the threads of the consumers.
+
+    At most n_buffers buffers are kept in the pool. If all of them are
+    in use borrow() will still return a buffer but this buffer is not
+    returned to the pool when it is released. So a burst of frames
+    will not permanently increase the memory usage.
+    """
+    def __init__(self, n_buffers = 100, **kwds):
+        super().__init__(**kwds)
+        self.free = []
+        self.generation = 0
+        self.lock = threading.Lock()
+        self.misses = 0
+        self.n_allocated = 0
+        self.n_buffers = n_buffers
+        self.size = None
+
+    def acquire(self, frame_buffer):
+        with self.lock:
+            frame_buffer.ref_count += 1
+        
+    def borrow(self, size):
+        """
+        Returns a FrameBuffer with storage for size pixels. The caller
+        owns the (single) reference to this buffer.
+        """
+        with self.lock:
+
+            # If the frame size changed, start a new pool. Buffers of the
+            # old size that are still in use get discarded when released.
+            if (size != self.size):
+                self.free = []
+                self.generation += 1
+                self.n_allocated = 0
+                self.size = size
+
+            if (len(self.free) > 0):
+                frame_buffer = self.free.pop()
+            elif (self.n_allocated < self.n_buffers):
+                frame_buffer = FrameBuffer(frame_pool = self, generation = self.generation, size = size)
+                self.n_allocated += 1
+            else:
+                frame_buffer = FrameBuffer(frame_pool = self, size = size)
+                self.misses += 1
+            frame_buffer.ref_count = 1
+            return frame_buffer
+
+    def getFreeBuffers(self):
+        return len(self.free)
+
+    def getMisses(self):
+        """
+        Returns the number of times that the pool was empty.
+        """
+        return self.misses
+
+    def release(self, frame_buffer):
+        with self.lock:
+            frame_buffer.ref_count -= 1
+            assert (frame_buffer.ref_count >= 0), "Frame buffer released too many times."
+            if (frame_buffer.ref_count == 0) and (frame_buffer.generation == self.generation):
+                self.free.append(frame_buffer)
+
 
 #
 # The MIT License
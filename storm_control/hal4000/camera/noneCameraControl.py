@@ -150,12 +150,20 @@ class NoneCameraControl(cameraControl.CameraControl):
         self.running = True
         self.thread_started = True
         while(self.running):
-            aframe = frame.Frame(numpy.roll(self.fake_frame,
-                                            int(self.frame_number * self.parameters.get("roll"))),
+
+            # This is numpy.roll() into a frame buffer from the pool.
+            frame_buffer = self.frame_pool.borrow(self.fake_frame.size)
+            np_data = frame_buffer.getData()
+            shift = int(self.frame_number * self.parameters.get("roll")) % self.fake_frame.size
+            np_data[shift:] = self.fake_frame[:self.fake_frame.size - shift]
+            np_data[:shift] = self.fake_frame[self.fake_frame.size - shift:]
+            
+            aframe = frame.Frame(np_data,
                                  self.frame_number,
                                  self.fake_frame_size[0],
                                  self.fake_frame_size[1],
-                                 self.camera_name)
+                                 self.camera_name,
+                                 frame_buffer = frame_buffer)
             self.frame_number += 1
 
             if self.film_length is not None:
@@ -10,6 +10,7 @@ frame display. This includes:
 5. Broadcasting the current image.
 6. Handling the changing the feed.
 7. Handling information, target, and grid.
+8. Frame statistics for auto-scaling.
 
 Hazen 2/17
 """
@@ -21,10 +22,12 @@ import storm_control.sc_library.halExceptions as halExceptions
 import storm_control.sc_library.parameters as params
 
 import storm_control.hal4000.colorTables.colorTables as colorTables
+import storm_control.hal4000.display.frameStatistics as frameStatistics
 import storm_control.hal4000.halLib.halFunctionality as halFunctionality
 import storm_control.hal4000.halLib.halMessage as halMessage
 
 import storm_control.hal4000.qtWidgets.qtCameraGraphicsScene as qtCameraGraphicsScene
+import storm_control.hal4000.qtWidgets.qtCameraOpenGL as qtCameraOpenGL
 import storm_control.hal4000.qtWidgets.qtColorGradient as qtColorGradient
 import storm_control.hal4000.qtWidgets.qtRangeSlider as qtRangeSlider
 
@@ -96,7 +99,7 @@ class CameraFrameViewer(QtWidgets.QFrame):
     feedChange = QtCore.pyqtSignal(str)
     guiMessage = QtCore.pyqtSignal(object)
 
-    def __init__(self, display_name = None, feed_name = "camera1", default_colortable = None, **kwds):
+    def __init__(self, display_name = None, feed_name = "camera1", default_colortable = None, render_mode = "max", **kwds):
         super().__init__(**kwds)
 
         # General (alphabetically ordered).
@@ -111,7 +114,9 @@ class CameraFrameViewer(QtWidgets.QFrame):
         self.display_timer = QtCore.QTimer(self)
         self.filming = False
         self.frame = False
+        self.frame_statistics = frameStatistics.FrameStatistics()
         self.parameters = False
+        self.render_mode = render_mode
         self.rubber_band_rect = None
         self.show_grid = False
         self.show_info = True
@@ -137,7 +142,12 @@ class CameraFrameViewer(QtWidgets.QFrame):
         # Camera frame display.
         self.camera_view = self.ui.cameraGraphicsView
         self.camera_scene = qtCameraGraphicsScene.QtCameraGraphicsScene(parent = self)
-        self.camera_widget = qtCameraGraphicsScene.QtCameraGraphicsItem()
+        if (self.render_mode == "opengl"):
+            self.camera_widget = qtCameraOpenGL.QtCameraGLGraphicsItem()
+            self.camera_view.setViewport(QtWidgets.QOpenGLWidget())
+            self.camera_view.setViewportUpdateMode(QtWidgets.QGraphicsView.FullViewportUpdate)
+        else:
+            self.camera_widget = qtCameraGraphicsScene.QtCameraGraphicsItem(render_mode = self.render_mode)
         
         self.camera_scene.addItem(self.camera_widget)
         self.camera_view.setScene(self.camera_scene)
@@ -289,6 +299,14 @@ class CameraFrameViewer(QtWidgets.QFrame):
         """
         return self.parameters.get("feed_name")
 
+    def getFrameStatistics(self):
+        """
+        Returns a dictionary with the statistics of the current feed.
+        """
+        stats = self.frame_statistics.getStatistics()
+        stats["feed_name"] = self.getFeedName()
+        return stats
+
     def getFunctionality(self):
         """
         Returns our CameraFrameViewerFunctionality.
@@ -308,7 +326,14 @@ class CameraFrameViewer(QtWidgets.QFrame):
         return self.parameters
 
     def handleAutoScale(self, bool):
-        [scalemin, scalemax] = self.camera_widget.getAutoScale()
+        #
+        # Use percentiles of the recent frames if we have them as
+        # these are not thrown off by a few hot (or dead) pixels.
+        #
+        if (self.frame_statistics.getNFrames() > 0):
+            [scalemin, scalemax] = self.frame_statistics.getAutoScale()
+        else:
+            [scalemin, scalemax] = self.camera_widget.getAutoScale()
         if scalemin < 0:
             scalemin = 0
         if scalemax > self.getParameter("max_intensity"):
@@ -347,11 +372,11 @@ class CameraFrameViewer(QtWidgets.QFrame):
         # Disconnect current camera functionality. Anything that results
         # in a change in the camera functionality should pass through
         # this method, otherwise we can end up with multiple camera
-        # functionalities connected to handleNewFrame, which will be a
+        # functionalities connected to handleNewFrames, which will be a
         # mess..
         #
         if self.cam_fn is not None:
-            self.cam_fn.newFrame.disconnect(self.handleNewFrame)
+            self.cam_fn.newFrames.disconnect(self.handleNewFrames)
             
         self.parameters.setv("feed_name", str(feed_name))
         self.feedChange.emit(feed_name)
@@ -386,12 +411,22 @@ class CameraFrameViewer(QtWidgets.QFrame):
         self.setParameter("center_y", cy)
         self.camera_widget.setClickPos(*self.cam_fn.transformChipToFrame(cx, cy))
 
-    def handleNewFrame(self, frame):
+    def handleNewFrames(self, frames):
+        """
+        We only display the most recent frame, or the most recent frame
+        that matches the sync setting when filming. All the frames are
+        added to the frame statistics.
+        """
+        for frame in frames:
+            self.frame_statistics.addFrame(frame)
+
         if self.filming and (self.getParameter("sync") != 0):
-            if((frame.frame_number % self.cycle_length) == (self.getParameter("sync") - 1)):
-                self.frame = frame
+            for frame in reversed(frames):
+                if((frame.frame_number % self.cycle_length) == (self.getParameter("sync") - 1)):
+                    self.setFrame(frame)
+                    break
         else:
-            self.frame = frame
+            self.setFrame(frames[-1])
 
     def handleNewScale(self, scale):
         self.setParameter("scale", scale)
@@ -474,7 +509,7 @@ class CameraFrameViewer(QtWidgets.QFrame):
         # A sanity check that the old camera functionality is disconnected.
         if self.cam_fn is not None:
             try:
-                self.cam_fn.newFrame.disconnect(self.handleNewFrame)
+                self.cam_fn.newFrames.disconnect(self.handleNewFrames)
             except TypeError:
                 pass
             else:
@@ -483,7 +518,7 @@ class CameraFrameViewer(QtWidgets.QFrame):
                 
         # Connect new camera functionality.
         self.cam_fn = camera_functionality
-        self.cam_fn.newFrame.connect(self.handleNewFrame)
+        self.cam_fn.newFrames.connect(self.handleNewFrames)
 
         #
         # Add a sub-section for this camera / feed if we don't already have one.
@@ -522,6 +557,9 @@ class CameraFrameViewer(QtWidgets.QFrame):
         if need_to_initialize:
             self.createParameters(self.cam_fn, parameters_from_file)
 
+        # Reset frame statistics.
+        self.frame_statistics.reset(max_intensity = self.getParameter("max_intensity"))
+
         # Configure the QtCameraGraphicsItem.
         color_table = self.color_tables.getTableByName(self.getParameter("colortable"))
         self.camera_widget.newColorTable(color_table)
@@ -574,6 +612,16 @@ class CameraFrameViewer(QtWidgets.QFrame):
         # Switch to the correct feed.
         self.handleFeedChange(self.getFeedName())
 
+    def setFrame(self, frame):
+        """
+        We hold on to the frame until the next frame arrives, so the
+        frame storage can't be re-used until then.
+        """
+        frame.acquire()
+        if self.frame:
+            self.frame.release()
+        self.frame = frame
+
     def setParameter(self, pname, pvalue):
         """
         Wrapper to make it easier to set the appropriate parameter value.
@@ -42,6 +42,9 @@ class CameraParamsMixin(object):
     def getDefaultParameters(self):
         return self.frame_viewer.getDefaultParameters()
 
+    def getFrameStatistics(self):
+        return self.frame_viewer.getFrameStatistics()
+
     def getFunctionality(self):
         return self.frame_viewer.getFunctionality()
     
@@ -108,13 +111,14 @@ class ClassicViewer(QtCore.QObject, CameraParamsMixin):
     """
     guiMessage = QtCore.pyqtSignal(object)
 
-    def __init__(self, module_name = "", camera_name = "camera1", default_colortable = None, **kwds):
+    def __init__(self, module_name = "", camera_name = "camera1", default_colortable = None, render_mode = "max", **kwds):
         super().__init__(**kwds)
         self.module_name = module_name
 
         self.frame_viewer = cameraFrameViewer.CameraFrameViewer(display_name = self.module_name,
                                                                 feed_name = camera_name,
-                                                                default_colortable = default_colortable)
+                                                                default_colortable = default_colortable,
+                                                                render_mode = render_mode)
         self.params_viewer = paramsViewer.ParamsViewer(viewer_name = self.module_name,
                                                        viewer_ui = cameraParamsUi)
 
@@ -170,12 +174,13 @@ class FeedViewer(halDialog.HalDialog, CameraParamsMixin):
     """
     guiMessage = QtCore.pyqtSignal(object)
     
-    def __init__(self, camera_name = "camera1", default_colortable = None, **kwds):
+    def __init__(self, camera_name = "camera1", default_colortable = None, render_mode = "max", **kwds):
         super().__init__(**kwds)
 
         self.frame_viewer = cameraFrameViewer.CameraFrameViewer(display_name = self.module_name,
                                                                 feed_name = camera_name,
-                                                                default_colortable = default_colortable)
+                                                                default_colortable = default_colortable,
+                                                                render_mode = render_mode)
         self.params_viewer = None
 
         self.ui = feedViewerUi.Ui_Dialog()
@@ -195,12 +200,13 @@ class DetachedViewer(halDialog.HalDialog, CameraParamsMixin):
     """
     guiMessage = QtCore.pyqtSignal(object)
 
-    def __init__(self, camera_name = "camera1", default_colortable = None, **kwds):
+    def __init__(self, camera_name = "camera1", default_colortable = None, render_mode = "max", **kwds):
         super().__init__(**kwds)
 
         self.frame_viewer = cameraFrameViewer.CameraFrameViewer(display_name = self.module_name,
                                                                 feed_name = camera_name,
-                                                                default_colortable = default_colortable)
+                                                                default_colortable = default_colortable,
+                                                                render_mode = render_mode)
         self.params_viewer = paramsViewer.ParamsViewer(viewer_name = self.module_name,
                                                        viewer_ui = cameraParamsDetachedUi)
 
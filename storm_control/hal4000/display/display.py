@@ -17,11 +17,24 @@ import storm_control.hal4000.halLib.halDialog as halDialog
 import storm_control.hal4000.halLib.halMessage as halMessage
 import storm_control.hal4000.halLib.halModule as halModule
 
+import storm_control.hal4000.qtWidgets.qtCameraOpenGL as qtCameraOpenGL
+
 
 class Display(halModule.HalModule):
     """
     Controller for one or more displays of camera / feed data.
     """
+    handled_messages = {"configuration",
+                        "configure1",
+                        "current parameters",
+                        "get functionality",
+                        "new parameters",
+                        "show",
+                        "start",
+                        "start film",
+                        "stop film",
+                        "tcp message"}
+
     def __init__(self, module_params = None, qt_settings = None, **kwds):
         super().__init__(**kwds)
 
@@ -29,22 +42,30 @@ class Display(halModule.HalModule):
         self.is_classic = (module_params.get("ui_type") == "classic")
         self.parameters = module_params.get("parameters")
         self.qt_settings = qt_settings
+        self.render_mode = self.parameters.get("render_mode", "max")
         self.show_gui = True
         self.stage_functionality = None
         self.window_title = module_params.get("setup_name")
         
         self.viewers = []
 
+        # How to render camera frames, see QtCameraGraphicsItem.
+        if (self.render_mode == "opengl") and not qtCameraOpenGL.openGLAvailable():
+            print("OpenGL is not available, reverting to 'max' render mode.")
+            self.render_mode = "max"
+
         #
         # There is always at least one display by default.
         # This display provides a CameraFrameViewerFunctionality().
         #
         if self.is_classic:
             self.viewers.append(cameraViewers.ClassicViewer(module_name = self.getNextViewerName(),
-                                                            default_colortable = self.parameters.get("colortable")))
+                                                            default_colortable = self.parameters.get("colortable"),
+                                                            render_mode = self.render_mode))
         else:
             camera_viewer = cameraViewers.DetachedViewer(module_name = self.getNextViewerName(),
-                                                         default_colortable = self.parameters.get("colortable"))
+                                                         default_colortable = self.parameters.get("colortable"),
+                                                         render_mode = self.render_mode)
             camera_viewer.halDialogInit(self.qt_settings, self.window_title + " camera viewer")        
             self.viewers.append(camera_viewer)
         
@@ -179,6 +200,24 @@ class Display(halModule.HalModule):
                 message.addResponse(halMessage.HalMessageResponse(source = viewer.getViewerName(),
                                                                   data = {"parameters" : viewer.getParameters()}))
 
+        elif message.isType("tcp message"):
+            tcp_message = message.getData()["tcp message"]
+            if tcp_message.isType("Get Frame Statistics"):
+                display_name = tcp_message.getData("display_name", self.viewers[0].getViewerName())
+
+                viewer = None
+                for elt in self.viewers:
+                    if (elt.getViewerName() == display_name):
+                        viewer = elt
+
+                if viewer is None:
+                    tcp_message.setError(True, "Display '" + display_name + "' not found.")
+                elif not tcp_message.isTest():
+                    for key, value in viewer.getFrameStatistics().items():
+                        tcp_message.addResponse(key, value)
+                message.addResponse(halMessage.HalMessageResponse(source = self.module_name,
+                                                                  data = {"handled" : True}))
+
 #        elif message.isType("updated parameters"):
 #            for viewer in self.viewers:
 #                viewer.updatedParameters(message.getData()["parameters"])
@@ -206,7 +245,8 @@ class Display(halModule.HalModule):
         # If none exists, create a viewer of the requested type.
         if not found_existing_viewer:
             viewer = v_type(module_name = self.getNextViewerName(),
-                            default_colortable = self.parameters.get("colortable"))
+                            default_colortable = self.parameters.get("colortable"),
+                            render_mode = self.render_mode)
             viewer.halDialogInit(self.qt_settings, self.window_title + " " + v_name)
             viewer.guiMessage.connect(self.handleGuiMessage)
             if self.stage_functionality is not None:
@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+"""
+Streaming statistics of the frames from a camera / feed.
+
+A histogram is calculated from a sub-sample of the pixels in each
+frame. The low intensity bins are 1 count wide, above this the bin
+widths increase geometrically so that the relative precision of the
+percentiles is the same at all intensities.
+
+The statistics are for the sum of these histograms over a
+sliding window of the most recent frames. This is used for robust
+display auto-scaling and for remote monitoring (the 'Get Frame
+Statistics' TCP message).
+"""
+import collections
+import math
+import numpy
+
+
+class FrameStatistics(object):
+    """
+    Histogram and percentile statistics over a sliding window of frames.
+
+    n_bins - The (maximum) number of histogram bins.
+    n_pixels - The (approximate) number of pixels to sample in each frame.
+    percentiles - [low, high] percentiles to use for auto-scaling.
+    window - The number of frames in the sliding window.
+    """
+    def __init__(self, n_bins = 1024, n_pixels = 65536, percentiles = None, window = 10, **kwds):
+        super().__init__(**kwds)
+        self.n_bins = n_bins
+        self.n_pixels = n_pixels
+        self.percentiles = percentiles if percentiles is not None else [0.5, 99.5]
+        self.window = window
+        self.reset()
+
+    def addFrame(self, frame):
+        """
+        Add a frame (a camera.frame.Frame) to the statistics.
+        """
+        image = frame.getData().reshape(frame.image_y, frame.image_x)
+
+        # Sub-sample in both dimensions so that we don't alias columns.
+        step = max(1, int(math.ceil(math.sqrt(image.size/self.n_pixels))))
+        sub = image[::step,::step]
+
+        bins = self.bin_lut[numpy.minimum(sub.ravel(), self.bin_lut.size - 1)]
+        hist = numpy.bincount(bins, minlength = self.histogram.size)
+        f_stats = [hist, int(sub.sum(dtype = numpy.int64)), int(sub.min()), int(sub.max())]
+
+        # Update the sliding window.
+        self.frames.append(f_stats)
+        self.histogram += hist
+        self.total += f_stats[1]
+        if (len(self.frames) > self.window):
+            old = self.frames.popleft()
+            self.histogram -= old[0]
+            self.total -= old[1]
+
+    def getAutoScale(self):
+        """
+        Returns [low, high] percentiles of the pixel values.
+        """
+        return self.getPercentiles(self.percentiles)
+
+    def getNFrames(self):
+        return len(self.frames)
+
+    def getPercentiles(self, percentiles):
+        """
+        Returns the (approximate) pixel values at each of the percentiles.
+        These are the centers of the histogram bins that the percentiles
+        fall in.
+        """
+        cdf = numpy.cumsum(self.histogram)
+        if (cdf[-1] == 0):
+            return [0 for p in percentiles]
+
+        values = []
+        for p in percentiles:
+            index = min(int(numpy.searchsorted(cdf, 0.01 * p * cdf[-1])), self.histogram.size - 1)
+            [start, end] = self.bin_edges[index:index+2]
+            values.append(int(start + (end - start)//2))
+        return values
+
+    def getStatistics(self):
+        """
+        Returns a dictionary with the current statistics.
+        """
+        n_counts = int(numpy.sum(self.histogram))
+        stats = {"bin_edges" : self.bin_edges.tolist(),
+                 "high" : 0,
+                 "histogram" : self.histogram.tolist(),
+                 "low" : 0,
+                 "max" : 0,
+                 "mean" : 0.0,
+                 "median" : 0,
+                 "min" : 0,
+                 "n_frames" : self.getNFrames()}
+        if (n_counts > 0):
+            [low, median, high] = self.getPercentiles([self.percentiles[0], 50.0, self.percentiles[1]])
+            stats["high"] = high
+            stats["low"] = low
+            stats["max"] = max([elt[3] for elt in self.frames])
+            stats["mean"] = self.total/n_counts
+            stats["median"] = median
+            stats["min"] = min([elt[2] for elt in self.frames])
+        return stats
+
+    def reset(self, max_intensity = 65535):
+        """
+        Clear the statistics, this is called when the camera / feed changes.
+        """
+        # The first quarter of the bins are 1 count wide, the rest cover
+        # the range up to max_intensity with geometrically increasing widths.
+        if ((max_intensity + 1) <= self.n_bins):
+            self.bin_edges = numpy.arange(max_intensity + 2)
+        else:
+            n_linear = self.n_bins//4
+            geometric = numpy.geomspace(n_linear, max_intensity + 1, self.n_bins - n_linear + 1)
+            self.bin_edges = numpy.unique(numpy.concatenate((numpy.arange(n_linear),
+                                                             numpy.round(geometric).astype(numpy.int64))))
+
+        # Look up table from pixel value to bin.
+        self.bin_lut = numpy.searchsorted(self.bin_edges, numpy.arange(max_intensity + 1), side = "right") - 1
+
+        self.frames = collections.deque()
+        self.histogram = numpy.zeros(self.bin_edges.size - 1, dtype = numpy.int64)
+        self.total = 0
+
+
+#
+# The MIT License
+#
+# Copyright (c) 2026 Babcock Lab, Harvard University
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
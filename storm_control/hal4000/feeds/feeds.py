@@ -1,18 +1,24 @@
 #!/usr/bin/env python
 """
 This module enables the processing of camera frame(s) with
-operations like averaging, slicing, etc..
+operations like averaging, slicing, background subtraction, etc..
 
 It is also responsible for keeping tracking of how many
 different cameras / feeds are available for each parameter
 file, whether the cameras / feeds should be saved when
 filming and what extension to use when saving.
 
+The feeds that are driven by the same camera are processed
+together, in parallel using a pool of worker threads. The feed
+frames are then emitted in the main thread.
+
 Hazen 03/17
 """
 
+import concurrent.futures
 import copy
 import numpy
+import os
 
 from PyQt5 import QtCore
 
@@ -25,6 +31,13 @@ import storm_control.hal4000.halLib.halMessage as halMessage
 import storm_control.hal4000.halLib.halModule as halModule
 
 
+# The maximum number of threads to use to process feeds.
+n_threads = min(4, os.cpu_count() or 1)
+
+# This is created the first time that it is needed.
+thread_pool = None
+
+
 def checkParameters(parameters):
     """
     Checks parameters to verify that there won't be any errors
@@ -60,6 +73,88 @@ class FeedException(halExceptions.HalException):
     pass
 
 
+class SortedWindow(object):
+    """
+    The values of each pixel in the last n_frames frames, sorted. This
+    is used for rolling median, minimum and maximum feeds.
+
+    When the window is full each new frame replaces the oldest frame
+    by removing the old value from each sorted column and inserting
+    the new value. This is O(n_frames) per pixel rather than the
+    O(n_frames * log(n_frames)) of sorting the window again.
+    """
+    def __init__(self, n_frames = None, n_pixels = None, **kwds):
+        super().__init__(**kwds)
+        self.index = 0
+        self.n = 0
+        self.n_frames = n_frames
+        self.n_pixels = n_pixels
+
+        # The frames in the window in the order that they were added.
+        self.ring = numpy.zeros((n_frames, n_pixels), dtype = numpy.uint16)
+
+        # The frames in the window, sorted for each pixel.
+        self.sorted = numpy.zeros((n_frames, n_pixels), dtype = numpy.uint16)
+
+    def addFrame(self, data):
+        """
+        Add a frame to the window, this replaces the oldest frame
+        if the window is full.
+        """
+        data = data.ravel()
+
+        # Sort the window while it is filling up.
+        if (self.n < self.n_frames):
+            self.ring[self.n,:] = data
+            self.n += 1
+            self.sorted[:self.n,:] = numpy.sort(self.ring[:self.n,:], axis = 0)
+
+        else:
+            old = self.ring[self.index,:].copy()
+            self.ring[self.index,:] = data
+
+            # The row of the old value and the row that the new value
+            # will be in once the old value has been removed.
+            i_old = numpy.argmax(self.sorted == old, axis = 0)
+            i_new = numpy.sum(self.sorted < data, axis = 0) - (old < data)
+
+            # Shift the values between these rows by one.
+            for i in range(self.n_frames - 1):
+                numpy.copyto(self.sorted[i,:], self.sorted[i+1,:],
+                             where = (i_old <= i) & (i < i_new))
+            for i in range(self.n_frames - 1, 0, -1):
+                numpy.copyto(self.sorted[i,:], self.sorted[i-1,:],
+                             where = (i_new < i) & (i <= i_old))
+            self.sorted[i_new, numpy.arange(self.n_pixels)] = data
+
+        self.index = (self.index + 1) % self.n_frames
+
+    def getMaximum(self):
+        return self.sorted[self.n-1,:]
+
+    def getMedian(self, out = None):
+        """
+        Returns the median (rounded down) of each pixel.
+        """
+        if out is None:
+            out = numpy.zeros(self.n_pixels, dtype = numpy.uint16)
+        lower = self.sorted[(self.n-1)//2,:]
+        upper = self.sorted[self.n//2,:]
+
+        # (lower + upper)/2 without overflow.
+        numpy.subtract(upper, lower, out = out)
+        numpy.right_shift(out, 1, out = out)
+        numpy.add(out, lower, out = out)
+        return out
+
+    def getMinimum(self):
+        return self.sorted[0,:]
+
+    def reset(self):
+        self.index = 0
+        self.n = 0
+
+
 class FeedFunctionality(cameraFunctionality.CameraFunctionality):
     """
     Feed functionality in a form that other modules can interact with. These have
@@ -76,6 +171,7 @@ class FeedFunctionality(cameraFunctionality.CameraFunctionality):
         self.cam_fn = None
         self.feed_name = feed_name
         self.feed_parameters = self.parameters
+        self.feed_frames = []
         self.frame_number = 0
         self.frame_slice = None
         self.number_connections = 0
@@ -95,8 +191,8 @@ class FeedFunctionality(cameraFunctionality.CameraFunctionality):
         # sanity check.
         assert(self.number_connections == 0)
         self.number_connections += 1
-        
-        self.cam_fn.newFrame.connect(self.handleNewFrame)
+
+        # Note that FeedController handles the newFrames signal.
         self.cam_fn.started.connect(self.handleStarted)
         self.cam_fn.stopped.connect(self.handleStopped)
 
@@ -109,7 +205,6 @@ class FeedFunctionality(cameraFunctionality.CameraFunctionality):
         self.number_connections += 1
         
         if self.cam_fn is not None:
-            self.cam_fn.newFrame.disconnect(self.handleNewFrame)
             self.cam_fn.started.disconnect(self.handleStarted)
             self.cam_fn.stopped.disconnect(self.handleStopped)
 
@@ -125,13 +220,40 @@ class FeedFunctionality(cameraFunctionality.CameraFunctionality):
         """
         return self.feed_name
 
-    def handleNewFrame(self, new_frame):
-        sliced_data = self.sliceFrame(new_frame)
-        self.newFrame.emit(frame.Frame(sliced_data,
-                                       new_frame.frame_number,
-                                       self.x_pixels,
-                                       self.y_pixels,
-                                       self.camera_name))
+    def getSliceKey(self):
+        """
+        Feeds with the same slice key can share sliced frames.
+        """
+        if self.frame_slice is None:
+            return None
+        else:
+            return (self.frame_slice[0].start, self.frame_slice[0].stop,
+                    self.frame_slice[1].start, self.frame_slice[1].stop)
+
+    def emitFeedFrames(self):
+        """
+        Emit the feed frames created by processFrames() as a group. This
+        must be called in the main thread.
+        """
+        if (len(self.feed_frames) > 0):
+            self.emitFrames(self.feed_frames)
+            for feed_frame in self.feed_frames:
+                feed_frame.release()
+            self.feed_frames = []
+        
+    def handleNewFrame(self, new_frame, sliced_data):
+        """
+        Sub-classes should override this. sliced_data is the
+        result of sliceFrame(new_frame).
+        """
+        self.emitFrame(new_frame, sliced_data, new_frame.frame_number)
+
+    def handleNewFrames(self, new_frames):
+        """
+        Process and emit new_frames without a FeedController.
+        """
+        self.processFrames(new_frames, [self.sliceFrame(elt) for elt in new_frames])
+        self.emitFeedFrames()
 
     def handleStarted(self):
         self.started.emit()
@@ -160,6 +282,16 @@ class FeedFunctionality(cameraFunctionality.CameraFunctionality):
     def isMaster(self):
         return False
 
+    def processFrames(self, new_frames, sliced_frames):
+        """
+        Create the feed frames for a group of frames. This is called by
+        the worker threads of the FeedController so it should not do
+        anything with Qt.
+        """
+        self.feed_frames = []
+        for i, new_frame in enumerate(new_frames):
+            self.handleNewFrame(new_frame, sliced_frames[i])
+
     def reset(self):
         self.frame_number = 0
 
@@ -224,17 +356,38 @@ class FeedFunctionality(cameraFunctionality.CameraFunctionality):
         # these through.
         self.connectCameraFunctionality()
 
+    def emitFrame(self, new_frame, sliced_data, frame_number, frame_buffer = None):
+        """
+        Add a feed frame whose data is sliced_data to the feed frames
+        that will be emitted. If sliced_data is (a view of) the storage
+        of new_frame then the feed frame shares the storage of new_frame.
+
+        frame_buffer - (optional) The frame buffer that sliced_data is the
+                       storage of, the feed frame takes over the reference.
+        """
+        if numpy.may_share_memory(sliced_data, new_frame.np_data):
+            frame_buffer = new_frame.frame_buffer
+            new_frame.acquire()
+        self.feed_frames.append(frame.Frame(sliced_data,
+                                            frame_number,
+                                            self.x_pixels,
+                                            self.y_pixels,
+                                            self.camera_name,
+                                            frame_buffer = frame_buffer))
+            
     def sliceFrame(self, new_frame):
         """
         Slices out a part of the frame based on self.frame_slice.
+
+        This is a view of the frame data, it is only copied if a
+        consumer of the feed needs contiguous data, see camera/frame.py.
         """
         if self.frame_slice is None:
             return new_frame.np_data
         else:
             w = new_frame.image_x
             h = new_frame.image_y
-            sliced_frame = numpy.reshape(new_frame.np_data, (h,w))[self.frame_slice]
-            return numpy.ascontiguousarray(sliced_frame)
+            return numpy.reshape(new_frame.np_data, (h,w))[self.frame_slice]
 
     def toggleShutter(self):
         assert False
@@ -249,31 +402,32 @@ class FeedFunctionalityAverage(FeedFunctionality):
 
         self.average_frame = None
         self.counts = 0
+        self.frame_pool = frame.FramePool(n_buffers = 10)
         self.frames_to_average = self.parameters.get("frames_to_average")
 
-    def handleNewFrame(self, new_frame):
-        sliced_data = self.sliceFrame(new_frame)
+    def handleNewFrame(self, new_frame, sliced_data):
 
-        if self.average_frame is None:
-            self.average_frame = sliced_data.astype(numpy.uint32)
-        else:
-            self.average_frame += sliced_data
+        # The accumulator is only re-allocated if the frame size changes.
+        if (self.average_frame is None) or (self.average_frame.shape != sliced_data.shape):
+            self.average_frame = numpy.zeros(sliced_data.shape, dtype = numpy.uint32)
+            self.counts = 0
+        numpy.add(self.average_frame, sliced_data, out = self.average_frame)
         self.counts += 1
 
         if (self.counts == self.frames_to_average):
-            average_frame = self.average_frame/self.frames_to_average
-            self.newFrame.emit(frame.Frame(average_frame.astype(numpy.uint16),
-                                           self.frame_number,
-                                           self.x_pixels,
-                                           self.y_pixels,
-                                           self.camera_name))
-            self.average_frame = None
+            numpy.floor_divide(self.average_frame, self.frames_to_average, out = self.average_frame)
+            frame_buffer = self.frame_pool.borrow(self.average_frame.size)
+            average_data = frame_buffer.getData()
+            average_data[:] = self.average_frame.ravel()
+            self.emitFrame(new_frame, average_data, self.frame_number, frame_buffer = frame_buffer)
+            self.average_frame.fill(0)
             self.counts = 0
             self.frame_number += 1
 
     def reset(self):
         super().reset()
-        self.average_frame = None
+        if self.average_frame is not None:
+            self.average_frame.fill(0)
         self.counts = 0
         
     
@@ -288,24 +442,134 @@ class FeedFunctionalityInterval(FeedFunctionality):
         self.capture_frames = list(map(int, temp.split(",")))
         self.cycle_length = self.parameters.get("cycle_length")
 
-    def handleNewFrame(self, new_frame):
-        sliced_data = self.sliceFrame(new_frame)
-        
+    def handleNewFrame(self, new_frame, sliced_data):
         if (new_frame.frame_number % self.cycle_length) in self.capture_frames:
-            self.newFrame.emit(frame.Frame(sliced_data,
-                                           self.frame_number,
-                                           self.x_pixels,
-                                           self.y_pixels,
-                                           self.camera_name))
+            self.emitFrame(new_frame, sliced_data, self.frame_number)
             self.frame_number += 1
 
 
+class FeedFunctionalityRolling(FeedFunctionality):
+    """
+    Base class for feeds that use the last window_size frames.
+    """
+    def __init__(self, **kwds):
+        super().__init__(**kwds)
+
+        self.frame_pool = frame.FramePool(n_buffers = 10)
+        self.sorted_window = None
+        self.window_size = self.parameters.get("window_size")
+
+    def handleNewFrame(self, new_frame, sliced_data):
+        data = sliced_data.ravel()
+
+        # The window is only re-allocated if the frame size changes.
+        if (self.sorted_window is None) or (self.sorted_window.n_pixels != data.size):
+            self.sorted_window = SortedWindow(n_frames = self.window_size,
+                                              n_pixels = data.size)
+        self.sorted_window.addFrame(data)
+
+        frame_buffer = self.frame_pool.borrow(data.size)
+        self.rollingFrame(data, frame_buffer.getData())
+        self.emitFrame(new_frame, frame_buffer.getData(), new_frame.frame_number, frame_buffer = frame_buffer)
+
+    def reset(self):
+        super().reset()
+        if self.sorted_window is not None:
+            self.sorted_window.reset()
+
+    def rollingFrame(self, data, out):
+        """
+        Sub-classes should override this to calculate the feed frame
+        from data (the current frame) and self.sorted_window.
+        """
+        assert False
+
+
+class FeedFunctionalityBackground(FeedFunctionalityRolling):
+    """
+    The feed functionality for subtracting a rolling median or
+    minimum background.
+    """
+    def __init__(self, **kwds):
+        super().__init__(**kwds)
+        self.background = self.parameters.get("background")
+
+    def rollingFrame(self, data, out):
+        if (self.background == "median"):
+            background = self.sorted_window.getMedian(out = out)
+        else:
+            background = self.sorted_window.getMinimum()
+
+        # max(data, background) - background, this also works when
+        # background is out.
+        numpy.subtract(numpy.maximum(data, background), background, out = out)
+
+
+class FeedFunctionalityMaxProjection(FeedFunctionalityRolling):
+    """
+    The feed functionality for the rolling maximum intensity projection.
+    """
+    def rollingFrame(self, data, out):
+        out[:] = self.sorted_window.getMaximum()
+
+
 class FeedFunctionalitySlice(FeedFunctionality):
     """
     The feed functionality for slicing out sub-sets of frames.
     """
     pass
 
+
+
+class FeedSource(object):
+    """
+    All the feeds that are driven by a single camera. The frames
+    from the camera are sliced once for all of the feeds that have
+    the same ROI, then the feeds process the frames in parallel.
+    """
+    def __init__(self, cam_fn = None, **kwds):
+        super().__init__(**kwds)
+        self.cam_fn = cam_fn
+        self.feeds = []
+
+        self.cam_fn.newFrames.connect(self.handleNewFrames)
+
+    def addFeed(self, feed):
+        self.feeds.append(feed)
+
+    def disconnect(self):
+        self.cam_fn.newFrames.disconnect(self.handleNewFrames)
+
+    def handleNewFrames(self, new_frames):
+        global thread_pool
+
+        # Slice the frames for each of the different ROIs.
+        sliced = {}
+        for feed in self.feeds:
+            key = feed.getSliceKey()
+            if not key in sliced:
+                sliced[key] = [feed.sliceFrame(elt) for elt in new_frames]
+
+        # Process the frames.
+        if (len(self.feeds) > 1) and (n_threads > 1):
+            if thread_pool is None:
+                thread_pool = concurrent.futures.ThreadPoolExecutor(max_workers = n_threads)
+
+            futures = []
+            for feed in self.feeds:
+                futures.append(thread_pool.submit(feed.processFrames, new_frames, sliced[feed.getSliceKey()]))
+
+            # This will also raise any exceptions from the worker threads.
+            for future in futures:
+                future.result()
+        else:
+            for feed in self.feeds:
+                feed.processFrames(new_frames, sliced[feed.getSliceKey()])
+
+        # Emit the feed frames (in the main thread).
+        for feed in self.feeds:
+            feed.emitFeedFrames()
+
         
 class FeedController(object):
     """
@@ -318,6 +582,7 @@ class FeedController(object):
         super().__init__(**kwds)
 
         self.feeds = {}
+        self.feed_sources = {}
         if parameters is None:
             return
 
@@ -392,6 +657,25 @@ class FeedController(object):
                                                        name = "capture_frames",
                                                        value = "1"))
 
+            elif (feed_type == "background"):
+                fclass = FeedFunctionalityBackground
+
+                feed_params.add(params.ParameterSetString(description = "Background type.",
+                                                          name = "background",
+                                                          value = "median",
+                                                          allowed = ["median", "minimum"]))
+
+                feed_params.add(params.ParameterInt(description = "Number of frames in the background window.",
+                                                    name = "window_size",
+                                                    value = 10))
+
+            elif (feed_type == "max_projection"):
+                fclass = FeedFunctionalityMaxProjection
+
+                feed_params.add(params.ParameterInt(description = "Number of frames in the projection window.",
+                                                    name = "window_size",
+                                                    value = 10))
+
             elif (feed_type == "slice"):
                 fclass = FeedFunctionalitySlice
             else:
@@ -423,6 +707,10 @@ class FeedController(object):
         """
         Disconnect the feeds from their camera functionalities.
         """
+        for feed_source in self.feed_sources.values():
+            feed_source.disconnect()
+        self.feed_sources = {}
+        
         for feed in self.getFeeds():
             feed.disconnectCameraFunctionality()
 
@@ -441,12 +729,33 @@ class FeedController(object):
     def resetFeeds(self):
         for feed in self.getFeeds():
             feed.reset()
+
+    def setCameraFunctionality(self, feed_name, camera_functionality):
+        """
+        Set the camera functionality of a feed and add the feed to the
+        feeds that this camera drives.
+        """
+        feed = self.feeds[feed_name]
+        feed.setCameraFunctionality(camera_functionality)
+
+        cam_name = camera_functionality.getCameraName()
+        if not cam_name in self.feed_sources:
+            self.feed_sources[cam_name] = FeedSource(cam_fn = camera_functionality)
+        self.feed_sources[cam_name].addFeed(feed)
             
 
 class Feeds(halModule.HalModule):
     """
     Feeds controller.
     """
+    handled_messages = {"configure1",
+                        "get feed names",
+                        "get functionality",
+                        "new parameters",
+                        "start film",
+                        "stop film",
+                        "updated parameters"}
+
     def __init__(self, module_params = None, qt_settings = None, **kwds):
         super().__init__(**kwds)
         self.camera_names = []
@@ -474,8 +783,8 @@ class Feeds(halModule.HalModule):
 
     def handleResponse(self, message, response):
         if message.isType("get functionality"):
-            feed = self.feed_controller.getFeed(message.getData()["extra data"])
-            feed.setCameraFunctionality(response.getData()["functionality"])
+            self.feed_controller.setCameraFunctionality(message.getData()["extra data"],
+                                                        response.getData()["functionality"])
 
         #
         # If we have camera functionality for all the feeds then it is safe to
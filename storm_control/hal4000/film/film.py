@@ -84,6 +84,12 @@ class FilmBox(QtWidgets.QGroupBox):
                                                        name = "want_bell",
                                                        value = True))
 
+        self.parameters.add(params.ParameterRangeInt(description = "Number of frame buffers for the writer thread (0 = no thread)",
+                                                     name = "writer_buffers",
+                                                     value = 0,
+                                                     min_value = 0,
+                                                     max_value = 100000))
+
         # Initial UI configuration.
         self.ui = filmUi.Ui_GroupBox()
         self.ui.setupUi(self)
@@ -145,7 +151,8 @@ class FilmBox(QtWidgets.QGroupBox):
                                              film_length = film_request.getFrames(),
                                              overwrite = film_request.overwriteOk(),
                                              run_shutters = self.ui.autoShuttersCheckBox.isChecked(),
-                                             tcp_request = True)
+                                             tcp_request = True,
+                                             writer_buffers = self.parameters.get("writer_buffers"))
 
         else:
             reply = QtWidgets.QMessageBox.Yes
@@ -171,7 +178,8 @@ class FilmBox(QtWidgets.QGroupBox):
                                              filetype = self.parameters.get("filetype"),
                                              film_length = self.parameters.get("frames"),
                                              run_shutters = self.ui.autoShuttersCheckBox.isChecked(),
-                                             save_film = self.ui.saveMovieCheckBox.isChecked())
+                                             save_film = self.ui.saveMovieCheckBox.isChecked(),
+                                             writer_buffers = self.parameters.get("writer_buffers"))
 
     def getParameters(self):
         return self.parameters.copy()
@@ -235,6 +243,7 @@ class FilmBox(QtWidgets.QGroupBox):
         self.ui.filenameEdit.setText(parameters.get("filename"))
         self.ui.filetypeComboBox.setCurrentIndex(self.ui.filetypeComboBox.findText(parameters.get("filetype")))
         self.ui.lengthSpinBox.setValue(parameters.get("frames"))
+        self.parameters.setv("writer_buffers", parameters.get("writer_buffers"))
         
         if (parameters.get("acq_mode") == "run_till_abort"):
             self.ui.modeComboBox.setCurrentIndex(0)
@@ -283,11 +292,21 @@ class FilmBox(QtWidgets.QGroupBox):
     def updateFrames(self, new_number):
         self.ui.framesText.setText(str(new_number))
 
-    def updateSize(self, new_size):
+    def updateSize(self, new_size, throughput = None):
         if (new_size < 1000.0):
-            self.ui.sizeText.setText("{0:.1f} MB".format(new_size))
+            text = "{0:.1f} MB".format(new_size)
+        else:
+            text = "{0:.1f} GB".format(new_size * 0.00097656)
+        if throughput is not None:
+            text += " ({0:.1f} MB/s)".format(throughput)
+        self.ui.sizeText.setText(text)
+
+    def updateWriterStatus(self, queue_depth, dropped_frames):
+        self.ui.sizeText.setToolTip("{0:d} frames queued, {1:d} frames dropped".format(queue_depth, dropped_frames))
+        if (dropped_frames > 0):
+            self.ui.sizeText.setStyleSheet("QLabel { color: red}")
         else:
-            self.ui.sizeText.setText("{0:.1f} GB".format(new_size * 0.00097656))
+            self.ui.sizeText.setStyleSheet("QLabel { color: black}")
 
 
 class Film(halModule.HalModule):
@@ -326,6 +345,23 @@ class Film(halModule.HalModule):
     It is this complicated because we also allow 'Fixed Length' films whose
     length is set by a feed rather than directly by a camera.
     """
+    handled_messages = {"change directory",
+                        "configuration",
+                        "configure1",
+                        "current parameters",
+                        "live mode",
+                        "new parameters",
+                        "new shutters file",
+                        "ready to film",
+                        "start",
+                        "start camera",
+                        "start film request",
+                        "stop camera",
+                        "stop film",
+                        "stop film request",
+                        "updated parameters",
+                        "wait for"}
+
     def __init__(self, module_params = None, qt_settings = None, **kwds):
         super().__init__(**kwds)
 
@@ -334,6 +370,7 @@ class Film(halModule.HalModule):
         self.feed_names = None
         self.film_settings = None
         self.film_state = "idle"
+        self.frame_metadata = {}
         self.locked_out = False
         self.number_frames = 0
         self.number_fn_requested = 0
@@ -435,21 +472,44 @@ class Film(halModule.HalModule):
         self.sendMessage(halMessage.HalMessage(m_type = "live mode",
                                                data = {"live mode" : state}))
 
-    def handleNewFrame(self, frame_number):
-        self.number_frames = frame_number + 1
+    def handleNewFrames(self, frame_numbers):
+        self.number_frames = frame_numbers[-1] + 1
 
         # Update display of the number of frames.
         self.view.updateFrames(self.number_frames)
 
-        # Update display of the (total) storage used.
+        # Update display of the (total) storage used. If the writers are
+        # using writer threads this also includes the achieved throughput.
+        dropped_frames = 0
+        queue_depth = 0
+        throughput = None
         total_size = 0.0
         for writer in self.writers:
             total_size += writer.getSize()
-        self.view.updateSize(total_size)
+            if writer.getThroughput() is not None:
+                if throughput is None:
+                    throughput = 0.0
+                throughput += writer.getThroughput()
+                dropped_frames += writer.getDroppedFrames()
+                queue_depth = max(queue_depth, writer.getQueueDepth())
+        self.view.updateSize(total_size, throughput = throughput)
+        if throughput is not None:
+            self.view.updateWriterStatus(queue_depth, dropped_frames)
         
     def handleResponses(self, message):
 
         if message.isType("get functionality"):
+
+            if (message.getData().get("extra data") == "qpd_fn"):
+                for response in message.getResponses():
+                    response.getData()["functionality"].qpdUpdate.connect(self.handleQPDUpdate)
+                return
+
+            elif (message.getData().get("extra data") == "stage_fn"):
+                for response in message.getResponses():
+                    response.getData()["functionality"].stagePosition.connect(self.handleStagePosition)
+                return
+                
             assert (len(message.getResponses()) == 1)
             for response in message.getResponses():
                 self.camera_functionalities.append(response.getData()["functionality"])
@@ -511,6 +571,13 @@ class Film(halModule.HalModule):
             # Now that everything is complete end the filming lock out.
             self.setLockout(False, acquisition_parameters = acq_p)
 
+    def handleQPDUpdate(self, qpd_dict):
+        self.frame_metadata["lock_offset"] = qpd_dict["offset"]
+
+    def handleStagePosition(self, pos_dict):
+        self.frame_metadata["stage_x"] = pos_dict["x"]
+        self.frame_metadata["stage_y"] = pos_dict["y"]
+        
     def handleStopCamera(self):
         self.active_cameras -= 1
         if (self.active_cameras == 0):
@@ -537,17 +604,31 @@ class Film(halModule.HalModule):
                 if "shutters filename" in properties:
                     self.view.setShutters(properties["shutters filename"])
 
+            elif message.sourceIs("focuslock"):
+                # The QPD and stage functionalities are used for the per-frame
+                # metadata of the file formats that save it.
+                qpd_fn_name = message.getData()["properties"]["qpd functionality name"]
+                self.sendMessage(halMessage.HalMessage(m_type = "get functionality",
+                                                       data = {"name" : qpd_fn_name,
+                                                               "extra data" : "qpd_fn"}))
+
             elif message.sourceIs("mosaic"):
                 # We need to keep track of the current value so that
                 # we can save this in the tif images / stacks.
                 self.pixel_size = message.getData()["properties"]["pixel_size"]
+
+            elif message.sourceIs("stage"):
+                stage_fn_name = message.getData()["properties"]["stage functionality name"]
+                self.sendMessage(halMessage.HalMessage(m_type = "get functionality",
+                                                       data = {"name" : stage_fn_name,
+                                                               "extra data" : "stage_fn"}))
                     
             elif message.sourceIs("timing"):
                 # We'll get this message from timing.timing, the part we are interested in is
                 # the timing functionality which we will use both to update the frame counter
                 # and to know when a fixed length film is complete.
                 self.timing_functionality = message.getData()["properties"]["functionality"]
-                self.timing_functionality.newFrame.connect(self.handleNewFrame)
+                self.timing_functionality.newFrames.connect(self.handleNewFrames)
                 self.timing_functionality.stopped.connect(self.stopFilmingLevel1)
 
         elif message.isType("configure1"):
@@ -694,9 +775,12 @@ class Film(halModule.HalModule):
         if self.film_settings.isSaved():
             for camera in self.camera_functionalities:
                 if camera.getParameter("saved"):
-                    self.writers.append(imagewriters.createFileWriter(camera, self.film_settings))
+                    self.writers.append(imagewriters.createFileWriter(camera,
+                                                                      self.film_settings,
+                                                                      frame_metadata = self.frame_metadata))
         if (len(self.writers) == 0):
             self.view.updateSize(0.0)
+        self.view.updateWriterStatus(0, 0)
         
         # Start filming.
         self.waiting_on = copy.copy(self.wait_for)
@@ -736,7 +820,7 @@ class Film(halModule.HalModule):
         # reference to the timing functionality. The actual cleanup of this
         # object is handled by timing.timing.
         #
-        self.timing_functionality.newFrame.disconnect(self.handleNewFrame)
+        self.timing_functionality.newFrames.disconnect(self.handleNewFrames)
         self.timing_functionality.stopped.disconnect(self.stopFilmingLevel1)
         self.timing_functionality = None
 
@@ -762,6 +846,9 @@ class Film(halModule.HalModule):
         # Close writers.
         for writer in self.writers:
             writer.closeWriter()
+            if writer.getWriteError() is not None:
+                halMessageBox.halMessageBoxInfo("Not all the frames were saved in " + writer.filename + ", " + str(writer.getWriteError()),
+                                                is_error = True)
 
         # Enable the UI.
         self.view.enableUI(True)
@@ -17,6 +17,7 @@ class FilmSettings(object):
                  run_shutters = False,
                  save_film = True,
                  tcp_request = False,
+                 writer_buffers = 0,
                  **kwds):
     
         super().__init__(**kwds)
@@ -29,6 +30,7 @@ class FilmSettings(object):
         assert(isinstance(run_shutters, bool))
         assert(isinstance(save_film, bool))
         assert(isinstance(tcp_request, bool))
+        assert(isinstance(writer_buffers, int))
 
         # Either "run_till_abort" or "fixed_length"
         self.acq_mode = acq_mode
@@ -46,6 +48,9 @@ class FilmSettings(object):
         # and the file already exists HAL is expected to crash.
         self.overwrite = overwrite
         
+        # The pixel size in microns.
+        self.pixel_size = pixel_size
+        
         # Whether or not to run the shutters.
         self.run_shutters = run_shutters
 
@@ -55,6 +60,10 @@ class FilmSettings(object):
         # Whether the film request came from the record button or TCP.
         self.tcp_request = tcp_request
 
+        # The number of frame buffers to use for the image writer thread. If
+        # this is zero the frames are saved in the main thread.
+        self.writer_buffers = writer_buffers
+
     def getBasename(self):
         return self.basename
 
@@ -66,6 +75,9 @@ class FilmSettings(object):
 
     def getPixelSize(self):
         return self.pixel_size
+
+    def getWriterBuffers(self):
+        return self.writer_buffers
     
     def isFixedLength(self):
         return (self.acq_mode == "fixed_length")
@@ -211,6 +211,17 @@ class FocusLockView(halDialog.HalDialog):
 
         
 class FocusLock(halModule.HalModule):
+    handled_messages = {"configuration",
+                        "configure1",
+                        "configure2",
+                        "lock jump",
+                        "new parameters",
+                        "show",
+                        "start",
+                        "start film",
+                        "stop film",
+                        "tcp message"}
+
 
     def __init__(self, module_params = None, qt_settings = None, **kwds):
         super().__init__(**kwds)
@@ -236,6 +247,7 @@ class FocusLock(halModule.HalModule):
                                            "resp" : None})
         
     def cleanUp(self, qt_settings):
+        self.control.cleanUp()
         self.view.cleanUp(qt_settings)
 
     def handleControlMessage(self, message):
@@ -16,7 +16,7 @@ import storm_control.c_libraries.loadclib as loadclib
 focus_quality = loadclib.loadCLibrary("focus_quality")
 
 c_imageGradient = focus_quality.imageGradient
-c_imageGradient.argtypes = [ndpointer(dtype=numpy.uint16),
+c_imageGradient.argtypes = [ndpointer(dtype=numpy.uint16, flags="C_CONTIGUOUS"),
                             ctypes.c_int,
                             ctypes.c_int]
 c_imageGradient.restype = ctypes.c_float
@@ -26,7 +26,8 @@ def imageGradient(frame):
     """
     Returns the magnitude of the image gradient in the x direction.
     """
-    return c_imageGradient(frame.getData(),
+    # The data of a feed frame may not be contiguous.
+    return c_imageGradient(numpy.ascontiguousarray(frame.getData()),
                            frame.image_x,
                            frame.image_y)
 
@@ -6,10 +6,13 @@ position if the focus lock is locked, etc.
 Hazen 04/17
 """
 
+import threading
+
 from PyQt5 import QtCore
-import tifffile
 
+import storm_control.hal4000.focusLock.offsetRecorder as offsetRecorder
 import storm_control.hal4000.halLib.halMessage as halMessage
+import storm_control.hal4000.halLib.imagewriters as imagewriters
 
 
 class LockControl(QtCore.QObject):
@@ -18,23 +21,28 @@ class LockControl(QtCore.QObject):
     def __init__(self, configuration = None, **kwds):
         super().__init__(**kwds)
         self.current_state = None
+        self.export_thread = None
         self.lock_mode = None
-        self.offset_fp = None
+        self.offset_recorder = None
         self.qpd_functionality = None
         self.timing_functionality = None
         self.working = False
         self.z_stage_functionality = None
 
-        # These are used for diagnostics.
+        # In diagnostics mode the QPD camera images are also saved.
         self.diagnostics_mode = configuration.get("diagnostics_mode", False)
-        self.tiff_counter = None
-        self.tiff_fp = None
+
+        # Also save the offsets in the text .off format at the end of the film.
+        self.offset_text = configuration.get("offset_text", True)
         
         # Qt timer for checking focus lock
         self.check_focus_timer = QtCore.QTimer()
         self.check_focus_timer.setSingleShot(True)
         self.check_focus_timer.timeout.connect(self.handleCheckFocusLock)
         
+    def cleanUp(self):
+        self.waitForExport()
+
     def getLockModeName(self):
         return self.lock_mode.getName()
     
@@ -146,30 +154,15 @@ class LockControl(QtCore.QObject):
         self.z_stage_functionality.recenter()
 
     def handleNewFrame(self, frame):
-        if self.offset_fp is not None:
-            frame_number = frame.frame_number + 1
+        if self.offset_recorder is not None:
             pos_dict = self.lock_mode.getQPDState()
-            is_good = int(pos_dict["is_good"])
-            offset = pos_dict["offset"]
-            power = pos_dict["sum"]
-            stage_z = self.z_stage_functionality.getCurrentPosition()
-
-            # In diagnostics mode, add a column for the current tiff image from the QPD.
-            if self.tiff_counter is not None:
-                self.offset_fp.write("{0:d} {1:.6f} {2:.6f} {3:.6f} {4:0d} {5:0d}\n".format(frame_number,
-                                                                                            offset,
-                                                                                            power,
-                                                                                            stage_z,
-                                                                                            is_good,
-                                                                                            self.tiff_counter))
-
-            # Otherwise save as normal.
-            else:
-                self.offset_fp.write("{0:d} {1:.6f} {2:.6f} {3:.6f} {4:0d}\n".format(frame_number,
-                                                                                     offset,
-                                                                                     power,
-                                                                                     stage_z,
-                                                                                     is_good))
+            self.offset_recorder.addOffset(frame_number = frame.frame_number + 1,
+                                           offset = pos_dict["offset"],
+                                           power = pos_dict["sum"],
+                                           stage_z = self.z_stage_functionality.getCurrentPosition(),
+                                           is_good = int(pos_dict["is_good"]),
+                                           target = self.lock_mode.getLockTarget(),
+                                           control_state = self.lock_mode.getControlState())
         self.lock_mode.handleNewFrame(frame)
 
     def handleQPDUpdate(self, qpd_dict):
@@ -192,14 +185,9 @@ class LockControl(QtCore.QObject):
         #
         self.lock_mode.handleQPDUpdate(qpd_dict)
 
-        # Save image if we have a valid tiff counter.
-        #
-        # There is some kind of race condition here as checking self.tiff_fp
-        # will sometimes fail. Not sure if checking self.tiff_counter will
-        # always work.
-        if self.tiff_counter is not None:
-            self.tiff_counter += 1
-            self.tiff_fp.save(self.lock_mode.getQPDState()["image"])
+        # Save the QPD image (in diagnostics mode).
+        if self.offset_recorder is not None:
+            self.offset_recorder.addImage(self.lock_mode.getQPDState()["image"])
             
         # Poll QPD again.
         self.qpd_functionality.getOffset()
@@ -302,23 +290,17 @@ class LockControl(QtCore.QObject):
             self.qpd_functionality.getOffset()
         
     def startFilm(self, film_settings):
+        # The previous film might have had the same basename.
+        self.waitForExport()
+
         # Open file to save the lock status at each frame.
         if self.working:
             if film_settings.isSaved():
 
                 # Only save images when in diagnostics mode and only for a QPDCameraFunctionality.
-                if self.diagnostics_mode and (self.qpd_functionality.getType() == "camera"):
-                    self.tiff_counter = 0
-                    self.tiff_fp = tifffile.TiffWriter(film_settings.getBasename() + "_qpd.tif",
-                                                       bigtiff = True)
-
-                self.offset_fp = open(film_settings.getBasename() + ".off", "w")
-
-                headers = ["frame", "offset", "power", "stage-z", "good-offset"]
-                if self.tiff_fp is not None:
-                    headers.append("tif-counter")
-
-                self.offset_fp.write(" ".join(headers) + "\n")
+                save_images = self.diagnostics_mode and (self.qpd_functionality.getType() == "camera")
+                self.offset_recorder = offsetRecorder.OffsetRecorder(basename = film_settings.getBasename(),
+                                                                     save_images = save_images)
 
             # Check for a waveform from a hardware timed lock mode that uses the DAQ.
             waveform = self.lock_mode.getWaveform()
@@ -344,14 +326,23 @@ class LockControl(QtCore.QObject):
 
     def stopFilm(self):
         if self.working:
-            if self.offset_fp is not None:
-                self.offset_fp.close()
-                self.offset_fp = None
-                
-            if self.tiff_fp is not None:
-                self.tiff_counter = None
-                self.tiff_fp.close()
-                self.tiff_fp = None
+            if self.offset_recorder is not None:
+                recorder = self.offset_recorder
+                self.offset_recorder = None
+                try:
+                    recorder.close()
+                except imagewriters.ImageWriterException as exception:
+                    print("> focus lock recorder failed,", str(exception))
+                else:
+                    dropped = recorder.getDroppedFrames()
+                    if (sum(dropped) > 0):
+                        print("> focus lock recorder dropped {0:d} offsets and {1:d} QPD images".format(*dropped))
+
+                    # Write the text version in a background thread.
+                    if self.offset_text:
+                        self.export_thread = threading.Thread(target = offsetRecorder.exportText,
+                                                              args = (recorder.basename,))
+                        self.export_thread.start()
                 
             self.lock_mode.stopFilm()
 
@@ -361,3 +352,11 @@ class LockControl(QtCore.QObject):
     def stopLock(self):
         if self.working:
             self.lock_mode.stopLock()
+
+    def waitForExport(self):
+        """
+        Wait for the text export of the offsets of the last film (if any).
+        """
+        if self.export_thread is not None:
+            self.export_thread.join()
+            self.export_thread = None
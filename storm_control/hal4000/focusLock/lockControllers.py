@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+"""
+Control laws for the focus lock. These determine how much to move
+the z stage given the current offset error.
+
+The focus lock moves the stage by a relative amount at each update,
+so the stage position is already the integral of the controller
+output. This means that the proportional term alone removes a constant
+offset, and the integral term removes the lag when the sample is
+drifting at a constant rate.
+
+All distances are in microns.
+"""
+import math
+
+
+class LockController(object):
+    """
+    Base class for the focus lock controllers.
+    """
+    def __init__(self, **kwds):
+        super().__init__(**kwds)
+        self.last_target = None
+        self.max_step = None
+        self.state = {}
+
+    def getState(self):
+        """
+        Returns a dictionary with the controller state after the
+        last update.
+        """
+        return self.state
+
+    def limitStep(self, dz):
+        """
+        Limit the size of a single stage move (if there is a limit).
+
+        Returns [dz, saturated]
+        """
+        if self.max_step is not None:
+            if (dz > self.max_step):
+                return [self.max_step, True]
+            elif (dz < -self.max_step):
+                return [-self.max_step, True]
+        return [dz, False]
+
+    def reset(self):
+        """
+        Called when the lock starts.
+        """
+        self.last_target = None
+        self.state = {}
+
+    def setMaxStep(self, max_step):
+        """
+        The maximum size of a single stage move, None for no limit.
+        """
+        self.max_step = max_step
+
+    def targetChange(self, target):
+        """
+        Returns the change in the lock target since the last update.
+        """
+        delta = 0.0
+        if self.last_target is not None:
+            delta = target - self.last_target
+        self.last_target = target
+        return delta
+
+    def update(self, error, target):
+        """
+        Returns how much to move the stage given the error, which
+        is the current offset minus the lock target.
+        """
+        assert False
+
+
+class ProportionalController(LockController):
+    """
+    Proportional control with a gain that increases with the size
+    of the error. This is the original focus lock control law.
+    """
+    def __init__(self, gain = 0.5, max_gain = 0.7, **kwds):
+        super().__init__(**kwds)
+        self.gain = gain
+        self.max_gain = max_gain
+
+    def update(self, error, target):
+        self.targetChange(target)
+
+        # Exponential with a sigma of 0.5 microns (2.0 * 0.5 * 0.5 = 0.5).
+        #
+        # If the offset is large than we just want to use the maximum gain
+        # to get back to the target as quickly as possible. However if we
+        # are near the target then we want to respond with a smaller gain
+        # value.
+        #
+        dx = error * error / 0.5
+        p_term = self.max_gain - (self.max_gain - self.gain)*math.exp(-dx)
+
+        [dz, saturated] = self.limitStep(-1.0 * p_term * error)
+        self.state = {"error" : error,
+                      "dz" : dz,
+                      "p" : -1.0 * p_term * error,
+                      "saturated" : saturated}
+        return dz
+
+
+class PIDController(LockController):
+    """
+    PID control with feed-forward of changes in the lock target.
+
+    The integral term is clamped to +- integral_limit and is not
+    updated when the output is saturated by the step limit (anti-windup).
+    The derivative term is low pass filtered, derivative_filter is the
+    fraction of the previous value that is kept at each update.
+    """
+    def __init__(self,
+                 derivative_filter = 0.5,
+                 feed_forward = 0.0,
+                 integral_limit = 0.2,
+                 kd = 0.0,
+                 ki = 0.05,
+                 kp = 0.5,
+                 **kwds):
+        super().__init__(**kwds)
+        self.derivative_filter = derivative_filter
+        self.feed_forward = feed_forward
+        self.integral_limit = integral_limit
+        self.kd = kd
+        self.ki = ki
+        self.kp = kp
+
+        self.d_term = 0.0
+        self.i_term = 0.0
+        self.last_error = None
+
+    def reset(self):
+        super().reset()
+        self.d_term = 0.0
+        self.i_term = 0.0
+        self.last_error = None
+
+    def update(self, error, target):
+        p_term = -self.kp * error
+
+        # Filtered derivative of the error.
+        if self.last_error is not None:
+            d_raw = -self.kd * (error - self.last_error)
+            self.d_term = self.derivative_filter * self.d_term + (1.0 - self.derivative_filter) * d_raw
+        self.last_error = error
+
+        # Move with the lock target when it changes.
+        ff_term = self.feed_forward * self.targetChange(target)
+
+        # Clamped integral.
+        i_term = self.i_term - self.ki * error
+        i_term = max(-self.integral_limit, min(self.integral_limit, i_term))
+
+        [dz, saturated] = self.limitStep(p_term + i_term + self.d_term + ff_term)
+
+        # Only integrate if this doesn't push the output further into saturation.
+        if not saturated or ((i_term * dz) < (self.i_term * dz)):
+            self.i_term = i_term
+
+        self.state = {"error" : error,
+                      "d" : self.d_term,
+                      "dz" : dz,
+                      "ff" : ff_term,
+                      "i" : self.i_term,
+                      "p" : p_term,
+                      "saturated" : saturated}
+        return dz
+
+
+#
+# The MIT License
+#
+# Copyright (c) 2026 Babcock Lab, Harvard University
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
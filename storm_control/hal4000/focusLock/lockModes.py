@@ -19,11 +19,95 @@ import storm_control.sc_library.parameters as params
 # Focus quality determination for the optimal lock.
 import storm_control.hal4000.focusLock.focusQuality as focusQuality
 
+# Control laws for the locked behavior.
+import storm_control.hal4000.focusLock.lockControllers as lockControllers
+
 
 class LockModeException(halExceptions.HalException):
     pass
 
 
+class DriftEstimator(object):
+    """
+    Kalman filter estimate of the sample z position and drift rate, using
+    a constant velocity model. The sample position is the z stage position
+    at which the QPD offset would be zero.
+
+    This is used to keep correcting for drift when the QPD signal is
+    briefly lost.
+
+    clock - Function that returns the current time in seconds.
+    measurement_noise - Standard deviation of a sample position measurement (um).
+    process_noise - Random drift acceleration spectral density (um^2/s^3).
+    """
+    def __init__(self, clock = time.monotonic, measurement_noise = 0.01, process_noise = 1.0e-4, **kwds):
+        super().__init__(**kwds)
+        self.clock = clock
+        self.q = process_noise
+        self.r = measurement_noise * measurement_noise
+        self.reset()
+
+    def getConfidence(self, t, threshold):
+        """
+        Returns the probability that the predicted sample position at
+        time t is within threshold (um) of the true position.
+        """
+        if self.last_time is None:
+            return 0.0
+        [x, p] = self.predictState(t)
+        return math.erf(threshold / math.sqrt(2.0 * p[0][0]))
+
+    def getTimeSinceMeasurement(self, t):
+        if self.last_time is None:
+            return None
+        return t - self.last_time
+
+    def predict(self, t):
+        """
+        Returns the predicted sample position at time t.
+        """
+        [x, p] = self.predictState(t)
+        return x[0]
+
+    def predictState(self, t):
+        """
+        Returns the state and covariance propagated to time t.
+        """
+        dt = t - self.last_time
+        [x, p] = [self.x, self.p]
+        x = [x[0] + dt * x[1], x[1]]
+
+        # P = F P F^T + Q
+        p00 = p[0][0] + dt * (p[0][1] + p[1][0]) + dt * dt * p[1][1] + self.q * dt * dt * dt / 3.0
+        p01 = p[0][1] + dt * p[1][1] + 0.5 * self.q * dt * dt
+        p11 = p[1][1] + self.q * dt
+        return [x, [[p00, p01], [p01, p11]]]
+
+    def reset(self):
+        self.last_time = None
+        self.p = None
+        self.x = None
+
+    def update(self, t, z_sample):
+        """
+        Add a measurement of the sample position at time t.
+        """
+        if self.last_time is None:
+            self.x = [z_sample, 0.0]
+            self.p = [[self.r, 0.0], [0.0, 1.0e-2]]
+            self.last_time = t
+            return
+
+        [x, p] = self.predictState(t)
+        s = p[0][0] + self.r
+        k = [p[0][0]/s, p[1][0]/s]
+        y = z_sample - x[0]
+        self.x = [x[0] + k[0] * y, x[1] + k[1] * y]
+        self.p = [[(1.0 - k[0]) * p[0][0], (1.0 - k[0]) * p[0][1]],
+                  [p[1][0] - k[1] * p[0][0], p[1][1] - k[1] * p[0][1]]]
+        self.last_time = t
+
+
 #
 # Mixin classes provide various locking and scanning behaviours.
 # The idea is that these are more or less self-contained and setting
@@ -140,6 +224,16 @@ class LockedMixin(object):
     """
     This will try and hold the specified lock target. It 
     also keeps track of the quality of the lock.
+
+    The control law is either the original proportional control or PID
+    control, see lockControllers.py. The controller state after the last
+    update is kept in lm_control_state, lockControl saves this with the
+    offsets at each camera frame.
+
+    If there is a drift estimator then the stage will follow the predicted
+    sample position for up to max_dropout seconds when the QPD signal is
+    lost. These updates count as good if the confidence in the prediction
+    is at least min_confidence.
     """
     lm_pname = "locked"
 
@@ -147,13 +241,18 @@ class LockedMixin(object):
         super().__init__(**kwds)
         self.lm_buffer = None
         self.lm_buffer_length = 1
+        self.lm_confidence = 1.0
+        self.lm_control_state = {}
+        self.lm_controller = lockControllers.ProportionalController()
         self.lm_counter = 0
-        self.lm_gain = 0.5
-        self.lm_max_gain = 0.7
+        self.lm_drift_estimator = None
+        self.lm_max_dropout = 1.0
+        self.lm_max_step = 0.0
+        self.lm_min_confidence = 0.5
         self.lm_min_sum = 0.0
         self.lm_mode_name = "locked"
         self.lm_offset_threshold = 0.02
-        self.lm_scale = self.lm_max_gain - self.lm_gain
+        self.lm_predicting = False
         self.lm_target = 0.0
 
         if not hasattr(self, "behavior_names"):
@@ -191,22 +290,79 @@ class LockedMixin(object):
                                     name = "minimum_sum",
                                     value = -1.0))
 
+        p.add(params.ParameterSetString(description = "Lock control law.",
+                                        name = "control_law",
+                                        value = "proportional",
+                                        allowed = ["proportional", "pid"]))
+
+        p.add(params.ParameterRangeFloat(description = "Lock target feed-forward gain (PID).",
+                                         name = "feed_forward",
+                                         value = 0.0,
+                                         min_value = 0.0,
+                                         max_value = 1.0))
+
+        p.add(params.ParameterFloat(description = "Maximum stage move per update, 0 is the z stage limit (um).",
+                                    name = "max_step",
+                                    value = 0.0))
+
+        p.add(params.ParameterRangeFloat(description = "Derivative filter, fraction of the previous value to keep (PID).",
+                                         name = "pid_derivative_filter",
+                                         value = 0.5,
+                                         min_value = 0.0,
+                                         max_value = 0.99))
+
+        p.add(params.ParameterFloat(description = "Maximum integral term (PID, um).",
+                                    name = "pid_integral_limit",
+                                    value = 0.2))
+
+        p.add(params.ParameterRangeFloat(description = "Derivative gain (PID).",
+                                         name = "pid_kd",
+                                         value = 0.0,
+                                         min_value = 0.0,
+                                         max_value = 1.0))
+
+        p.add(params.ParameterRangeFloat(description = "Integral gain (PID).",
+                                         name = "pid_ki",
+                                         value = 0.05,
+                                         min_value = 0.0,
+                                         max_value = 1.0))
+
+        p.add(params.ParameterRangeFloat(description = "Proportional gain (PID).",
+                                         name = "pid_kp",
+                                         value = 0.5,
+                                         min_value = 0.0,
+                                         max_value = 1.0))
+
+        p.add(params.ParameterSetBoolean(description = "Follow the predicted drift when the QPD signal is lost (Always On).",
+                                         name = "drift_prediction",
+                                         value = False))
+
+        p.add(params.ParameterFloat(description = "Maximum time to follow the predicted drift (seconds).",
+                                    name = "max_dropout",
+                                    value = 1.0))
+
+        p.add(params.ParameterRangeFloat(description = "Minimum drift prediction confidence to still be in lock.",
+                                         name = "min_confidence",
+                                         value = 0.5,
+                                         min_value = 0.0,
+                                         max_value = 1.0))
+
     def controlFn(self, offset):
         """
         Returns how much to move the stage (in microns) given the
         offset (also in microns).
         """
-        # Exponential with a sigma of 0.5 microns (2.0 * 0.5 * 0.5 = 0.5).
-        #
-        # If the offset is large than we just want to use the maximum gain
-        # to get back to the target as quickly as possible. However if we
-        # are near the target then we want to respond with a smaller gain
-        # value.
-        #
-        dx = offset * offset / 0.5
-        p_term = self.lm_max_gain - self.lm_scale*math.exp(-dx)
-        return -1.0 * p_term * offset
-        
+        dz = self.lm_controller.update(offset, self.lm_target)
+        self.lm_control_state = self.lm_controller.getState()
+        return dz
+
+    def getControlState(self):
+        """
+        Returns the controller state after the last update, an empty
+        dictionary if the lock has not updated yet.
+        """
+        return self.lm_control_state
+
     def getLockTarget(self):
         return self.lm_target
         
@@ -215,6 +371,7 @@ class LockedMixin(object):
             super().handleQPDUpdate(qpd_state)
 
         if (self.behavior == self.lm_mode_name):
+            self.lm_predicting = False
             if qpd_state["is_good"] and (qpd_state["sum"] > self.lm_min_sum):
                 diff = (qpd_state["offset"] - self.lm_target)
                 if (abs(diff) < self.lm_offset_threshold):
@@ -222,10 +379,33 @@ class LockedMixin(object):
                 else:
                     self.lm_buffer[self.lm_counter] = 0
 
+                if self.lm_drift_estimator is not None:
+                    z_pos = LockMode.z_stage_functionality.getCurrentPosition()
+                    self.lm_drift_estimator.update(self.lm_drift_estimator.clock(), z_pos - qpd_state["offset"])
+
                 # Simple proportional control.
                 #dz = -1.0 * self.lm_gain * diff
                 dz = self.controlFn(diff)
                 LockMode.z_stage_functionality.goRelative(dz)
+
+            elif self.lmCanPredict():
+
+                # Follow the predicted sample position.
+                now = self.lm_drift_estimator.clock()
+                self.lm_predicting = True
+                self.lm_confidence = self.lm_drift_estimator.getConfidence(now, self.lm_offset_threshold)
+                if (self.lm_confidence >= self.lm_min_confidence):
+                    self.lm_buffer[self.lm_counter] = 1
+                else:
+                    self.lm_buffer[self.lm_counter] = 0
+
+                z_pos = LockMode.z_stage_functionality.getCurrentPosition()
+                z_target = self.lm_drift_estimator.predict(now) + self.lm_target
+                [dz, saturated] = self.lm_controller.limitStep(z_target - z_pos)
+                self.lm_control_state = {"dz" : dz,
+                                         "saturated" : saturated}
+                LockMode.z_stage_functionality.goRelative(dz)
+
             else:
                 self.lm_buffer[self.lm_counter] = 0
 
@@ -240,6 +420,16 @@ class LockedMixin(object):
             self.lm_counter += 1
             if (self.lm_counter == self.lm_buffer_length):
                 self.lm_counter = 0
+
+    def lmCanPredict(self):
+        """
+        Returns True if there is a drift estimate and the QPD signal
+        has not been lost for too long.
+        """
+        if self.lm_drift_estimator is None:
+            return False
+        dt = self.lm_drift_estimator.getTimeSinceMeasurement(self.lm_drift_estimator.clock())
+        return (dt is not None) and (dt < self.lm_max_dropout)
             
     def newParameters(self, parameters):
         if hasattr(super(), "newParameters"):
@@ -249,17 +439,46 @@ class LockedMixin(object):
         self.lm_buffer_length = p.get("buffer_length")
         self.lm_buffer = numpy.zeros(self.lm_buffer_length, dtype = numpy.uint8)
         self.lm_counter = 0
-        self.lm_gain = p.get("lock_gain")
-        self.lm_max_gain = p.get("lock_gain_max")
+        self.lm_max_dropout = p.get("max_dropout")
+        self.lm_max_step = p.get("max_step")
+        self.lm_min_confidence = p.get("min_confidence")
         self.lm_min_sum = p.get("minimum_sum")
         self.lm_offset_threshold = 1.0e-3 * p.get("offset_threshold")
-        self.lm_scale = self.lm_max_gain - self.lm_gain
+
+        if (p.get("control_law") == "pid"):
+            self.lm_controller = lockControllers.PIDController(derivative_filter = p.get("pid_derivative_filter"),
+                                                               feed_forward = p.get("feed_forward"),
+                                                               integral_limit = p.get("pid_integral_limit"),
+                                                               kd = p.get("pid_kd"),
+                                                               ki = p.get("pid_ki"),
+                                                               kp = p.get("pid_kp"))
+        else:
+            self.lm_controller = lockControllers.ProportionalController(gain = p.get("lock_gain"),
+                                                                        max_gain = p.get("lock_gain_max"))
 
     def startLock(self):
         self.lm_counter = 0
         self.lm_buffer = numpy.zeros(self.lm_buffer_length, dtype = numpy.uint8)
         self.behavior = "locked"
 
+        # The step limit is the smaller of our limit and the z stage limit.
+        max_step = None
+        if (self.lm_max_step > 0.0):
+            max_step = self.lm_max_step
+        z_max_step = LockMode.z_stage_functionality.getMaximumStep()
+        if (z_max_step is not None):
+            if (max_step is None) or (z_max_step < max_step):
+                max_step = z_max_step
+
+        self.lm_control_state = {}
+        self.lm_controller.reset()
+        self.lm_controller.setMaxStep(max_step)
+
+        self.lm_confidence = 1.0
+        self.lm_predicting = False
+        if self.lm_drift_estimator is not None:
+            self.lm_drift_estimator.reset()
+
     def startLockBehavior(self, behavior_name, behavior_params):
         if hasattr(super(), "startLockBehavior"):
             super().startLockBehavior(behavior_name, behavior_params)
@@ -644,6 +863,9 @@ class NoLockMode(LockMode):
         super().__init__(**kwds)
         self.name = "No lock"
 
+    def getControlState(self):
+        return {}
+
     def getLockTarget(self):
         return 0.0
 
@@ -687,6 +909,23 @@ class AlwaysOnLockMode(AutoLockMode):
         self.aolm_film_on = False
         self.name = "Always On"
 
+    def isGoodLock(self):
+        """
+        If we are following the predicted drift then the lock is only
+        good if we are confident in the prediction.
+        """
+        if self.lm_predicting:
+            return self.good_lock and (self.lm_confidence >= self.lm_min_confidence)
+        return super().isGoodLock()
+
+    def newParameters(self, parameters):
+        super().newParameters(parameters)
+        if self.parameters.get(self.lm_pname + ".drift_prediction"):
+            if self.lm_drift_estimator is None:
+                self.lm_drift_estimator = DriftEstimator()
+        else:
+            self.lm_drift_estimator = None
+
     def shouldEnableLockButton(self):
         return True
 
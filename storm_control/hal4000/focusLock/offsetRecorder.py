@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+"""
+Records the focus lock state at each camera frame and (optionally)
+the QPD camera images. The disk writes are done in background threads
+by imagewriters.WriterThread, so they do not block the main thread.
+
+The focus lock state is saved as a binary file of offset_dtype records
+(basename.offb), one record per camera frame. The QPD camera images
+are saved in basename_qpd.tif, the 'tif_counter' field is the number
+of images that had been saved at that frame. The 'p', 'i', 'd' and 'dz'
+fields are the focus lock controller terms and stage move of the last
+lock update (see lockControllers.py), these are 0.0 if the controller
+does not have the term or if the lock is not running.
+
+exportText() converts the binary file to the original text format
+(basename.off). lockControl does this in a background thread at the end
+of the film, it can also be done from the command line:
+
+  python offsetRecorder.py movie.offb
+"""
+import numpy
+import sys
+import tifffile
+
+import storm_control.hal4000.halLib.imagewriters as imagewriters
+
+offset_dtype = numpy.dtype([("frame", "<i4"),
+                            ("offset", "<f8"),
+                            ("power", "<f8"),
+                            ("stage_z", "<f8"),
+                            ("good", "u1"),
+                            ("target", "<f8"),
+                            ("tif_counter", "<i4"),
+                            ("p", "<f8"),
+                            ("i", "<f8"),
+                            ("d", "<f8"),
+                            ("dz", "<f8")])
+
+
+def exportText(basename):
+    """
+    Convert basename.offb to basename.off.
+    """
+    offsets = loadOffsets(basename + ".offb")
+    have_images = bool(numpy.any(offsets["tif_counter"] >= 0))
+
+    headers = ["frame", "offset", "power", "stage-z", "good-offset"]
+    columns = ["frame", "offset", "power", "stage_z", "good"]
+    fmt = ["%d", "%.6f", "%.6f", "%.6f", "%d"]
+    if have_images:
+        headers.append("tif-counter")
+        columns.append("tif_counter")
+        fmt.append("%d")
+
+    data = numpy.column_stack([offsets[elt] for elt in columns])
+    numpy.savetxt(basename + ".off",
+                  data,
+                  comments = "",
+                  fmt = fmt,
+                  header = " ".join(headers))
+
+
+def loadOffsets(filename):
+    """
+    Returns the records in a .offb file as a numpy structured array.
+    """
+    return numpy.fromfile(filename, dtype = offset_dtype)
+
+
+class OffsetRecorder(object):
+
+    def __init__(self, basename = None, save_images = False, **kwds):
+        super().__init__(**kwds)
+        self.basename = basename
+        self.image_shape = None
+        self.image_writer = None
+        self.n_images = 0
+        self.record = numpy.zeros(1, dtype = offset_dtype)
+        self.save_images = save_images
+        self.tiff_fp = None
+
+        self.offset_fp = open(self.basename + ".offb", "wb")
+        self.offset_writer = imagewriters.WriterThread(dtype = offset_dtype,
+                                                       frame_pixels = 1,
+                                                       n_buffers = 4096,
+                                                       write_fn = self.writeOffsets)
+        self.offset_writer.startWriter()
+
+        if self.save_images:
+            self.tiff_fp = tifffile.TiffWriter(self.basename + "_qpd.tif",
+                                               bigtiff = True)
+
+    def addImage(self, image):
+        """
+        Add a QPD camera image, this is copied so the camera can re-use
+        the image buffer.
+        """
+        if not self.save_images:
+            return
+
+        # The image size is only known once we get the first image.
+        if self.image_writer is None:
+            self.image_shape = image.shape
+            self.image_writer = imagewriters.WriterThread(dtype = image.dtype,
+                                                          frame_pixels = image.size,
+                                                          n_buffers = 256,
+                                                          write_fn = self.writeImages)
+            self.image_writer.startWriter()
+
+        if self.image_writer.addFrame(image):
+            self.n_images += 1
+
+    def addOffset(self, frame_number = None, offset = None, power = None, stage_z = None, is_good = None, target = None, control_state = None):
+        """
+        Add the focus lock state for a camera frame. control_state is the
+        dictionary from lockModes.LockedMixin.getControlState().
+        """
+        self.record["frame"] = frame_number
+        self.record["offset"] = offset
+        self.record["power"] = power
+        self.record["stage_z"] = stage_z
+        self.record["good"] = is_good
+        self.record["target"] = target
+        self.record["tif_counter"] = self.n_images if self.save_images else -1
+        for elt in ["p", "i", "d", "dz"]:
+            self.record[elt] = control_state.get(elt, 0.0) if control_state else 0.0
+        self.offset_writer.addFrame(self.record)
+
+    def close(self):
+        """
+        Wait for all the records and images to be written, then close the files.
+        """
+        try:
+            self.offset_writer.stopWriter()
+            if self.image_writer is not None:
+                self.image_writer.stopWriter()
+        finally:
+            self.offset_fp.close()
+            if self.tiff_fp is not None:
+                self.tiff_fp.close()
+
+    def getDroppedFrames(self):
+        """
+        Returns the number of [offset records, images] that could not be saved
+        because the disk was not keeping up.
+        """
+        dropped = [self.offset_writer.getDroppedFrames(), 0]
+        if self.image_writer is not None:
+            dropped[1] = self.image_writer.getDroppedFrames()
+        return dropped
+
+    def writeImages(self, images):
+        for image in images:
+            self.tiff_fp.save(image.reshape(self.image_shape))
+
+    def writeOffsets(self, records):
+        self.offset_fp.write(records.tobytes())
+
+
+if (__name__ == "__main__"):
+    for filename in sys.argv[1:]:
+        if filename.endswith(".offb"):
+            filename = filename[:-5]
+        exportText(filename)
+
+
+#
+# The MIT License
+#
+# Copyright (c) 2026 Babcock Lab, Harvard University
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
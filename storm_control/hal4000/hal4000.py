@@ -27,6 +27,7 @@ import time
 
 from PyQt5 import QtCore, QtGui, QtWidgets
 
+import storm_control.sc_library.eventTrace as eventTrace
 import storm_control.sc_library.halExceptions as halExceptions
 import storm_control.sc_library.hdebug as hdebug
 import storm_control.sc_library.hgit as hgit
@@ -57,6 +58,14 @@ class HalController(halModule.HalModule):
     """
     HAL main window controller.
     """
+    handled_messages = {"add to menu",
+                        "add to ui",
+                        "change directory",
+                        "start",
+                        "start film",
+                        "stop film",
+                        "tests done"}
+    
     def __init__(self, module_params = None, qt_settings = None, **kwds):
         super().__init__(**kwds)
 
@@ -385,6 +394,7 @@ class HalCore(QtCore.QObject):
 
         self.modules = []
         self.module_name = "core"
+        self.module_receivers = {}
         self.qt_settings = QtCore.QSettings("storm-control", "hal4000" + config.get("setup_name").lower())
         self.queued_messages = deque()
         self.queued_messages_timer = QtCore.QTimer(self)
@@ -392,6 +402,11 @@ class HalCore(QtCore.QObject):
         self.sent_messages = []
         self.strict = config.get("strict", False)
 
+        # Send every message to every module, this is mostly for
+        # debugging. Normally messages are only sent to the modules
+        # that handle them, see HalModule.getHandledMessages().
+        self.broadcast_messages = config.get("broadcast_messages", False)
+
         self.queued_messages_timer.setInterval(0)
         self.queued_messages_timer.timeout.connect(self.handleSendMessage)
         self.queued_messages_timer.setSingleShot(True)
@@ -551,6 +566,16 @@ class HalCore(QtCore.QObject):
             module.cleanUp(self.qt_settings)
         print("Waiting for QThreadPool to finish.")
         halModule.threadpool.waitForDone()
+
+        # Log how long each module took to process messages.
+        profiles = []
+        for module in self.modules:
+            profile = halModule.formatProfile(module.module_name, module.getProfile())
+            if (len(profile) > 0):
+                profiles.append(profile)
+        hdebug.logText("Module profiles:\n" + "\n".join(profiles))
+
+        eventTrace.flush()
         self.running = False
         print(" Dave? What are you doing Dave?")
         print("  ...")
@@ -595,8 +620,7 @@ class HalCore(QtCore.QObject):
                 msg += "' received from " + message.getSourceName()
                 raise halExceptions.HalException(msg)
 
-            validator = halMessage.valid_messages[message.m_type].get("data")
-            halMessage.validateData(validator, message)
+            halMessage.checkData(message)
             
         message.logEvent("queued")
 
@@ -637,9 +661,7 @@ class HalCore(QtCore.QObject):
 
         # Check the responses if we are in strict mode.
         if self.strict:
-            validator = halMessage.valid_messages[message.m_type].get("resp")
-            for response in message.getResponses():
-                halMessage.validateResponse(validator, message, response)
+            halMessage.checkResponses(message)
 
         # Notify the sender of any responses to the message.
         message.getSource().handleResponses(message)
@@ -661,9 +683,24 @@ class HalCore(QtCore.QObject):
         """
         assert not message.hasResponses()
 
+    def getReceivers(self, m_type):
+        """
+        Returns the list of the modules that should receive
+        messages of type m_type, in the order they were loaded.
+        """
+        if not m_type in self.module_receivers:
+            receivers = []
+            for module in self.modules:
+                handled = module.getHandledMessages()
+                if self.broadcast_messages or (handled is None) or (m_type in handled):
+                    receivers.append(module)
+            self.module_receivers[m_type] = receivers
+        return self.module_receivers[m_type]
+            
     def handleSendMessage(self):
         """
-        Handle sending the current message to all the modules.
+        Handle sending the current message to all the modules
+        that handle this type of message.
         """
         # Process the next message.
         if (len(self.queued_messages) > 0):
@@ -704,10 +741,18 @@ class HalCore(QtCore.QObject):
 
                         cur_message.processed.connect(self.handleProcessed)
                         self.sent_messages.append(cur_message)
-                        for module in self.modules:
-                            cur_message.ref_count += 1
+                        receivers = self.getReceivers(cur_message.m_type)
+
+                        # Set the reference count first so that it can't
+                        # reach zero before all the modules have the message.
+                        cur_message.ref_count += len(receivers)
+                        for module in receivers:
                             module.handleMessage(cur_message)
 
+                        # No module handles this message.
+                        if (len(receivers) == 0):
+                            self.handleProcessed(cur_message)
+
                     # Process any remaining messages with immediate timeout.
                     if (len(self.queued_messages) > 0):
                         self.startMessageTimer()
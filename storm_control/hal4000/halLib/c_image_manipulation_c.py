@@ -6,9 +6,18 @@ is used to speed up the rendering of the image in the UI. My experience
 was that for large images, such as those from a sCMOS camera, using numpy
 to do the image scaling and type conversion was not fast enough.
 
+If the C library is not available the image is rescaled using a look up
+table with one uint8 entry for every uint16 value. The tables are cached
+by display range and saturation value, so several viewers with different
+display ranges don't rebuild them for every frame.
+
+Large images are processed in tiles of rows in parallel, both numpy and
+ctypes release the GIL while they are working on a tile.
+
 Hazen 09/15
 """
 
+import concurrent.futures
 import ctypes
 import math
 import numpy
@@ -50,6 +59,20 @@ except OSError:
     print("C image manipulation library not found, reverting to numpy.")
     image_manip = None
 
+# Images with more pixels than this are processed in parallel.
+tile_threshold = 512 * 1024
+
+# The number of threads (and tiles) to use for large images.
+n_threads = min(8, os.cpu_count() or 1)
+
+thread_pool = None
+
+# The look up tables, keyed by (display range, saturated value, maximum
+# range). At most max_luts tables are kept, the oldest is discarded first.
+luts = {}
+max_luts = 8
+
+
 
 def compare(image1, image2):
     """
@@ -67,7 +90,80 @@ def compare(image1, image2):
     return image_manip.compare(image1, image2, image1.size)
 
 
-def rescaleImage(image, flip_h, flip_v, transpose, display_range, saturated_value, use_numpy = False):
+def downsampleImage(image, factor, mode = "max"):
+    """
+    Downsample image by an integer factor in both dimensions, using
+    either the maximum ("max") or the mean ("mean") of each factor x
+    factor block of pixels. Pixels at the edges that don't fill a
+    complete block are discarded.
+
+    This works on strided views of the image so that there are no
+    large temporaries.
+    """
+    [h, w] = [image.shape[0]//factor, image.shape[1]//factor]
+    image = image[:h*factor,:w*factor]
+
+    if (mode == "max"):
+        rows = image[0::factor].copy()
+        for i in range(1, factor):
+            numpy.maximum(rows, image[i::factor], out = rows)
+        small = rows[:,0::factor].copy()
+        for i in range(1, factor):
+            numpy.maximum(small, rows[:,i::factor], out = small)
+        return small
+
+    elif (mode == "mean"):
+        rows = image[0::factor].astype(numpy.uint32)
+        for i in range(1, factor):
+            rows += image[i::factor]
+        small = rows[:,0::factor].copy()
+        for i in range(1, factor):
+            small += rows[:,i::factor]
+        return (small//(factor*factor)).astype(image.dtype)
+
+    else:
+        raise ValueError("Unknown downsampling mode '" + mode + "'")
+
+def getLUT(display_range, saturated_value, max_range):
+    """
+    Returns the uint16 to uint8 look up table, this is only calculated
+    if there is no table for these parameters in the cache.
+    """
+    key = (display_range[0], display_range[1], saturated_value, max_range)
+    lut = luts.get(key)
+    if lut is None:
+        values = numpy.arange(65536, dtype = numpy.float64)
+        scaled = max_range*(values - display_range[0])/(display_range[1] - display_range[0])
+        scaled = numpy.clip(scaled, 0.0, max_range)
+        scaled[(values >= saturated_value)] = 255.0
+        lut = (scaled + 0.5).astype(numpy.uint8)
+
+        if (len(luts) >= max_luts):
+            del luts[next(iter(luts))]
+        luts[key] = lut
+    return lut
+
+def runTiled(tile_fn, n_rows, n_pixels):
+    """
+    Calls tile_fn(start row, end row) for tiles of rows, in parallel if
+    there are more than tile_threshold pixels. Returns the results as a list.
+    """
+    global thread_pool
+    
+    n_tiles = min(n_threads, n_rows)
+    if (n_pixels <= tile_threshold) or (n_tiles < 2):
+        return [tile_fn(0, n_rows)]
+
+    if thread_pool is None:
+        thread_pool = concurrent.futures.ThreadPoolExecutor(max_workers = n_threads)
+
+    edges = numpy.linspace(0, n_rows, n_tiles + 1).astype(int)
+    futures = []
+    for i in range(n_tiles):
+        futures.append(thread_pool.submit(tile_fn, edges[i], edges[i+1]))
+    return [future.result() for future in futures]
+
+def rescaleImage(image, flip_h, flip_v, transpose, display_range, saturated_value, use_numpy = False, out = None):
     """
     This converts a uint16 image into a uint8 image based on the display
     range. As a side effect it also returns the minimum and maximum values
@@ -80,6 +176,8 @@ def rescaleImage(image, flip_h, flip_v, transpose, display_range, saturated_valu
     display_range - [image value that equals 0, image value that equals 255].
     saturated_value - The value above which the image has saturated the camera.
     use_numpy - (optional) Use numpy even if the C library exists, defaults to False.
+    out - (optional) A numpy.uint8 array of the same shape as image to store the
+          rescaled image in. This is only used if there is no flipping or transposing.
 
     return [numpy.uint8 image, original image minimum, original image maximum]
     """
@@ -98,9 +196,46 @@ def rescaleImage(image, flip_h, flip_v, transpose, display_range, saturated_valu
     else:
         saturated_value = 65536
         max_range = 255.0
+
+    # The C library expects a C contiguous image, this is a no-op if it
+    # already is one.
+    if (image_manip is not None) and (not use_numpy):
+        image = numpy.ascontiguousarray(image)
+
+    # Check if we can store the result in out.
+    if (out is not None) and ((op_code != "000") or (out.shape != image.shape)):
+        out = None
+
+    # Use C library for image manipulation. There is no flipping or transposing
+    # so each tile of rows in the image can be processed independently.
+    if (image_manip is not None) and (not use_numpy) and (op_code == "000"):
+
+        if out is None:
+            rescaled = numpy.empty((image.shape[0], image.shape[1]), dtype = numpy.uint8)
+        else:
+            rescaled = out
+
+        def rescaleTile(start, end):
+            image_min = ctypes.c_int(0)
+            image_max = ctypes.c_int(0)
+            image_manip.rescaleImage000(rescaled[start:end],
+                                        image[start:end],
+                                        end - start,
+                                        image.shape[1],
+                                        display_range[0],
+                                        display_range[1],
+                                        saturated_value,
+                                        max_range,
+                                        ctypes.byref(image_min),
+                                        ctypes.byref(image_max))
+            return [image_min.value, image_max.value]
+
+        results = runTiled(rescaleTile, image.shape[0], image.size)
+        image_min = min([elt[0] for elt in results])
+        image_max = max([elt[1] for elt in results])
         
     # Use C library for image manipulation, this will be faster and less memory intensive.
-    if (image_manip is not None) and (not use_numpy):
+    elif (image_manip is not None) and (not use_numpy):
 
         if transpose:
             rescaled = numpy.empty((image.shape[1], image.shape[0]), dtype = numpy.uint8)
@@ -127,32 +262,35 @@ def rescaleImage(image, flip_h, flip_v, transpose, display_range, saturated_valu
         image_min = image_min.value
         image_max = image_max.value
 
-    # Fall back to using numpy.
+    # Fall back to using numpy and a look up table.
     else:
-        image_min = numpy.min(image)
-        image_max = numpy.max(image)
-            
+        image_lut = getLUT(display_range, saturated_value, max_range)
+        if out is None:
+            rescaled = numpy.empty(image.shape, dtype = numpy.uint8)
+        else:
+            rescaled = out
+
+        def rescaleTile(start, end):
+            tile = image[start:end]
+            numpy.take(image_lut, tile, out = rescaled[start:end], mode = "clip")
+            return [tile.min(), tile.max()]
+
+        results = runTiled(rescaleTile, image.shape[0], image.size)
+        image_min = min([elt[0] for elt in results])
+        image_max = max([elt[1] for elt in results])
+
+        # Re-orient the (smaller) uint8 image.
         if flip_h:
-            image = numpy.fliplr(image)
+            rescaled = numpy.fliplr(rescaled)
             
         if flip_v:
-            image = numpy.flipud(image)
+            rescaled = numpy.flipud(rescaled)
 
         if transpose:
-            image = numpy.transpose(image)
-        
-        rescaled = image.astype(numpy.float64)
-        rescaled = max_range*(rescaled - display_range[0])/(display_range[1] - display_range[0])
-        rescaled[(rescaled > max_range)] = max_range 
-        rescaled[(rescaled < 0.0)] = 0.0
-        
-        # Check for saturated pixels
-        if saturated_value is not None:
-            rescaled[(image >= saturated_value)] = 255.0
+            rescaled = numpy.transpose(rescaled)
 
         # Convert to contiguous uint8 array.
-        rescaled += 0.5
-        rescaled = rescaled.astype(numpy.uint8, order='C')
+        rescaled = numpy.ascontiguousarray(rescaled)
 
     return [rescaled, image_min, image_max]
 
@@ -10,6 +10,7 @@ import types
 
 from PyQt5 import QtCore
 
+import storm_control.sc_library.eventTrace as eventTrace
 import storm_control.sc_library.halExceptions as halExceptions
 import storm_control.sc_library.hdebug as hdebug
 import storm_control.sc_library.parameters as params
@@ -37,6 +38,49 @@ message_id = 0
 #
 valid_messages = {}
 
+#
+# The validators in valid_messages compiled for faster checking in
+# strict mode, [data, resp] CompiledValidator objects keyed by the
+# message type. This is updated by addMessage() and initializeMessages().
+#
+compiled_validators = {}
+
+
+class CompiledValidator(object):
+    """
+    A data or response validator from valid_messages, compiled into the
+    sets of required and allowed fields and a dictionary of field types.
+
+    isValid() only tells you whether the data is valid, use validate()
+    to find out why it is not.
+    """
+    def __init__(self, validator = None, **kwds):
+        super().__init__(**kwds)
+        self.is_none = (validator is None)
+        self.required = frozenset()
+        self.types = {}
+
+        if not self.is_none:
+            self.required = frozenset(item for item in validator if validator[item][0])
+            self.types = {item : validator[item][1] for item in validator}
+
+    def isValid(self, data):
+        if self.is_none:
+            return data is None
+
+        if data is None:
+            return (len(self.required) == 0)
+
+        types = self.types
+        try:
+            for item, value in data.items():
+                if not isinstance(value, types[item]):
+                    return False
+        except KeyError:
+            return False
+        return self.required.issubset(data)
+
+
 def addMessage(name, validator = {}, check_exists = True):
     """
     Modules should call this function at initialization to add additional messages.
@@ -45,6 +89,38 @@ def addMessage(name, validator = {}, check_exists = True):
     if check_exists and name in valid_messages:
         raise halExceptions.HalException("Message " + name + " already exists!")
     valid_messages[name] = validator
+    compileValidator(name)
+
+
+def checkData(message):
+    """
+    Checks that the data field of a message is correct using the compiled
+    validator. This is the same as validateData(), but faster.
+    """
+    if not compiled_validators[message.m_type][0].isValid(message.getData()):
+        validateData(valid_messages[message.m_type].get("data"), message)
+
+
+def checkResponses(message):
+    """
+    Checks that the responses to a message are correct using the compiled
+    validator. This is the same as calling validateResponse() for each
+    response, but faster.
+    """
+    compiled = compiled_validators[message.m_type][1]
+    for response in message.getResponses():
+        if not compiled.isValid(response.getData()):
+            validateResponse(valid_messages[message.m_type].get("resp"), message, response)
+
+
+def compileValidator(name):
+    """
+    Compile the validator for message type 'name'.
+    """
+    global compiled_validators
+    validator = valid_messages[name]
+    compiled_validators[name] = [CompiledValidator(validator.get("data")),
+                                 CompiledValidator(validator.get("resp"))]
     
 
 def chainMessages(send_fn, messages):
@@ -135,6 +211,11 @@ def initializeMessages():
         
         'new shutters file' : {"data" : {"filename" : [True, str]},
                                "resp" : None},
+
+        # Query all the modules for how long they took to process
+        # messages. See HalModule.getProfile().
+        'profile' : {"data" : {"reset" : [True, bool]},
+                     "resp" : {"profile" : [True, dict]}},
         
         'show' : {"data" : {"show" : [True, str]},
                   "resp" : None},
@@ -149,6 +230,11 @@ def initializeMessages():
         'wait for' : {"data" : {"module names" : [True, list]}, "resp" : None}
     }
 
+    global compiled_validators
+    compiled_validators = {}
+    for name in valid_messages:
+        compileValidator(name)
+
     
 def isValidMessageName(name):
     """
@@ -293,8 +379,7 @@ class HalMessage(QtCore.QObject):
     def decRefCount(self, name = None):
 
         # This is helpful for debugging who has not responded to the message.
-        if True:
-            hdebug.logText(",".join(["handled by", str(self.m_id), str(name), self.m_type]))
+        eventTrace.traceEvent("handled by", self.m_id, name, self.m_type)
             
         self.ref_count -= 1
         if (self.ref_count == 0):
@@ -353,7 +438,7 @@ class HalMessage(QtCore.QObject):
         return (self.m_type == m_type)
 
     def logEvent(self, event_name):
-        hdebug.logText(",".join([event_name, str(self.m_id), self.source.module_name, self.m_type]))
+        eventTrace.traceEvent(event_name, self.m_id, self.source.module_name, self.m_type)
 
 #    def refCountIsZero(self):
 #        return (self.ref_count == 0)
@@ -7,6 +7,7 @@ Hazen 01/17
 """
 
 import faulthandler
+import time
 import traceback
 
 from collections import deque
@@ -26,6 +27,35 @@ threadpool = QtCore.QThreadPool.globalInstance()
 # benefit of QT signalling.
 max_job_time = -1
 
+def addProfileTime(profile, m_type, elapsed):
+    """
+    Add elapsed (in seconds) to the [count, total time, maximum time]
+    entry for m_type in a profile dictionary.
+    """
+    if m_type in profile:
+        entry = profile[m_type]
+        entry[0] += 1
+        entry[1] += elapsed
+        entry[2] = max(entry[2], elapsed)
+    else:
+        profile[m_type] = [1, elapsed, elapsed]
+
+def formatProfile(module_name, profile):
+    """
+    Returns a profile (see HalModule.getProfile()) as a string with
+    the slowest message types first.
+    """
+    lines = []
+    for where in ["messages", "workers"]:
+        for m_type, [count, total, max_time] in profile[where].items():
+            lines.append([total, "  {0:s} {1:s} ({2:s}), {3:d} counts, {4:.3f} ms total, {5:.3f} ms max".format(module_name,
+                                                                                                              m_type,
+                                                                                                              where,
+                                                                                                              count,
+                                                                                                              1000.0 * total,
+                                                                                                              1000.0 * max_time)])
+    return "\n".join([elt[1] for elt in sorted(lines, reverse = True)])
+
 def runWorkerTask(module, message, task, job_time_ms = None):
     """
     Use this to handle long running (non-GUI) tasks. See
@@ -79,6 +109,7 @@ class HalWorker(QtCore.QRunnable):
     """
     def __init__(self, job_time_ms = -1, message = None, task = None, **kwds):
         super().__init__(**kwds)
+        self.elapsed = 0.0
         self.job_time_ms = job_time_ms
         self.message = message
         self.task = task
@@ -93,12 +124,16 @@ class HalWorker(QtCore.QRunnable):
         self.hwsignaler.workerStarted.emit(self.message,
                                            self.job_time_ms)
         
+        start_time = time.perf_counter()
         try:
             self.task()
         except Exception as exception:
+            self.elapsed = time.perf_counter() - start_time
             self.hwsignaler.workerError.emit(self.message,
                                              exception,
                                              traceback.format_exc())
+        else:
+            self.elapsed = time.perf_counter() - start_time
         finally:
             self.task_complete = True
             
@@ -124,6 +159,15 @@ class HalModule(QtCore.QObject):
     the order they were received. If a worker is started the next message 
     will get passed to processMessage() until the worker finishes.
 
+    Sub-classes can set the handled_messages class attribute to the set of
+    message types that processMessage() handles, and then HAL core will only
+    send messages of these types to the module. If this is None the module
+    gets all the messages. See getHandledMessages().
+
+    The time spent in processMessage() and in worker tasks is recorded
+    for each message type. This is returned as the response to the
+    'profile' message, which all the modules that handle messages get.
+
     Conventions:
        1. self.view is the GUI view, if any that is associated with this module.
        2. self.control is the controller, if any.
@@ -131,12 +175,17 @@ class HalModule(QtCore.QObject):
     """
     newMessage = QtCore.pyqtSignal(object)
 
+    # The message types that processMessage() handles, None is all types.
+    handled_messages = None
+
     def __init__(self, module_name = "", **kwds):
         super().__init__(**kwds)
         self.module_name = module_name
 
+        self.message_profile = {}
         self.queued_messages = deque()
         self.worker = None
+        self.worker_profile = {}
 
         # Timer for workers.
         self.worker_timer = QtCore.QTimer(self)
@@ -162,6 +211,7 @@ class HalModule(QtCore.QObject):
         """
         Disconnects any workers that have finished and discard them.
         """
+        addProfileTime(self.worker_profile, self.worker.message.m_type, self.worker.elapsed)
         self.worker.hwsignaler.workerDone.disconnect(self.handleWorkerDone)
         self.worker.hwsignaler.workerError.disconnect(self.handleWorkerError)
         self.worker.hwsignaler.workerStarted.disconnect(self.handleWorkerStarted)
@@ -187,6 +237,41 @@ class HalModule(QtCore.QObject):
             else:
                 return self.view.findChild(qt_type, name, options)
 
+    def getHandledMessages(self):
+        """
+        Don't override..
+
+        Returns the set of message types that this module handles, or
+        None if the module should get all the messages.
+
+        If a sub-class overrides processMessage() but doesn't also set
+        handled_messages then it gets all the messages, so that setting
+        handled_messages in a base class can't break its sub-classes.
+        """
+        mro = type(self).__mro__
+        pm_class = next(cls for cls in mro if "processMessage" in cls.__dict__)
+        hm_class = next(cls for cls in mro if "handled_messages" in cls.__dict__)
+
+        # Modules that don't handle any messages.
+        if pm_class is HalModule:
+            return frozenset()
+
+        if (self.handled_messages is None) or (mro.index(pm_class) < mro.index(hm_class)):
+            return None
+        
+        return frozenset(self.handled_messages) | {"profile"}
+
+    def getProfile(self):
+        """
+        Don't override..
+
+        Returns a dictionary with the time spent processing each message
+        type, as [count, total time, maximum time] (in seconds), both in
+        processMessage() ("messages") and in worker tasks ("workers").
+        """
+        return {"messages" : self.message_profile,
+                "workers" : self.worker_profile}
+
     def handleError(self, message, m_error):
         """
         Override this with class specific error handling.
@@ -319,13 +404,18 @@ class HalModule(QtCore.QObject):
         # Get the next message from the queue.
         message = self.queued_messages.popleft()
 
-        try:
-            self.processMessage(message)
-        except Exception as exception:
-            message.addError(halMessage.HalMessageError(source = self.module_name,
-                                                        message = str(exception),
-                                                        m_exception = exception,
-                                                        stack_trace = traceback.format_exc()))
+        if (message.m_type == "profile"):
+            self.processProfile(message)
+        else:
+            start_time = time.perf_counter()
+            try:
+                self.processMessage(message)
+            except Exception as exception:
+                message.addError(halMessage.HalMessageError(source = self.module_name,
+                                                            message = str(exception),
+                                                            m_exception = exception,
+                                                            stack_trace = traceback.format_exc()))
+            addProfileTime(self.message_profile, message.m_type, time.perf_counter() - start_time)
         message.decRefCount(name = self.module_name)
 
         # Check if this is being handled by a worker. If it is then we
@@ -338,6 +428,16 @@ class HalModule(QtCore.QObject):
         if (len(self.queued_messages) > 0):
             self.queued_messages_timer.start()
 
+    def processProfile(self, message):
+        """
+        Don't override..
+        """
+        message.addResponse(halMessage.HalMessageResponse(source = self.module_name,
+                                                          data = {"profile" : self.getProfile()}))
+        if message.getData()["reset"]:
+            self.message_profile = {}
+            self.worker_profile = {}
+
     def sendMessage(self, message):
         """
         Use this to send a message from the module.
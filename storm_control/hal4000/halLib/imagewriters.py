@@ -7,15 +7,20 @@ Hazen 03/17
 
 import copy
 import datetime
+import numpy
+import os
+import shutil
 import struct
-import tifffile
 import time
 
 from PyQt5 import QtCore
 
+import storm_control.sc_library.cdax as cdax
 import storm_control.sc_library.halExceptions as halExceptions
 import storm_control.sc_library.parameters as params
 
+import storm_control.hal4000.halLib.tiffwriter as tiffwriter
+
 
 class ImageWriterException(halExceptions.HalException):
     pass
@@ -32,17 +37,24 @@ def availableFileFormats(test_mode):
     #
 
     if test_mode:
-        return [".dax", ".tif", ".big.tif", ".test"]
+        return [".dax", ".cdax", ".tif", ".big.tif", ".test"]
     else:
-        return [".dax", ".tif", ".big.tif"]
+        return [".dax", ".cdax", ".tif", ".big.tif"]
 
-def createFileWriter(camera_functionality, film_settings):
+def createFileWriter(camera_functionality, film_settings, frame_metadata = None):
     """
     This is convenience function which creates the appropriate file writer
     based on the filetype.
+
+    frame_metadata is an (optional) dictionary with the current stage
+    position and focus lock offset, see CDaxFile.
     """
     ft = film_settings.getFiletype()
-    if (ft == ".dax"):
+    if (ft == ".cdax"):
+        return CDaxFile(camera_functionality = camera_functionality,
+                        film_settings = film_settings,
+                        frame_metadata = frame_metadata)
+    elif (ft == ".dax"):
         return DaxFile(camera_functionality = camera_functionality,
                        film_settings = film_settings)
     elif (ft == ".big.tif"):
@@ -69,28 +81,90 @@ class BaseFileWriter(object):
         self.cam_fn = camera_functionality
         self.film_settings = film_settings
         self.stopped = False
+        self.write_error = None
+        self.writer_thread = None
 
         # This is the frame size in MB.
         self.frame_size = self.cam_fn.getParameter("bytes_per_frame") *  0.000000953674
         self.number_frames = 0
 
+        # This is the frame shape (y, x) in pixels.
+        self.frame_shape = (self.cam_fn.getParameter("y_pixels"),
+                            self.cam_fn.getParameter("x_pixels"))
+
         # Figure out the filename.
         self.basename = self.film_settings.getBasename()
         if (len(self.cam_fn.getParameter("extension")) != 0):
             self.basename += "_" + self.cam_fn.getParameter("extension")
         self.filename = self.basename + self.film_settings.getFiletype()
 
+        # Create the writer thread, if requested.
+        if (self.film_settings.getWriterBuffers() > 0):
+            self.writer_thread = WriterThread(frame_pixels = self.frame_shape[0] * self.frame_shape[1],
+                                              n_buffers = self.film_settings.getWriterBuffers(),
+                                              write_fn = self.writeFrames)
+            self.writer_thread.startWriter()
+
         # Connect the camera functionality.
-        self.cam_fn.newFrame.connect(self.saveFrame)
+        self.cam_fn.newFrames.connect(self.saveFrames)
         self.cam_fn.stopped.connect(self.handleStopped)
 
     def closeWriter(self):
+        """
+        Sub-classes should call this first so that any frames that
+        are still buffered get written before the file is closed.
+
+        If the writer thread failed the error is saved, see getWriteError().
+        """
         assert self.stopped
-        self.cam_fn.newFrame.disconnect(self.saveFrame)
+        self.cam_fn.newFrames.disconnect(self.saveFrames)
         self.cam_fn.stopped.disconnect(self.handleStopped)
+        if self.writer_thread is not None:
+            try:
+                self.writer_thread.stopWriter()
+            except ImageWriterException as exception:
+                self.write_error = exception
+
+    def getDroppedFrames(self):
+        """
+        Returns the number of frames that were not saved because
+        all of the writer thread buffers were full.
+        """
+        if self.writer_thread is not None:
+            return self.writer_thread.getDroppedFrames()
+        return 0
 
+    def getQueueDepth(self):
+        """
+        Returns the number of frames waiting to be written.
+        """
+        if self.writer_thread is not None:
+            return self.writer_thread.getQueueDepth()
+        return 0
+    
     def getSize(self):
+        """
+        Returns the amount of data (in MB) that has been written.
+        """
+        if self.writer_thread is not None:
+            return self.writer_thread.getBytesWritten() * 0.000000953674
         return self.frame_size * self.number_frames
+
+    def getThroughput(self):
+        """
+        Returns the achieved write rate in MB/second, or None if this 
+        is not known.
+        """
+        if self.writer_thread is not None:
+            return self.writer_thread.getThroughput()
+        return None
+
+    def getWriteError(self):
+        """
+        Returns the ImageWriterException if the writer thread failed,
+        otherwise None.
+        """
+        return self.write_error
     
     def handleStopped(self):
         self.stopped = True
@@ -98,17 +172,104 @@ class BaseFileWriter(object):
     def isStopped(self):
         return self.stopped
         
-    def saveFrame(self):
-        self.number_frames += 1
+    def saveFrame(self, frame):
+        np_data = frame.getData()
+        if self.writer_thread is not None:
+            if self.writer_thread.addFrame(np_data):
+                self.number_frames += 1
+        else:
+            self.number_frames += 1
+            self.writeFrames(np_data.reshape((1, -1)))
+
+    def saveFrames(self, frames):
+        for frame in frames:
+            self.saveFrame(frame)
+
+    def writeFrames(self, frames):
+        """
+        Sub-classes should override this to write frames to disk. frames
+        is a 2D numpy.uint16 array with one frame per row.
+
+        Note: This can be called from the writer thread.
+        """
+        assert False
+
+
+class CDaxFile(BaseFileWriter):
+    """
+    Chunked and compressed .dax file writing class, see sc_library/cdax.py
+    for the details of the format.
+
+    A row of per-frame metadata is recorded for each frame that is saved.
+    This includes the current values of 'stage_x', 'stage_y' and 'lock_offset'
+    in the frame_metadata dictionary, which the film module updates as these
+    change.
+    """
+    def __init__(self, chunk_frames = 16, compression = cdax.COMPRESSION_SHUFFLE_ZLIB, frame_metadata = None, **kwds):
+        super().__init__(**kwds)
+        self.frame_metadata = frame_metadata
+        self.frame_table = []
+        self.cdax_writer = cdax.CDaxWriter(chunk_frames = chunk_frames,
+                                           compression = compression,
+                                           filename = self.filename,
+                                           x_pixels = self.frame_shape[1],
+                                           y_pixels = self.frame_shape[0])
+
+    def closeWriter(self):
+        super().closeWriter()
+        frame_table = numpy.array(self.frame_table, dtype = cdax.frame_dtype)
+        self.cdax_writer.close(frame_table = frame_table)
+
+    def saveFrame(self, frame):
+        number_frames = self.number_frames
+        super().saveFrame(frame)
+
+        # Only record metadata for frames that were not dropped.
+        if (self.number_frames > number_frames):
+            md = self.frame_metadata if self.frame_metadata is not None else {}
+            self.frame_table.append((frame.frame_number,
+                                     time.time(),
+                                     md.get("stage_x", numpy.nan),
+                                     md.get("stage_y", numpy.nan),
+                                     md.get("lock_offset", numpy.nan)))
+
+    def writeFrames(self, frames):
+        self.cdax_writer.addFrames(frames)
 
 
 class DaxFile(BaseFileWriter):
     """
     Dax file writing class.
+
+    For fixed length films the file is pre-allocated at the full size of
+    the film and the frames are written into a memory map of the file. If
+    the film is stopped early the file is truncated when it is closed.
     """
     def __init__(self, **kwds):
         super().__init__(**kwds)
-        self.fp = open(self.filename, "wb")
+        self.dax_mmap = None
+        self.frames_written = 0
+        self.mmap_frames = 0
+
+        frame_pixels = self.frame_shape[0] * self.frame_shape[1]
+        film_bytes = 2 * frame_pixels * self.film_settings.getFilmLength()
+        if self.film_settings.isFixedLength() and (film_bytes > 0) and self.fitsOnDisk(film_bytes):
+            self.fp = open(self.filename, "w+b")
+            if hasattr(os, "posix_fallocate"):
+                os.posix_fallocate(self.fp.fileno(), 0, film_bytes)
+            else:
+                self.fp.truncate(film_bytes)
+            self.mmap_frames = self.film_settings.getFilmLength()
+            self.dax_mmap = numpy.memmap(self.fp,
+                                         dtype = numpy.uint16,
+                                         mode = "r+",
+                                         shape = (self.mmap_frames, frame_pixels))
+        else:
+            self.fp = open(self.filename, "wb")
+
+    def closeMemmap(self):
+        self.dax_mmap.flush()
+        self.dax_mmap = None
 
     def closeWriter(self):
         """
@@ -116,6 +277,9 @@ class DaxFile(BaseFileWriter):
         now stored in the .xml file that is saved with each recording.
         """
         super().closeWriter()
+        if self.dax_mmap is not None:
+            self.closeMemmap()
+            self.fp.truncate(2 * self.frame_shape[0] * self.frame_shape[1] * self.frames_written)
         self.fp.close()
 
         w = str(self.cam_fn.getParameter("x_pixels"))
@@ -132,10 +296,30 @@ class DaxFile(BaseFileWriter):
                 inf_fp.write("y_end = " + h + "\n")
             inf_fp.close()
 
-    def saveFrame(self, frame):
-        super().saveFrame()
-        np_data = frame.getData()
-        np_data.tofile(self.fp)
+    def fitsOnDisk(self, film_bytes):
+        """
+        Only pre-allocate if there is enough space, otherwise we'll 
+        just fill the disk up (or fail) as we go as before.
+        """
+        directory = os.path.dirname(os.path.abspath(self.filename))
+        return (film_bytes < shutil.disk_usage(directory).free)
+
+    def writeFrames(self, frames):
+        if self.dax_mmap is not None:
+            n_frames = min(frames.shape[0], self.mmap_frames - self.frames_written)
+            self.dax_mmap[self.frames_written:self.frames_written+n_frames,:] = frames[:n_frames,:]
+            self.frames_written += n_frames
+            if (n_frames == frames.shape[0]):
+                return
+
+            # This camera is providing more frames than expected (it is
+            # probably not the time base), so switch to appending.
+            frames = frames[n_frames:,:]
+            self.closeMemmap()
+            self.fp.seek(0, os.SEEK_END)
+
+        frames.tofile(self.fp)
+        self.frames_written += frames.shape[0]
 
 
 class SPEFile(BaseFileWriter):
@@ -178,10 +362,8 @@ class SPEFile(BaseFileWriter):
         self.fp.seek(1446)
         self.fp.write(struct.pack("i", self.number_frames))
 
-    def saveFrame(self, frame):
-        super().saveFrame()
-        np_data = frame.getData()
-        np_data.tofile(self.file_ptrs[index])
+    def writeFrames(self, frames):
+        frames.tofile(self.fp)
 
 
 class TestFile(DaxFile):
@@ -206,30 +388,172 @@ class TestFile(DaxFile):
 class TIFFile(BaseFileWriter):
     """
     TIF file writing class. This supports both normal and 'big' tiff.
+
+    The frames are written with tiffwriter.TiffWriter, which streams the
+    frames to disk without creating a new IFD for every call.
     """
     def __init__(self, bigtiff = False, **kwds):
         super().__init__(**kwds)
-        self.metadata = {'unit' : 'um'}
+        n_frames = None
+        if self.film_settings.isFixedLength():
+            n_frames = self.film_settings.getFilmLength()
+
         if bigtiff:
-            self.resolution = (25400.0/self.film_settings.getPixelSize(),
-                               25400.0/self.film_settings.getPixelSize())
-            self.tif = tifffile.TiffWriter(self.filename,
-                                           bigtiff = bigtiff)
+            description = '{{"unit": "um"}}'
+            resolution = (25400.0/self.film_settings.getPixelSize(),
+                          25400.0/self.film_settings.getPixelSize())
+            resolution_unit = 2
         else:
-            self.resolution = (1.0/self.film_settings.getPixelSize(), 1.0/self.film_settings.getPixelSize())
-            self.tif = tifffile.TiffWriter(self.filename,
-                                           imagej = True)
+            description = "ImageJ=1.11a\nimages={0:d}\nunit=um\n"
+            resolution = (1.0/self.film_settings.getPixelSize(), 1.0/self.film_settings.getPixelSize())
+            resolution_unit = 1
+
+        self.tif = tiffwriter.TiffWriter(bigtiff = bigtiff,
+                                         description = description,
+                                         filename = self.filename,
+                                         imagej = not bigtiff,
+                                         n_frames = n_frames,
+                                         resolution = resolution,
+                                         resolution_unit = resolution_unit,
+                                         x_pixels = self.frame_shape[1],
+                                         y_pixels = self.frame_shape[0])
 
     def closeWriter(self):
         super().closeWriter()
         self.tif.close()
         
-    def saveFrame(self, frame):
-        super().saveFrame()
-        image = frame.getData()
-        self.tif.save(image.reshape((frame.image_y, frame.image_x)),
-                      metadata = self.metadata,
-                      resolution = self.resolution)
+    def writeFrames(self, frames):
+        self.tif.addFrames(frames)
+
+
+class WriterThread(QtCore.QThread):
+    """
+    Writes frames to disk in a separate thread so that a slow disk
+    does not block the main thread.
+
+    Frames are copied into a ring of pre-allocated buffers in the main
+    thread. The writer thread passes runs of adjacent buffers to write_fn()
+    as a single 2D array, so in most cases several frames are written with
+    a single call. If all of the buffers are full the frame is dropped.
+
+    The buffers are numpy.uint16 by default, other dtypes (including
+    structured dtypes) can be used to write other kinds of records.
+
+    If write_fn() fails the remaining frames are dropped, and the error
+    is raised (as an ImageWriterException) by stopWriter().
+    """
+    def __init__(self, dtype = numpy.uint16, frame_pixels = None, max_coalesce = 64, n_buffers = None, write_fn = None, **kwds):
+        super().__init__(**kwds)
+        self.bytes_written = 0
+        self.dropped_frames = 0
+        self.max_coalesce = max_coalesce
+        self.n_buffers = n_buffers
+        self.n_read = 0
+        self.n_written = 0
+        self.running = False
+        self.start_time = None
+        self.last_write_time = None
+        self.write_error = None
+        self.write_fn = write_fn
+
+        self.buffers = numpy.zeros((n_buffers, frame_pixels), dtype = dtype)
+        self.mutex = QtCore.QMutex()
+        self.wait_condition = QtCore.QWaitCondition()
+
+    def addFrame(self, np_data):
+        """
+        Copy a frame into the next free buffer. This is called from the main
+        thread. Returns False if the frame was dropped, either because all
+        the buffers are full or because the writer thread failed.
+        """
+        self.mutex.lock()
+        if (self.write_error is not None) or ((self.n_read - self.n_written) >= self.n_buffers):
+            self.dropped_frames += 1
+            self.mutex.unlock()
+            return False
+        if self.start_time is None:
+            self.start_time = time.perf_counter()
+        index = self.n_read % self.n_buffers
+        self.mutex.unlock()
+
+        # The writer thread won't touch this buffer until n_read is incremented.
+        self.buffers[index,:] = np_data.ravel()
+
+        self.mutex.lock()
+        self.n_read += 1
+        self.wait_condition.wakeAll()
+        self.mutex.unlock()
+        return True
+
+    def getBytesWritten(self):
+        return self.bytes_written
+
+    def getDroppedFrames(self):
+        return self.dropped_frames
+
+    def getQueueDepth(self):
+        return self.n_read - self.n_written
+
+    def getThroughput(self):
+        """
+        The average rate at which data was written in MB/second.
+        """
+        if self.start_time is None:
+            return 0.0
+        if self.last_write_time is None:
+            elapsed = time.perf_counter() - self.start_time
+        else:
+            elapsed = self.last_write_time - self.start_time
+        if (elapsed <= 0.0):
+            return 0.0
+        return self.bytes_written * 0.000000953674 / elapsed
+        
+    def run(self):
+        while True:
+            self.mutex.lock()
+            while self.running and (self.n_read == self.n_written):
+                self.wait_condition.wait(self.mutex)
+            if (self.n_read == self.n_written):
+                self.mutex.unlock()
+                break
+
+            # Only the contiguous part of the ring can be written in one call.
+            start = self.n_written % self.n_buffers
+            count = min(self.n_read - self.n_written, self.n_buffers - start, self.max_coalesce)
+            self.mutex.unlock()
+
+            try:
+                self.write_fn(self.buffers[start:start+count,:])
+            except Exception as exception:
+                self.mutex.lock()
+                self.write_error = exception
+                self.dropped_frames += self.n_read - self.n_written
+                self.n_written = self.n_read
+                self.running = False
+                self.mutex.unlock()
+                break
+
+            self.mutex.lock()
+            self.n_written += count
+            self.bytes_written += self.buffers[start:start+count,:].nbytes
+            self.last_write_time = time.perf_counter()
+            self.mutex.unlock()
+
+    def startWriter(self):
+        self.running = True
+        self.start(QtCore.QThread.HighPriority)
+
+    def stopWriter(self):
+        """
+        Stop the thread once all the buffered frames have been written.
+        """
+        self.mutex.lock()
+        self.running = False
+        self.wait_condition.wakeAll()
+        self.mutex.unlock()
+        self.wait()
+        if self.write_error is not None:
+            raise ImageWriterException("Writer thread failed: " + str(self.write_error))
 
 
 #
@@ -0,0 +1,323 @@
+#!/usr/bin/env python
+"""
+A streaming TIFF / BigTIFF writer for 16 bit monochrome movies.
+
+Each frame is stored as a single uncompressed strip so the image data
+can be written straight from the camera buffers. Unlike calling
+tifffile for every frame, the IFDs are not written one frame at a time:
+
+  1. If the number of frames is known the whole IFD chain is written
+     when the file is opened and the frames are then written as one
+     contiguous block, exactly like a .dax file. If the film is stopped
+     early the chain is terminated at the last frame and the file is
+     truncated when it is closed.
+
+  2. Otherwise the IFDs are written in batches, after every ifd_batch
+     frames, and the previous batch is linked to the new batch.
+
+All of the IFDs share the same resolution values. Only the first IFD
+has an image description.
+
+ImageJ (and tifffile) read the frames of a file with an ImageJ image
+description as a single contiguous block of data. In case (2) the IFDs
+are between the batches of frames, so the ImageJ description is removed
+when the file is closed if there was more than one batch.
+"""
+
+import fractions
+import numpy
+import struct
+
+
+# TIFF field types.
+ASCII = 2
+SHORT = 3
+LONG = 4
+RATIONAL = 5
+LONG8 = 16
+
+# Don't pre-write IFD chains that are longer than this.
+max_prewritten_ifds = 100000
+
+
+class TiffWriterException(Exception):
+    pass
+
+
+def toRational(value):
+    """
+    Returns value as (numerator, denominator), both of which must
+    fit in a uint32.
+    """
+    frac = fractions.Fraction(value).limit_denominator(100000)
+    while (frac.numerator > 0xffffffff):
+        frac = fractions.Fraction(value).limit_denominator(max(1, frac.denominator // 10))
+        if (frac.denominator == 1):
+            break
+    return [min(frac.numerator, 0xffffffff), frac.denominator]
+
+
+class TiffWriter(object):
+    """
+    Writes 16 bit monochrome frames to a TIFF (bigtiff = False) or a
+    BigTIFF (bigtiff = True) file.
+
+    description - The image description, this is only saved with the
+                  first frame. If this contains '{0:d}' it will be
+                  formatted with the number of frames in the movie.
+
+    imagej - The description is an ImageJ description, this is removed
+             if the frame data is not contiguous.
+
+    resolution - The [x, y] resolution in pixels per resolution_unit.
+
+    resolution_unit - 1 = none, 2 = inch, 3 = cm.
+    """
+    def __init__(self,
+                 bigtiff = False,
+                 description = "",
+                 filename = None,
+                 ifd_batch = 64,
+                 imagej = False,
+                 n_frames = None,
+                 resolution = (1.0, 1.0),
+                 resolution_unit = 1,
+                 x_pixels = None,
+                 y_pixels = None,
+                 **kwds):
+        super().__init__(**kwds)
+        self.bigtiff = bigtiff
+        self.contiguous = True
+        self.data_end = None
+        self.description = description
+        self.frame_bytes = 2 * x_pixels * y_pixels
+        self.ifd_batch = ifd_batch
+        self.imagej = imagej
+        self.n_frames = 0
+        self.n_prewritten = 0
+        self.pending = []
+        self.x_pixels = x_pixels
+        self.y_pixels = y_pixels
+
+        if bigtiff:
+            self.ifd_count_fmt = "<Q"
+            self.entry_fmt = "<HHQ8s"
+            self.offset_fmt = "<Q"
+            self.offset_size = 8
+            self.offset_type = LONG8
+        else:
+            self.ifd_count_fmt = "<H"
+            self.entry_fmt = "<HHI4s"
+            self.offset_fmt = "<I"
+            self.offset_size = 4
+            self.offset_type = LONG
+
+        self.fp = open(filename, "w+b")
+
+        # Header. The offset of the first IFD is filled in later.
+        if bigtiff:
+            self.fp.write(struct.pack("<2sHHHQ", b"II", 43, 8, 0, 0))
+            self.last_next_offset = 8
+        else:
+            self.fp.write(struct.pack("<2sHI", b"II", 42, 0))
+            self.last_next_offset = 4
+
+        # Data shared by all the IFDs. The description is padded so
+        # that it can be rewritten once we know the number of frames.
+        self.description_size = len(self.description.format(1000000000).encode("ascii")) + 1
+        self.description_size = max(self.description_size, self.offset_size + 1)
+        self.description_offset = self.fp.tell()
+        self.fp.write(self.formatDescription(0))
+
+        # Resolution values. In BigTIFF these fit in the IFD entry.
+        self.rationals = [struct.pack("<II", *toRational(elt)) for elt in resolution]
+        self.resolution_offset = self.fp.tell()
+        if not bigtiff:
+            for elt in self.rationals:
+                self.fp.write(elt)
+        self.resolution_unit = resolution_unit
+
+        # IFD sizes, the first IFD also has the description.
+        self.ifd_size = self.ifdSize(self.ifdEntries(0, False))
+        self.first_ifd_size = self.ifdSize(self.ifdEntries(0, True))
+
+        # Pre-write the IFD chain, then the data follows contiguously.
+        if (n_frames is not None) and (n_frames > 0) and (n_frames <= max_prewritten_ifds):
+            self.n_prewritten = n_frames
+            ifds_start = self.fp.tell()
+            self.data_start = ifds_start + self.first_ifd_size + (n_frames - 1) * self.ifd_size
+            self.checkOffset(self.data_start + n_frames * self.frame_bytes)
+            self.writeIFDs(list(range(n_frames)),
+                           [self.data_start + i * self.frame_bytes for i in range(n_frames)])
+            self.fp.seek(self.data_start)
+
+    def addFrames(self, frames):
+        """
+        frames is a 2D numpy.uint16 array with one frame per row.
+        """
+        if (self.n_frames + frames.shape[0]) <= self.n_prewritten:
+            frames.astype("<u2", copy = False).tofile(self.fp)
+            self.n_frames += frames.shape[0]
+            self.data_end = self.fp.tell()
+            return
+
+        # More frames than we pre-wrote IFDs for, switch to batch mode.
+        if (self.n_prewritten > 0) and (self.n_frames < self.n_prewritten):
+            n = self.n_prewritten - self.n_frames
+            self.addFrames(frames[:n,:])
+            frames = frames[n:,:]
+
+        while (frames.shape[0] > 0):
+            n = min(frames.shape[0], self.ifd_batch - len(self.pending))
+            offset = self.fp.tell()
+            self.checkOffset(offset + n * self.frame_bytes)
+
+            # Check if there are IFDs between these frames and the previous frames.
+            if (self.data_end is not None) and (offset != self.data_end):
+                self.contiguous = False
+            self.data_end = offset + n * self.frame_bytes
+
+            frames[:n,:].astype("<u2", copy = False).tofile(self.fp)
+            for i in range(n):
+                self.pending.append([self.n_frames + i, offset + i * self.frame_bytes])
+            self.n_frames += n
+            if (len(self.pending) >= self.ifd_batch):
+                self.writePending()
+            frames = frames[n:,:]
+
+    def checkOffset(self, offset):
+        if (not self.bigtiff) and (offset > 0xffffffff):
+            raise TiffWriterException("File is too large for TIFF, use BigTIFF.")
+
+    def close(self):
+        if (self.n_frames < self.n_prewritten):
+
+            # Terminate the IFD chain at the last frame that was written and
+            # discard the unused space for frames.
+            self.linkIFD(self.nextOffsetOffset(max(self.n_frames, 1) - 1), 0)
+            self.fp.truncate(self.data_start + self.n_frames * self.frame_bytes)
+        else:
+            self.writePending()
+
+        # Update the description with the number of frames.
+        if self.imagej and not self.contiguous:
+            self.description = ""
+        self.fp.seek(self.description_offset)
+        self.fp.write(self.formatDescription(self.n_frames))
+        self.fp.close()
+
+    def formatDescription(self, n_frames):
+        text = self.description.format(n_frames).encode("ascii")
+        return text + b"\n" * (self.description_size - 1 - len(text)) + b"\0"
+
+    def ifdEntries(self, strip_offset, first):
+        """
+        Returns the list of IFD entries as [tag, type, count, value]. The
+        value is either a number or the bytes to store in the entry.
+        """
+        if self.bigtiff:
+            [x_resolution, y_resolution] = self.rationals
+        else:
+            [x_resolution, y_resolution] = [self.resolution_offset, self.resolution_offset + 8]
+
+        entries = [[256, LONG, 1, self.x_pixels],
+                   [257, LONG, 1, self.y_pixels],
+                   [258, SHORT, 1, 16],
+                   [259, SHORT, 1, 1],
+                   [262, SHORT, 1, 1]]
+        if first:
+            entries.append([270, ASCII, self.description_size, self.description_offset])
+        entries += [[273, self.offset_type, 1, strip_offset],
+                    [277, SHORT, 1, 1],
+                    [278, LONG, 1, self.y_pixels],
+                    [279, self.offset_type, 1, self.frame_bytes],
+                    [282, RATIONAL, 1, x_resolution],
+                    [283, RATIONAL, 1, y_resolution],
+                    [296, SHORT, 1, self.resolution_unit],
+                    [339, SHORT, 1, 1]]
+        return entries
+
+    def ifdSize(self, entries):
+        return struct.calcsize(self.ifd_count_fmt) + len(entries) * struct.calcsize(self.entry_fmt) + self.offset_size
+
+    def linkIFD(self, next_offset_offset, ifd_offset):
+        """
+        Set the 'next IFD' offset at next_offset_offset to ifd_offset.
+        """
+        position = self.fp.tell()
+        self.fp.seek(next_offset_offset)
+        self.fp.write(struct.pack(self.offset_fmt, ifd_offset))
+        self.fp.seek(position)
+
+    def nextOffsetOffset(self, frame_number):
+        """
+        Returns the location of the 'next IFD' offset of a pre-written IFD.
+        """
+        ifds_start = self.data_start - self.first_ifd_size - (self.n_prewritten - 1) * self.ifd_size
+        if (frame_number == 0):
+            return ifds_start + self.first_ifd_size - self.offset_size
+        else:
+            return ifds_start + self.first_ifd_size + frame_number * self.ifd_size - self.offset_size
+
+    def packEntry(self, tag, e_type, count, value):
+        if isinstance(value, bytes):
+            packed = value
+        elif (e_type == SHORT) and (count == 1):
+            packed = struct.pack("<H", value)
+        elif (e_type == LONG) and (count == 1):
+            packed = struct.pack("<I", value)
+        else:
+            packed = struct.pack(self.offset_fmt, value)
+        return struct.pack(self.entry_fmt, tag, e_type, count, packed.ljust(self.offset_size, b"\0"))
+
+    def writeIFDs(self, frame_numbers, strip_offsets):
+        """
+        Write a linked block of IFDs at the current position and link the
+        previous IFD (or the header) to the first IFD in the block.
+        """
+        data = bytearray()
+        start = self.fp.tell()
+        for i in range(len(frame_numbers)):
+            entries = self.ifdEntries(strip_offsets[i], (frame_numbers[i] == 0))
+            data += struct.pack(self.ifd_count_fmt, len(entries))
+            for entry in entries:
+                data += self.packEntry(*entry)
+            if (i == (len(frame_numbers) - 1)):
+                next_offset = 0
+            else:
+                next_offset = start + len(data) + self.offset_size
+            data += struct.pack(self.offset_fmt, next_offset)
+        self.checkOffset(start + len(data))
+        self.fp.write(data)
+        self.linkIFD(self.last_next_offset, start)
+        self.last_next_offset = start + len(data) - self.offset_size
+
+    def writePending(self):
+        if (len(self.pending) > 0):
+            self.writeIFDs([elt[0] for elt in self.pending],
+                           [elt[1] for elt in self.pending])
+            self.pending = []
+
+#
+# The MIT License
+#
+# Copyright (c) 2026 Babcock Lab, Harvard University
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
@@ -302,6 +302,17 @@ class IlluminationView(halDialog.HalDialog):
 
 
 class Illumination(halModule.HalModule):
+    handled_messages = {"configuration",
+                        "configure1",
+                        "current parameters",
+                        "get functionality",
+                        "new parameters",
+                        "new shutters file",
+                        "show",
+                        "start",
+                        "start film",
+                        "stop film"}
+
 
     def __init__(self, module_params = None, qt_settings = None, **kwds):
         super().__init__(**kwds)
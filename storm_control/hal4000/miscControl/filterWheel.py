@@ -86,6 +86,11 @@ class FilterWheelView(halDialog.HalDialog):
 
 
 class FilterWheel(halModule.HalModule):
+    handled_messages = {"configure1",
+                        "new parameters",
+                        "show",
+                        "start"}
+
 
     def __init__(self, module_params = None, qt_settings = None, **kwds):
         super().__init__(**kwds)
@@ -106,6 +106,10 @@ class GalvoView(halDialog.HalDialog):
 
 
 class Galvo(halModule.HalModule):
+    handled_messages = {"configure1",
+                        "show",
+                        "start"}
+
 
     def __init__(self, module_params = None, qt_settings = None, **kwds):
         super().__init__(**kwds)
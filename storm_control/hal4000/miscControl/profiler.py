@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+"""
+Displays how long each module is taking to process messages. This
+is useful for figuring out which module is slowing down HAL, for
+example when starting a film.
+"""
+
+from PyQt5 import QtCore, QtWidgets
+
+import storm_control.hal4000.halLib.halDialog as halDialog
+import storm_control.hal4000.halLib.halMessage as halMessage
+import storm_control.hal4000.halLib.halModule as halModule
+
+import storm_control.hal4000.qtdesigner.profiler_ui as profilerUi
+
+
+class NumericTableWidgetItem(QtWidgets.QTableWidgetItem):
+    """
+    A table item that sorts by value rather than by text.
+    """
+    def __init__(self, text, value, **kwds):
+        super().__init__(text, **kwds)
+        self.value = value
+        self.setTextAlignment(QtCore.Qt.AlignRight | QtCore.Qt.AlignVCenter)
+
+    def __lt__(self, other):
+        return self.value < other.value
+
+
+class ProfilerView(halDialog.HalDialog):
+    """
+    Manages the profiler GUI.
+    """
+    profileRequest = QtCore.pyqtSignal(bool)
+
+    def __init__(self, **kwds):
+        super().__init__(**kwds)
+
+        # Load UI
+        self.ui = profilerUi.Ui_Dialog()
+        self.ui.setupUi(self)
+
+        self.ui.refreshButton.clicked.connect(self.handleRefresh)
+        self.ui.resetButton.clicked.connect(self.handleReset)
+
+    def handleRefresh(self, boolean):
+        self.profileRequest.emit(False)
+
+    def handleReset(self, boolean):
+        self.profileRequest.emit(True)
+
+    def setProfiles(self, profiles):
+        """
+        profiles is a dictionary of module profiles keyed by module name.
+        """
+        rows = []
+        for module_name in profiles:
+            for where in ["messages", "workers"]:
+                for m_type, [count, total, max_time] in profiles[module_name][where].items():
+                    rows.append([module_name, m_type, where, count, total, max_time])
+
+        table = self.ui.profileTableWidget
+        table.setSortingEnabled(False)
+        table.setRowCount(len(rows))
+        for i, [module_name, m_type, where, count, total, max_time] in enumerate(rows):
+            table.setItem(i, 0, QtWidgets.QTableWidgetItem(module_name))
+            table.setItem(i, 1, QtWidgets.QTableWidgetItem(m_type))
+            table.setItem(i, 2, QtWidgets.QTableWidgetItem(where))
+            table.setItem(i, 3, NumericTableWidgetItem(str(count), count))
+            for j, value in enumerate([total, total/count, max_time]):
+                table.setItem(i, 4 + j, NumericTableWidgetItem("{0:.3f}".format(1000.0 * value), value))
+        table.setSortingEnabled(True)
+        table.sortItems(4, QtCore.Qt.DescendingOrder)
+        table.resizeColumnsToContents()
+
+
+class Profiler(halModule.HalModule):
+    handled_messages = {"configure1",
+                        "show",
+                        "start"}
+
+    def __init__(self, module_params = None, qt_settings = None, **kwds):
+        super().__init__(**kwds)
+
+        self.view = ProfilerView(module_name = self.module_name)
+        self.view.halDialogInit(qt_settings,
+                                module_params.get("setup_name") + " profiler")
+        self.view.profileRequest.connect(self.handleProfileRequest)
+
+    def cleanUp(self, qt_settings):
+        self.view.cleanUp(qt_settings)
+
+    def handleProfileRequest(self, reset):
+        self.sendMessage(halMessage.HalMessage(m_type = "profile",
+                                               data = {"reset" : reset}))
+
+    def handleResponses(self, message):
+        if message.isType("profile"):
+            profiles = {}
+            for response in message.getResponses():
+                profiles[response.source] = response.getData()["profile"]
+            self.view.setProfiles(profiles)
+
+    def processMessage(self, message):
+
+        if message.isType("configure1"):
+            self.sendMessage(halMessage.HalMessage(m_type = "add to menu",
+                                                   data = {"item name" : "Profiler",
+                                                           "item data" : "profiler"}))
+
+        elif message.isType("show"):
+            if (message.getData()["show"] == "profiler"):
+                self.handleProfileRequest(False)
+                self.view.show()
+
+        elif message.isType("start"):
+            if message.getData()["show_gui"]:
+                self.view.showIfVisible()
+
+
+#
+# The MIT License
+#
+# Copyright (c) 2026 Babcock Lab, Harvard University
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
@@ -46,6 +46,11 @@ class Mosaic(halModule.HalModule):
     This sends the following messages:
      'pixel size'
     """
+    handled_messages = {"configure1",
+                        "new parameters",
+                        "stop film",
+                        "tcp message"}
+
     def __init__(self, module_params = None, qt_settings = None, **kwds):
         super().__init__(**kwds)
 
@@ -6,8 +6,9 @@ data from a camera.
 Hazen 3/17.
 """
 
-from PyQt5 import QtCore, QtGui, QtWidgets
+from PyQt5 import QtCore, QtGui, QtWidgets, sip
 
+import math
 import numpy
 
 import storm_control.hal4000.halLib.c_image_manipulation_c as c_image
@@ -23,8 +24,26 @@ class QtCameraGraphicsItem(QtWidgets.QGraphicsItem):
 
     If the image is binned then the rendered image needs to be
     up-sampled appropriately to compensate for the binning.
+
+    Rendering modes (render_mode):
+
+      "full" - Convert the entire frame at full resolution.
+
+      "max", "mean" - Only convert the part of the frame that is visible
+          in the view, and if the view is zoomed out downsample the frame
+          to (approximately) the screen resolution first using the maximum
+          or the mean of each block of pixels. The default is "max" as
+          this won't hide single bright pixels / molecules.
+
+      "opengl" - The display uses a QtCameraGLGraphicsItem instead, see
+          qtCameraOpenGL.py.
+
+    The uint8 image buffer and the QImage that wraps it are re-used from
+    frame to frame as long as the size of the rendered image does not
+    change. The QImage color table is only updated when the color table
+    changes.
     """
-    def __init__(self, **kwds):
+    def __init__(self, render_mode = "max", **kwds):
         super().__init__(**kwds)
 
         self.chip_size_changed = False
@@ -32,6 +51,8 @@ class QtCameraGraphicsItem(QtWidgets.QGraphicsItem):
         self.chip_y = 0
         self.click_x = 0
         self.click_y = 0
+        self.buffer = None
+        self.buffer_image = None
         self.colortable = None
         self.display_range = [0, 200]
         self.display_saturated_pixels = False
@@ -41,9 +62,12 @@ class QtCameraGraphicsItem(QtWidgets.QGraphicsItem):
         self.frame_y_offset = 0
         self.image_max = 0
         self.image_min = 0
+        self.image_rect = None
         self.intensity_info = 0
         self.max_intensity = None
+        self.q_colortable = [QtGui.qRgb(i, i, i) for i in range(256)]
         self.q_image = None
+        self.render_mode = render_mode
         self.scale_x = 1
         self.scale_y = 1
 
@@ -56,6 +80,57 @@ class QtCameraGraphicsItem(QtWidgets.QGraphicsItem):
             self.chip_size_changed = False
         return chip_rect
 
+    def getRenderRegion(self, w, h):
+        """
+        Returns [x start, x end, y start, y end, downsampling factor] for
+        the part of a w x h frame that is visible in the view.
+        """
+        views = self.scene().views() if (self.scene() is not None) else []
+        if (len(views) == 0):
+            return [0, w, 0, h, 1]
+
+        # The visible part of the scene.
+        view = views[0]
+        visible = view.mapToScene(view.viewport().rect()).boundingRect()
+
+        # Screen pixels per frame pixel. QtCameraGraphicsView has a
+        # 'transform' attribute so we need to call the base class method.
+        view_scale = math.sqrt(abs(QtWidgets.QGraphicsView.transform(view).determinant()))
+        pixel_scale = view_scale * min(self.scale_x, self.scale_y)
+        factor = max(1, int(1.0/pixel_scale)) if (pixel_scale > 0.0) else 1
+
+        # Visible part of the frame, aligned to the downsampling blocks.
+        x_start = int((visible.left() - self.frame_x_offset)/self.scale_x) - 1
+        x_end = int(math.ceil((visible.right() - self.frame_x_offset)/self.scale_x)) + 1
+        y_start = int((visible.top() - self.frame_y_offset)/self.scale_y) - 1
+        y_end = int(math.ceil((visible.bottom() - self.frame_y_offset)/self.scale_y)) + 1
+
+        x_start = max(0, (x_start//factor) * factor)
+        y_start = max(0, (y_start//factor) * factor)
+        x_end = min(w, x_end)
+        y_end = min(h, y_end)
+
+        # Render everything if the visible part is smaller than one block.
+        if ((x_end - x_start) < factor) or ((y_end - y_start) < factor):
+            return [0, w, 0, h, 1]
+        
+        return [x_start, x_end, y_start, y_end, factor]
+    
+    def getBuffer(self, w, h):
+        """
+        Returns the w x h uint8 buffer to rescale the frame into and the
+        QImage that displays it. These are only created if the size changed.
+        """
+        if (self.buffer is None) or (self.buffer.shape != (h, w)):
+            self.buffer = numpy.empty((h, w), dtype = numpy.uint8)
+
+            # This needs to be a (non-const) pointer, otherwise QImage will
+            # copy the buffer when we change the color table.
+            self.buffer_image = QtGui.QImage(sip.voidptr(self.buffer.ctypes.data), w, h, w, QtGui.QImage.Format_Indexed8)
+            self.buffer_image.ndarray = self.buffer
+            self.setColorTable()
+        return [self.buffer, self.buffer_image]
+    
     def getAutoScale(self):
         return [self.image_min, self.image_max]
 
@@ -72,6 +147,12 @@ class QtCameraGraphicsItem(QtWidgets.QGraphicsItem):
         else:
             self.display_saturated_pixels = False
 
+        if self.colortable:
+            self.q_colortable = [QtGui.qRgb(*self.colortable[i][:3]) for i in range(256)]
+        else:
+            self.q_colortable = [QtGui.qRgb(i, i, i) for i in range(256)]
+        self.setColorTable()
+
     def newConfiguration(self, camera_functionality):
         [chip_x, chip_y] = camera_functionality.getChipSize()
         [self.frame_x_offset, self.frame_y_offset] = camera_functionality.getFrameZeroZero()
@@ -92,25 +173,33 @@ class QtCameraGraphicsItem(QtWidgets.QGraphicsItem):
         if self.q_image is not None:
 
             # Draw the image.
-            painter.drawImage(self.frame_x_offset,
-                              self.frame_y_offset,
-                              self.q_image)
-            
-            # Draw the grid into the buffer.
-            if self.draw_grid:
-                x_step = self.chip_x/8
-                y_step = self.chip_y/8
-                painter.setPen(QtGui.QColor(255, 255, 255))
-                for i in range(7):
-                    painter.drawLine((i+1)*x_step, 0, (i+1)*x_step, self.chip_y)
-                    painter.drawLine(0, (i+1)*y_step, self.chip_x, (i+1)*y_step)
-
-            # Draw the target into the buffer
-            if self.draw_target:
-                mid_x = self.chip_x/2 - 20
-                mid_y = self.chip_y/2 - 20
-                painter.setPen(QtGui.QColor(255, 255, 255))
-                painter.drawEllipse(mid_x, mid_y, 40, 40)
+            if self.image_rect is not None:
+                painter.drawImage(self.image_rect, self.q_image)
+            else:
+                painter.drawImage(self.frame_x_offset,
+                                  self.frame_y_offset,
+                                  self.q_image)
+            self.paintOverlays(painter)
+
+    def paintOverlays(self, painter):
+        """
+        Draw the grid and the target (if requested) on top of the image.
+        """
+        # Draw the grid into the buffer.
+        if self.draw_grid:
+            x_step = self.chip_x/8
+            y_step = self.chip_y/8
+            painter.setPen(QtGui.QColor(255, 255, 255))
+            for i in range(7):
+                painter.drawLine((i+1)*x_step, 0, (i+1)*x_step, self.chip_y)
+                painter.drawLine(0, (i+1)*y_step, self.chip_x, (i+1)*y_step)
+
+        # Draw the target into the buffer
+        if self.draw_target:
+            mid_x = self.chip_x/2 - 20
+            mid_y = self.chip_y/2 - 20
+            painter.setPen(QtGui.QColor(255, 255, 255))
+            painter.drawEllipse(mid_x, mid_y, 40, 40)
 
     def setClickPos(self, cx, cy):
         self.click_x = cx
@@ -118,18 +207,12 @@ class QtCameraGraphicsItem(QtWidgets.QGraphicsItem):
 
     def setColorTable(self):
         """
-        Sets the color table of the new image. If you don't do this Qt
+        Sets the color table of the image buffer. If you don't do this Qt
         will segfault without giving you a traceback or any kind of
         warning message..
         """
-        if self.colortable:
-            for i in range(256):
-                self.q_image.setColor(i, QtGui.qRgb(self.colortable[i][0], 
-                                                    self.colortable[i][1], 
-                                                    self.colortable[i][2]))
-        else:
-            for i in range(256):
-                self.q_image.setColor(i,QtGui.qRgb(i,i,i))        
+        if self.buffer_image is not None:
+            self.buffer_image.setColorTable(self.q_colortable)
 
     def setShowGrid(self, show):
         self.draw_grid = show
@@ -154,28 +237,7 @@ class QtCameraGraphicsItem(QtWidgets.QGraphicsItem):
             print("Got an image with an unexpected size, ", image_data.shape, "expected [", w, ",", h, "]")
             return
 
-        max_intensity = self.max_intensity
-        if not self.display_saturated_pixels:
-            max_intensity = None
-
-        # Rescale the image & record it's minimum and maximum.
-        [temp, self.image_min, self.image_max] = c_image.rescaleImage(image_data,
-                                                                      False,
-                                                                      False,
-                                                                      False,
-                                                                      self.display_range,
-                                                                      max_intensity)
-        
-        # Create QImage & re-scale to compensate for binning, if any.
-        temp_image = QtGui.QImage(temp.data, w, h, QtGui.QImage.Format_Indexed8)
-        if (self.scale_x != 1) or (self.scale_y != 1):
-            self.q_image = temp_image.scaled(w * self.scale_x, h * self.scale_y)
-        else:
-            self.q_image = temp_image
-        self.q_image.ndarray = temp
-
-        # Set the images color table.
-        self.setColorTable()
+        self.renderImage(image_data)
 
         # Record the intensity where the user last clicked on the image.
         # self.click_x and self.click_y are in frame coordinates.
@@ -189,6 +251,63 @@ class QtCameraGraphicsItem(QtWidgets.QGraphicsItem):
         # Force re-paint.
         self.update()
 
+    def renderImage(self, image_data):
+        """
+        Convert the (2D) image_data to a QImage (self.q_image).
+        """
+        [h, w] = image_data.shape
+        max_intensity = self.max_intensity
+        if not self.display_saturated_pixels:
+            max_intensity = None
+
+        if (self.render_mode == "full"):
+            
+            # Rescale the image & record it's minimum and maximum.
+            [buffer, buffer_image] = self.getBuffer(w, h)
+            [temp, self.image_min, self.image_max] = c_image.rescaleImage(image_data,
+                                                                          False,
+                                                                          False,
+                                                                          False,
+                                                                          self.display_range,
+                                                                          max_intensity,
+                                                                          out = buffer)
+        
+            # Re-scale to compensate for binning, if any.
+            if (self.scale_x != 1) or (self.scale_y != 1):
+                self.q_image = buffer_image.scaled(w * self.scale_x, h * self.scale_y)
+            else:
+                self.q_image = buffer_image
+            self.image_rect = None
+
+        else:
+
+            # The minimum and maximum are always for the whole frame.
+            self.image_min = int(numpy.min(image_data))
+            self.image_max = int(numpy.max(image_data))
+
+            # Crop and downsample to the visible part of the frame.
+            [x_start, x_end, y_start, y_end, factor] = self.getRenderRegion(w, h)
+            visible = image_data[y_start:y_end,x_start:x_end]
+            if (factor > 1):
+                visible = c_image.downsampleImage(visible, factor, self.render_mode)
+
+            [t_h, t_w] = visible.shape
+            [buffer, buffer_image] = self.getBuffer(t_w, t_h)
+            c_image.rescaleImage(visible,
+                                 False,
+                                 False,
+                                 False,
+                                 self.display_range,
+                                 max_intensity,
+                                 out = buffer)
+
+            # The QImage is scaled to the correct size when it is drawn.
+            self.q_image = buffer_image
+            self.image_rect = QtCore.QRectF(self.frame_x_offset + x_start * self.scale_x,
+                                            self.frame_y_offset + y_start * self.scale_y,
+                                            t_w * factor * self.scale_x,
+                                            t_h * factor * self.scale_y)
+
 
 class QtCameraGraphicsScene(QtWidgets.QGraphicsScene):
     pass
@@ -0,0 +1,351 @@
+#!/usr/bin/env python
+"""
+A QGraphicsItem for displaying data from a camera that does the
+rescaling and the color table look up on the graphics card.
+
+This is used with a QOpenGLWidget as the viewport of the
+QtCameraGraphicsView. The raw (uint16) frame is uploaded as a texture
+and a shader converts it to a color using the display range and the
+color table, so there is no per pixel work in Python / numpy.
+
+This also works with Mesa software rendering (llvmpipe) on computers
+without a graphics card, LIBGL_ALWAYS_SOFTWARE=1 forces this.
+
+If OpenGL cannot be used for some reason the item falls back to
+drawing the frame with QPainter, exactly as QtCameraGraphicsItem.
+"""
+
+from PyQt5 import QtCore, QtGui, QtWidgets, sip
+
+import numpy
+
+import storm_control.hal4000.qtWidgets.qtCameraGraphicsScene as qtCameraGraphicsScene
+
+
+# OpenGL constants, PyQt5 does not provide these.
+GL_BLEND = 0x0BE2
+GL_TRIANGLE_FAN = 0x0006
+
+gl_available = None
+
+vertex_shader = """
+attribute highp vec2 vertex;
+attribute highp vec2 tex_coord_in;
+uniform highp mat4 mvp;
+varying highp vec2 tex_coord;
+
+void main(void)
+{
+    gl_Position = mvp * vec4(vertex, 0.0, 1.0);
+    tex_coord = tex_coord_in;
+}
+"""
+
+#
+# This is the same conversion as c_image_manipulation_c.rescaleImage(),
+# followed by the color table look up.
+#
+fragment_shader = """
+uniform sampler2D colortable;
+uniform sampler2D frame;
+uniform highp float display_max;
+uniform highp float display_min;
+uniform highp float max_range;
+uniform highp float saturated_value;
+varying highp vec2 tex_coord;
+
+void main(void)
+{
+    highp float value = 65535.0 * texture2D(frame, tex_coord).r;
+    highp float scaled = clamp((value - display_min)/(display_max - display_min), 0.0, 1.0);
+    highp float index = floor(max_range * scaled + 0.5);
+    if (value >= saturated_value){
+        index = 255.0;
+    }
+    gl_FragColor = texture2D(colortable, vec2((index + 0.5)/256.0, 0.5));
+}
+"""
+
+
+def openGLAvailable():
+    """
+    Returns True if we can create an OpenGL context.
+    """
+    global gl_available
+
+    if gl_available is None:
+        context = QtGui.QOpenGLContext()
+        gl_available = context.create()
+    return gl_available
+
+
+class QtCameraGLGraphicsItem(qtCameraGraphicsScene.QtCameraGraphicsItem):
+    """
+    Draws the camera frame with OpenGL when it is painted into a
+    QOpenGLWidget, otherwise with QPainter.
+
+    The frame is held (Frame.acquire()) until the next frame arrives
+    as the texture is only updated when the item is painted.
+    """
+    def __init__(self, render_mode = "max", **kwds):
+        """
+        render_mode - The render mode to use if we have to fall back to
+                      QPainter, see QtCameraGraphicsItem.
+        """
+        super().__init__(render_mode = render_mode, **kwds)
+
+        self.colortable_changed = True
+        self.frame = None
+        self.frame_changed = False
+        self.gl = None
+        self.gl_colortable = None
+        self.gl_context = None
+        self.gl_failed = False
+        self.gl_frame = None
+        self.gl_program = None
+        self.image_data = None
+        self.minmax_valid = False
+
+    def cleanUpGL(self):
+        """
+        Release the OpenGL resources, this is called when the
+        OpenGL context is about to be destroyed.
+        """
+        for texture in [self.gl_colortable, self.gl_frame]:
+            if texture is not None:
+                texture.destroy()
+        self.gl = None
+        self.gl_colortable = None
+        self.gl_context = None
+        self.gl_frame = None
+        self.gl_program = None
+
+    def getAutoScale(self):
+        """
+        The minimum and maximum are only calculated when they are needed.
+        """
+        if (self.image_data is not None) and (not self.minmax_valid):
+            self.image_min = int(self.image_data.min())
+            self.image_max = int(self.image_data.max())
+            self.minmax_valid = True
+        return super().getAutoScale()
+
+    def initializeGL(self, context):
+        """
+        Create the shader program and the textures for the current
+        OpenGL context. Returns False if this did not work.
+        """
+        self.cleanUpGL()
+
+        profile = QtGui.QOpenGLVersionProfile()
+        profile.setVersion(2, 0)
+        self.gl = context.versionFunctions(profile)
+        if self.gl is None:
+            return False
+        self.gl.initializeOpenGLFunctions()
+
+        self.gl_program = QtGui.QOpenGLShaderProgram()
+        if not self.gl_program.addShaderFromSourceCode(QtGui.QOpenGLShader.Vertex, vertex_shader):
+            print("Vertex shader failed", self.gl_program.log())
+            return False
+        if not self.gl_program.addShaderFromSourceCode(QtGui.QOpenGLShader.Fragment, fragment_shader):
+            print("Fragment shader failed", self.gl_program.log())
+            return False
+        if not self.gl_program.link():
+            print("Shader program link failed", self.gl_program.log())
+            return False
+
+        self.gl_colortable = self.newTexture(256, 1, QtGui.QOpenGLTexture.RGBA8_UNorm)
+        self.colortable_changed = True
+        self.frame_changed = True
+
+        self.gl_context = context
+        self.gl_context.aboutToBeDestroyed.connect(self.cleanUpGL)
+        return True
+
+    def newTexture(self, w, h, texture_format):
+        texture = QtGui.QOpenGLTexture(QtGui.QOpenGLTexture.Target2D)
+        texture.setFormat(texture_format)
+        texture.setSize(w, h)
+        texture.setMinMagFilters(QtGui.QOpenGLTexture.Nearest, QtGui.QOpenGLTexture.Nearest)
+        texture.setWrapMode(QtGui.QOpenGLTexture.ClampToEdge)
+        texture.allocateStorage()
+        return texture
+
+    def newColorTable(self, colortable):
+        super().newColorTable(colortable)
+        self.update()
+
+    def newRange(self, d_min, d_max):
+        super().newRange(d_min, d_max)
+        self.update()
+
+    def paint(self, painter, option, widget):
+        if self.image_data is None:
+            return
+
+        context = QtGui.QOpenGLContext.currentContext()
+        if self.gl_failed or (context is None) or (painter.paintEngine().type() != QtGui.QPaintEngine.OpenGL2):
+            self.renderImage(self.image_data)
+            super().paint(painter, option, widget)
+            return
+
+        painter.beginNativePainting()
+        try:
+            if (context != self.gl_context):
+                if not self.initializeGL(context):
+                    print("OpenGL initialization failed, using QPainter.")
+                    self.gl_failed = True
+            if not self.gl_failed:
+                self.paintGL(painter)
+        finally:
+            painter.endNativePainting()
+
+        if self.gl_failed:
+            self.renderImage(self.image_data)
+            super().paint(painter, option, widget)
+        else:
+            self.paintOverlays(painter)
+
+    def paintGL(self, painter):
+        """
+        Draw the frame with the shader program.
+        """
+        [h, w] = self.image_data.shape
+
+        # Update textures.
+        if self.colortable_changed:
+            colortable = QtGui.QImage(256, 1, QtGui.QImage.Format_RGB32)
+            for i in range(256):
+                colortable.setPixel(i, 0, self.q_colortable[i])
+            self.gl_colortable.setData(QtGui.QOpenGLTexture.BGRA,
+                                       QtGui.QOpenGLTexture.UInt8,
+                                       colortable.constBits())
+            self.colortable_changed = False
+
+        if self.frame_changed:
+            if (self.gl_frame is None) or (self.gl_frame.width() != w) or (self.gl_frame.height() != h):
+                if self.gl_frame is not None:
+                    self.gl_frame.destroy()
+                self.gl_frame = self.newTexture(w, h, QtGui.QOpenGLTexture.R16_UNorm)
+            options = QtGui.QOpenGLPixelTransferOptions()
+            options.setAlignment(2)
+            self.gl_frame.setData(QtGui.QOpenGLTexture.Red,
+                                  QtGui.QOpenGLTexture.UInt16,
+                                  sip.voidptr(self.image_data.ctypes.data),
+                                  options)
+            self.frame_changed = False
+
+        # Item to OpenGL coordinates transform.
+        device = painter.device()
+        mvp = QtGui.QMatrix4x4()
+        mvp.ortho(0.0, device.width(), device.height(), 0.0, -1.0, 1.0)
+        mvp = mvp * QtGui.QMatrix4x4(painter.combinedTransform())
+
+        # Rescaling parameters.
+        if self.display_saturated_pixels and (self.max_intensity is not None):
+            [max_range, saturated_value] = [254.0, float(self.max_intensity)]
+        else:
+            [max_range, saturated_value] = [255.0, 65536.0]
+
+        x1 = self.frame_x_offset
+        y1 = self.frame_y_offset
+        x2 = x1 + w * self.scale_x
+        y2 = y1 + h * self.scale_y
+
+        program = self.gl_program
+        program.bind()
+        program.setUniformValue("mvp", mvp)
+        program.setUniformValue("display_min", float(self.display_range[0]))
+        program.setUniformValue("display_max", float(self.display_range[1]))
+        program.setUniformValue("max_range", max_range)
+        program.setUniformValue("saturated_value", saturated_value)
+        program.setUniformValue("frame", 0)
+        program.setUniformValue("colortable", 1)
+        program.enableAttributeArray("vertex")
+        program.enableAttributeArray("tex_coord_in")
+        program.setAttributeArray("vertex", [QtGui.QVector2D(x1, y1),
+                                             QtGui.QVector2D(x2, y1),
+                                             QtGui.QVector2D(x2, y2),
+                                             QtGui.QVector2D(x1, y2)])
+        program.setAttributeArray("tex_coord_in", [QtGui.QVector2D(0.0, 0.0),
+                                                   QtGui.QVector2D(1.0, 0.0),
+                                                   QtGui.QVector2D(1.0, 1.0),
+                                                   QtGui.QVector2D(0.0, 1.0)])
+        self.gl_frame.bind(0)
+        self.gl_colortable.bind(1)
+
+        self.gl.glDisable(GL_BLEND)
+        self.gl.glDrawArrays(GL_TRIANGLE_FAN, 0, 4)
+
+        self.gl_colortable.release(1)
+        self.gl_frame.release(0)
+        program.disableAttributeArray("vertex")
+        program.disableAttributeArray("tex_coord_in")
+        program.release()
+
+    def setColorTable(self):
+        super().setColorTable()
+        self.colortable_changed = True
+
+    def updateImageWithFrame(self, frame):
+        """
+        Keep the frame, then call update() to display it.
+        """
+        w = frame.image_x
+        h = frame.image_y
+        image_data = frame.getData()
+        try:
+            image_data = image_data.reshape((h,w))
+        except ValueError as e:
+            print("Got an image with an unexpected size, ", image_data.shape, "expected [", w, ",", h, "]")
+            return
+
+        # The texture is uploaded from a pointer to the data, so it
+        # must be contiguous. The data of a feed frame may not be.
+        image_data = numpy.ascontiguousarray(image_data)
+
+        frame.acquire()
+        if self.frame is not None:
+            self.frame.release()
+        self.frame = frame
+        self.frame_changed = True
+        self.image_data = image_data
+        self.minmax_valid = False
+
+        # Record the intensity where the user last clicked on the image.
+        # self.click_x and self.click_y are in frame coordinates.
+        xl = self.click_x
+        yl = self.click_y
+        if ((xl >= 0) and (xl < w) and (yl >= 0) and (yl < h)):
+            self.intensity_info = image_data[yl, xl]
+        else:
+            self.intensity_info = 0
+
+        # Force re-paint.
+        self.update()
+
+
+#
+# The MIT License
+#
+# Copyright (c) 2026 Babcock Lab, Harvard University
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+# Form implementation generated from reading ui file 'profiler.ui'
+#
+# Created by: PyQt5 UI code generator 5.15.11
+#
+# WARNING: Any manual changes made to this file will be lost when pyuic5 is
+# run again.  Do not edit this file unless you know what you are doing.
+
+
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+
+class Ui_Dialog(object):
+    def setupUi(self, Dialog):
+        Dialog.setObjectName("Dialog")
+        Dialog.resize(640, 400)
+        self.verticalLayout = QtWidgets.QVBoxLayout(Dialog)
+        self.verticalLayout.setObjectName("verticalLayout")
+        self.profileTableWidget = QtWidgets.QTableWidget(Dialog)
+        self.profileTableWidget.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.profileTableWidget.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
+        self.profileTableWidget.setObjectName("profileTableWidget")
+        self.profileTableWidget.setColumnCount(7)
+        self.profileTableWidget.setRowCount(0)
+        item = QtWidgets.QTableWidgetItem()
+        self.profileTableWidget.setHorizontalHeaderItem(0, item)
+        item = QtWidgets.QTableWidgetItem()
+        self.profileTableWidget.setHorizontalHeaderItem(1, item)
+        item = QtWidgets.QTableWidgetItem()
+        self.profileTableWidget.setHorizontalHeaderItem(2, item)
+        item = QtWidgets.QTableWidgetItem()
+        self.profileTableWidget.setHorizontalHeaderItem(3, item)
+        item = QtWidgets.QTableWidgetItem()
+        self.profileTableWidget.setHorizontalHeaderItem(4, item)
+        item = QtWidgets.QTableWidgetItem()
+        self.profileTableWidget.setHorizontalHeaderItem(5, item)
+        item = QtWidgets.QTableWidgetItem()
+        self.profileTableWidget.setHorizontalHeaderItem(6, item)
+        self.verticalLayout.addWidget(self.profileTableWidget)
+        self.horizontalLayout = QtWidgets.QHBoxLayout()
+        self.horizontalLayout.setObjectName("horizontalLayout")
+        self.refreshButton = QtWidgets.QPushButton(Dialog)
+        self.refreshButton.setObjectName("refreshButton")
+        self.horizontalLayout.addWidget(self.refreshButton)
+        self.resetButton = QtWidgets.QPushButton(Dialog)
+        self.resetButton.setObjectName("resetButton")
+        self.horizontalLayout.addWidget(self.resetButton)
+        spacerItem = QtWidgets.QSpacerItem(40, 20, QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Minimum)
+        self.horizontalLayout.addItem(spacerItem)
+        self.okButton = QtWidgets.QPushButton(Dialog)
+        self.okButton.setObjectName("okButton")
+        self.horizontalLayout.addWidget(self.okButton)
+        self.verticalLayout.addLayout(self.horizontalLayout)
+
+        self.retranslateUi(Dialog)
+        QtCore.QMetaObject.connectSlotsByName(Dialog)
+
+    def retranslateUi(self, Dialog):
+        _translate = QtCore.QCoreApplication.translate
+        Dialog.setWindowTitle(_translate("Dialog", "Dialog"))
+        self.profileTableWidget.setSortingEnabled(True)
+        item = self.profileTableWidget.horizontalHeaderItem(0)
+        item.setText(_translate("Dialog", "Module"))
+        item = self.profileTableWidget.horizontalHeaderItem(1)
+        item.setText(_translate("Dialog", "Message"))
+        item = self.profileTableWidget.horizontalHeaderItem(2)
+        item.setText(_translate("Dialog", "Where"))
+        item = self.profileTableWidget.horizontalHeaderItem(3)
+        item.setText(_translate("Dialog", "Count"))
+        item = self.profileTableWidget.horizontalHeaderItem(4)
+        item.setText(_translate("Dialog", "Total (ms)"))
+        item = self.profileTableWidget.horizontalHeaderItem(5)
+        item.setText(_translate("Dialog", "Mean (ms)"))
+        item = self.profileTableWidget.horizontalHeaderItem(6)
+        item.setText(_translate("Dialog", "Max (ms)"))
+        self.refreshButton.setText(_translate("Dialog", "Refresh"))
+        self.resetButton.setText(_translate("Dialog", "Reset"))
+        self.okButton.setText(_translate("Dialog", "Ok"))
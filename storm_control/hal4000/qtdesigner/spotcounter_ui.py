@@ -38,6 +38,10 @@ class Ui_Dialog(object):
         self.horizontalLayout_3.addWidget(self.countsLabel1)
         spacerItem = QtWidgets.QSpacerItem(40, 20, QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Minimum)
         self.horizontalLayout_3.addItem(spacerItem)
+        self.statsLabel = QtWidgets.QLabel(self.countsTab)
+        self.statsLabel.setAlignment(QtCore.Qt.AlignRight|QtCore.Qt.AlignTrailing|QtCore.Qt.AlignVCenter)
+        self.statsLabel.setObjectName("statsLabel")
+        self.horizontalLayout_3.addWidget(self.statsLabel)
         self.verticalLayout_3.addLayout(self.horizontalLayout_3)
         self.horizontalLayout_2 = QtWidgets.QHBoxLayout()
         self.horizontalLayout_2.setSpacing(0)
@@ -129,6 +133,7 @@ class Ui_Dialog(object):
         Dialog.setWindowTitle(_translate("Dialog", "HAL-4000 Spot Counter"))
         self.countsText1.setText(_translate("Dialog", "Total Localizations:"))
         self.countsLabel1.setText(_translate("Dialog", "TextLabel"))
+        self.statsLabel.setText(_translate("Dialog", "TextLabel"))
         self.label.setText(_translate("Dialog", "This Space Intentionally Left Blank"))
         self.tabWidget.setTabText(self.tabWidget.indexOf(self.countsTab), _translate("Dialog", "Counts"))
         self.countsText2.setText(_translate("Dialog", "Total Localizations:"))
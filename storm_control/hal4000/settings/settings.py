@@ -39,6 +39,17 @@ import storm_control.hal4000.settings.parametersBox as parametersBox
 
 
 class Settings(halModule.HalModule):
+    handled_messages = {"configure1",
+                        "configure2",
+                        "get parameters",
+                        "initial parameters",
+                        "new parameters file",
+                        "parameters changed",
+                        "set parameters",
+                        "start film",
+                        "stop film",
+                        "wait for"}
+
     
     def __init__(self, module_params = None, qt_settings = None, **kwds):
         super().__init__(**kwds)
@@ -1,71 +1,201 @@
 #!/usr/bin/env python
 """
-Analyze frames using QRunnables and QThreadPool.
+Analyze frames using QRunnables and a QThreadPool.
+
+The frames from each camera are kept in a (small) bounded queue until
+there is a worker available to analyze them. What happens when the
+queue is full depends on the queue policy:
+
+  "drop_oldest" - Drop the oldest frame in the queue.
+  "drop_newest" - Drop the new frame.
+  "every_nth" - Only queue every Nth frame, if the queue is still
+                full the new frame is dropped.
+
+The object finder is either "lmm" (lmmObjectFinder, which uses the
+LMMoment C library) or "numpy" (npObjectFinder).
+
+Frames that are larger than max_size are split into tiles of (at most)
+tile_size x tile_size pixels, which are analyzed in parallel by the
+workers. Each tile is analyzed with a margin of tile_margin pixels so
+that objects near the edges of the tile are found and located the same
+way as if the whole frame was analyzed. Only the objects that are in
+the tile (not in the margin) are kept.
 
 Hazen 05/17
 """
+import collections
+import numpy
+import threading
 import time
 
 from PyQt5 import QtCore
 
-import storm_control.hal4000.halLib.halModule as halModule
+import storm_control.sc_library.halExceptions as halExceptions
+
+import storm_control.hal4000.camera.frame as frame
 import storm_control.hal4000.spotCounter.lmmObjectFinder as lmmObjectFinder
+import storm_control.hal4000.spotCounter.npObjectFinder as npObjectFinder
+
+object_finders = {"lmm" : lmmObjectFinder,
+                  "numpy" : npObjectFinder}
+
+# This is the 5 pixel margin at the edge of the image where the object
+# finders don't look for objects, plus 5 pixels for the offset of the
+# object center from the local maxima.
+tile_margin = 10
+
+
+def makeTiles(image_x, image_y, tile_size):
+    """
+    Returns a list of [y start, y end, x start, x end] tiles that cover the image.
+    """
+    tiles = []
+    for y_start in range(0, image_y, tile_size):
+        for x_start in range(0, image_x, tile_size):
+            tiles.append([y_start, min(y_start + tile_size, image_y),
+                          x_start, min(x_start + tile_size, image_x)])
+    return tiles
 
 
 class AnalysisWorker(QtCore.QRunnable):
     """
-    Runnable for performing image analysis.
+    Runnable for performing image analysis of a frame, or a tile of a
+    frame. Each worker has it's own buffers for the results of the
+    object finder.
     """
-    def __init__(self, **kwds):
+    def __init__(self, object_finder = None, **kwds):
         super().__init__(**kwds)
         self.aw_signaler = AnalysisWorkerSignaler()
         self.frame_analysis = None
         self.busy = False
+        self.object_finder = object_finder
+        self.tile = None
+        [self.x_buffer, self.y_buffer] = self.object_finder.createBuffers()
 
     def isBusy(self):
         return self.busy
         
     def run(self):
-        self.frame_analysis.analyzeImage()
-        self.aw_signaler.analysisDone.emit(self.frame_analysis)
+        frame_analysis = self.frame_analysis
+        done = frame_analysis.analyzeTile(self.object_finder, self.tile, self.x_buffer, self.y_buffer)
         self.busy = False
+
+        # Only signal that the frame is done once all the tiles of the
+        # frame have been analyzed, otherwise signal that this worker
+        # is free to analyze the next tile.
+        if done:
+            self.aw_signaler.analysisDone.emit(frame_analysis)
+        else:
+            self.aw_signaler.tileDone.emit()
         
-    def setFrameAnalysis(self, frame_analysis):
+    def setFrameAnalysis(self, frame_analysis, tile):
         self.frame_analysis = frame_analysis
+        self.tile = tile
         self.busy = True
 
 
 class AnalysisWorkerSignaler(QtCore.QObject):
     """
     Signal class used by the AnalysisWorker to indicate that
-    the analysis of a frame is complete.
+    the analysis of a frame (or of a tile of a frame) is complete.
     """
     analysisDone = QtCore.pyqtSignal(object)
+    tileDone = QtCore.pyqtSignal()
 
     
 class FrameAnalysis(QtCore.QObject):
     """
     This class:
      1. Stores the frame to analyze.
-     2. Does the analysis (with AnalysisWorker).
+     2. Does the analysis (with AnalysisWorkers), possibly in tiles.
      3. Stores the results of the analysis.
     """
     def __init__(self,
                  camera_name = None,
                  frame = None,
                  threshold = None,
+                 tiles = None,
                  **kwds):
+        """
+        tiles - A list of tiles from makeTiles(), or None to analyze
+                the whole frame.
+        """
         super().__init__(**kwds)
         self.camera_name = camera_name
         self.frame = frame
+        self.frame_number = frame.frame_number
+        self.lock = threading.Lock()
         self.locs_count = 0
         self.threshold = threshold
+        self.tile_x_locs = []
+        self.tile_y_locs = []
+        self.time_done = None
+        self.time_queued = time.perf_counter()
         self.x_locs = None
         self.y_locs = None
+
+        if tiles is None:
+            self.tiles = [None]
+        else:
+            self.tiles = tiles
+        self.tiles_remaining = len(self.tiles)
         
-    def analyzeImage(self):
-        [self.x_locs, self.y_locs, self.locs_count] = lmmObjectFinder.findObjects(self.frame,
-                                                                                  self.threshold)
+    def analyzeTile(self, object_finder, tile, x_buffer, y_buffer):
+        """
+        Analyze a tile of the frame (or all of it if tile is None). This
+        returns True if this was the last tile.
+
+        x_buffer and y_buffer are re-used for the next tile so we keep
+        a copy of the localizations.
+        """
+        if tile is None:
+            [x, y, n] = object_finder.findObjects(self.frame,
+                                                  self.threshold,
+                                                  x = x_buffer,
+                                                  y = y_buffer)
+            x = x[:n].copy()
+            y = y[:n].copy()
+
+        else:
+            [h, w] = [self.frame.image_y, self.frame.image_x]
+            [y_start, y_end, x_start, x_end] = tile
+            y_min = max(0, y_start - tile_margin)
+            x_min = max(0, x_start - tile_margin)
+            image = self.frame.getData().reshape(h, w)[y_min:min(h, y_end + tile_margin),
+                                                       x_min:min(w, x_end + tile_margin)]
+            tile_frame = frame.Frame(image,
+                                     self.frame_number,
+                                     image.shape[1],
+                                     image.shape[0],
+                                     self.camera_name)
+            [x, y, n] = object_finder.findObjects(tile_frame,
+                                                  self.threshold,
+                                                  x = x_buffer,
+                                                  y = y_buffer)
+            x = x[:n] + x_min
+            y = y[:n] + y_min
+
+            # Keep the localizations that are in this tile. As the tiles
+            # don't overlap each localization is kept only once.
+            ix = numpy.floor(x + 0.5)
+            iy = numpy.floor(y + 0.5)
+            mask = (ix >= x_start) & (ix < x_end) & (iy >= y_start) & (iy < y_end)
+            x = x[mask]
+            y = y[mask]
+
+        with self.lock:
+            self.tile_x_locs.append(x)
+            self.tile_y_locs.append(y)
+            self.tiles_remaining -= 1
+            done = (self.tiles_remaining == 0)
+
+        if done:
+            self.x_locs = numpy.concatenate(self.tile_x_locs)
+            self.y_locs = numpy.concatenate(self.tile_y_locs)
+            self.locs_count = self.x_locs.size
+            self.releaseFrame()
+            self.time_done = time.perf_counter()
+        return done
 
     def getCameraName(self):
         return self.camera_name
@@ -74,80 +204,214 @@ class FrameAnalysis(QtCore.QObject):
         return self.locs_count
 
     def getFrameNumber(self):
-        return self.frame.frame_number
-        
+        return self.frame_number
+
+    def getLatency(self):
+        """
+        Returns the time in seconds from when the frame was received to
+        when the analysis was complete.
+        """
+        return self.time_done - self.time_queued
+    
     def getLocalizations(self):
-        return [self.x_locs[:self.locs_count],
-                self.y_locs[:self.locs_count]]
+        return [self.x_locs, self.y_locs]
+
+    def getTiles(self):
+        return self.tiles
+
+    def releaseFrame(self):
+        """
+        Release the frame storage once we are done analyzing it, we
+        only need the frame number after this point.
+        """
+        self.frame.release()
+        self.frame = None
         
 
 class SpotCounter(QtCore.QObject):
     imageProcessed = QtCore.pyqtSignal(object)
 
-    def __init__(self, max_threads = None, max_size = 0, **kwds):
+    def __init__(self,
+                 analyze_every = 1,
+                 max_threads = None,
+                 max_size = 0,
+                 object_finder = "lmm",
+                 queue_policy = "drop_oldest",
+                 queue_size = 4,
+                 tile_size = 0,
+                 **kwds):
+        """
+        tile_size - Frames larger than max_size are analyzed in tiles of this
+                    size, if this is 0 they are not analyzed.
+        """
         super().__init__(**kwds)
 
+        if not queue_policy in ["drop_newest", "drop_oldest", "every_nth"]:
+            raise halExceptions.HalException("Unknown spot counter queue policy '" + queue_policy + "'")
+        if not object_finder in object_finders:
+            raise halExceptions.HalException("Unknown spot counter object finder '" + object_finder + "'")
+        
+        self.analyze_every = analyze_every
         self.dropped = 0
+        self.latency_max = 0.0
+        self.latency_total = 0.0
         self.max_size = max_size
-        self.threadpool = halModule.threadpool
+        self.n_analyzed = 0
+        self.object_finder = object_finders[object_finder]
+        self.pending = collections.deque()
+        self.queue_policy = queue_policy
+        self.queue_size = queue_size
+        self.queues = collections.OrderedDict()
+        self.received = {}
+        self.tile_size = tile_size
         self.total = 0
         self.workers = []
 
+        # Use our own thread pool so that we don't compete with the
+        # HAL workers in halModule.threadpool.
+        self.threadpool = QtCore.QThreadPool()
+        self.threadpool.setMaxThreadCount(max_threads)
+
         # Create analysis workers.
         for i in range(max_threads):
-            aw = AnalysisWorker()
+            aw = AnalysisWorker(object_finder = self.object_finder)
             aw.setAutoDelete(False)
             aw.aw_signaler.analysisDone.connect(self.handleAnalysisDone)
+            aw.aw_signaler.tileDone.connect(self.startWorkers)
             self.workers.append(aw)
 
         # Initialize object finder.
-        lmmObjectFinder.initialize()
+        self.object_finder.initialize()
             
     def cleanUp(self):
 
         # Wait for workers to finish.
-        still_busy = True
-        while still_busy:
-            all_busy = False
-            for worker in self.workers:
-                if worker.isBusy():
-                    all_busy = True
-                    break
-            still_busy = all_busy
-            time.sleep(0.1)
+        self.threadpool.waitForDone()
+
+        # Drop any frames that are still in the queues, or
+        # that have tiles which have not been analyzed.
+        for queue in self.queues.values():
+            while (len(queue) > 0):
+                queue.popleft().releaseFrame()
+                self.dropped += 1
+
+        partial = []
+        for [frame_analysis, tile] in self.pending:
+            if not frame_analysis in partial:
+                partial.append(frame_analysis)
+        for frame_analysis in partial:
+            frame_analysis.releaseFrame()
+            self.dropped += 1
+        self.pending.clear()
         
         # Object finder cleanup.
-        lmmObjectFinder.cleanUp()
+        self.object_finder.cleanUp()
 
         # Print statistics.
         print("> spot counter dropped", self.dropped, "images out of", self.total, "total images")
+        if (self.n_analyzed > 0):
+            print("> spot counter latency {0:.2f}ms mean, {1:.2f}ms max".format(1000.0 * self.latency_total/self.n_analyzed,
+                                                                                 1000.0 * self.latency_max))
+
+    def getStatistics(self):
+        """
+        Returns a dictionary with the analysis statistics.
+        """
+        stats = {"dropped" : self.dropped,
+                 "latency_max" : self.latency_max,
+                 "latency_mean" : 0.0,
+                 "n_analyzed" : self.n_analyzed,
+                 "queued" : sum(map(len, self.queues.values())),
+                 "total" : self.total}
+        if (self.n_analyzed > 0):
+            stats["latency_mean"] = self.latency_total/self.n_analyzed
+        return stats
 
     def handleAnalysisDone(self, frame_analysis):
+        latency = frame_analysis.getLatency()
+        self.latency_max = max(self.latency_max, latency)
+        self.latency_total += latency
+        self.n_analyzed += 1
+        
         self.imageProcessed.emit(frame_analysis)
+        self.startWorkers()
         
     def newFrameToAnalyze(self, camera_name, frame, threshold):
         
-        # Check if the current camera image is small
-        # enough that we can analyze it.
+        # Check if the current camera image is small enough that we
+        # can analyze it, or if we need to analyze it in tiles.
+        tiles = None
         if ((frame.image_x * frame.image_y) > self.max_size):
-            return
+            if (self.tile_size == 0):
+                return
+            tiles = makeTiles(frame.image_x, frame.image_y, self.tile_size)
         
         self.total += 1
 
-        # Check if there is a thread available to analyze the image.
-        was_dropped = True
-        for worker in self.workers:
-            if not worker.isBusy():
-                worker.setFrameAnalysis(FrameAnalysis(camera_name = camera_name,
-                                                      frame = frame,
-                                                      threshold = threshold))
-                self.threadpool.start(worker)
-                was_dropped = False
-                break
-
-        if was_dropped:
+        if not camera_name in self.queues:
+            self.queues[camera_name] = collections.deque()
+            self.received[camera_name] = 0
+        queue = self.queues[camera_name]
+
+        # Apply the queue policy.
+        self.received[camera_name] += 1
+        if (self.queue_policy == "every_nth"):
+            if (((self.received[camera_name] - 1) % self.analyze_every) != 0):
+                self.dropped += 1
+                return
+
+        if (len(queue) >= self.queue_size):
             self.dropped += 1
+            if (self.queue_policy == "drop_oldest"):
+                queue.popleft().releaseFrame()
+            else:
+                return
+
+        frame.acquire()
+        queue.append(FrameAnalysis(camera_name = camera_name,
+                                   frame = frame,
+                                   threshold = threshold,
+                                   tiles = tiles))
+        self.startWorkers()
+
+    def resetStatistics(self):
+        """
+        Reset the analysis statistics, this is done at the start of a film.
+        """
+        self.dropped = 0
+        self.latency_max = 0.0
+        self.latency_total = 0.0
+        self.n_analyzed = 0
+        self.total = 0
+
+    def startWorkers(self):
+        """
+        Start analyzing queued frames, taking frames from the cameras
+        in turn, until all the workers are busy or the queues are empty.
+        The tiles of a frame are all started before the next frame.
+        """
+        for worker in self.workers:
+            if worker.isBusy():
+                continue
+
+            if (len(self.pending) == 0):
+                for camera_name in list(self.queues):
+                    queue = self.queues[camera_name]
+                    if (len(queue) > 0):
+                        frame_analysis = queue.popleft()
+                        for tile in frame_analysis.getTiles():
+                            self.pending.append([frame_analysis, tile])
+
+                        # Move this camera to the end so the next frame
+                        # comes from a different camera.
+                        self.queues.move_to_end(camera_name)
+                        break
+
+            if (len(self.pending) == 0):
+                return
 
+            worker.setFrameAnalysis(*self.pending.popleft())
+            self.threadpool.start(worker)
 
 #
 # The MIT License
@@ -48,12 +48,23 @@ def initialize():
     lmmoment.initialize()
 
 
-def findObjects(frame, threshold):
+def createBuffers():
+    """
+    Returns [x, y] buffers for the results of findObjects().
+    """
+    return [numpy.zeros((max_locs), dtype = numpy.float32),
+            numpy.zeros((max_locs), dtype = numpy.float32)]
+
+
+def findObjects(frame, threshold, x = None, y = None):
     """
     Find the objects in the image.
+
+    x, y - (optional) Buffers from createBuffers() to store the
+           object locations in.
     """
-    x = numpy.zeros((max_locs), dtype = numpy.float32)
-    y = numpy.zeros((max_locs), dtype = numpy.float32)
+    if x is None:
+        [x, y] = createBuffers()
     n = ctypes.c_int(max_locs)
     lmmoment.numberAndLocObjects(numpy.ascontiguousarray(frame.getData(), dtype = numpy.uint16),
                                  frame.image_y,
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+"""
+NumPy version of the LMMoment object finder (lmmObjectFinder), for
+setups where the C library is not available. This finds the same
+objects at the same locations as the C version.
+
+Objects are identified as local maxima whose height is at least
+threshold above all of the pixels in a ring around them. The object
+center is the first moment of the pixels inside the ring after
+subtracting the mean of the ring.
+
+Note that the maximum number of objects found per image is limited to 1000.
+"""
+import numpy
+
+max_locs = 1000
+
+#
+# Peak definition, this is the same as in LMMoment.c.
+#
+# 1 in the peak definition means boundary.
+# 2 in the peak definition means center.
+#
+peak = numpy.array([[0, 0, 0, 1, 1, 1, 0, 0, 0],
+                    [0, 0, 1, 2, 2, 2, 1, 0, 0],
+                    [0, 1, 2, 2, 2, 2, 2, 1, 0],
+                    [1, 2, 2, 2, 2, 2, 2, 2, 1],
+                    [1, 2, 2, 2, 2, 2, 2, 2, 1],
+                    [1, 2, 2, 2, 2, 2, 2, 2, 1],
+                    [0, 1, 2, 2, 2, 2, 2, 1, 0],
+                    [0, 0, 1, 2, 2, 2, 1, 0, 0],
+                    [0, 0, 0, 1, 1, 1, 0, 0, 0]])
+
+# Margin at the edge of the image where we don't look for objects.
+bsize = 5
+
+# [row, column] offsets of the boundary and center pixels.
+bdy_offsets = numpy.argwhere(peak == 1) - (peak.shape[0]//2)
+cnt_offsets = numpy.argwhere(peak == 2) - (peak.shape[0]//2)
+
+
+def cleanUp():
+    pass
+
+
+def createBuffers():
+    """
+    Returns [x, y] buffers for the results of findObjects().
+    """
+    return [numpy.zeros((max_locs), dtype = numpy.float32),
+            numpy.zeros((max_locs), dtype = numpy.float32)]
+
+
+def findObjects(frame, threshold, x = None, y = None):
+    """
+    Find the objects in the image.
+
+    x, y - (optional) Buffers from createBuffers() to store the
+           object locations in.
+    """
+    if x is None:
+        [x, y] = createBuffers()
+
+    image = frame.getData().reshape(frame.image_y, frame.image_x).astype(numpy.int32)
+    [h, w] = image.shape
+    if (h <= 2*bsize) or (w <= 2*bsize):
+        return [x, y, 0]
+
+    # Find the local maxima. Ties are broken the same way as in the
+    # C version, the pixel must be greater than the pixels above it
+    # and to its left and greater than or equal to the others.
+    def shifted(dy, dx):
+        return image[bsize+dy:h-bsize+dy,bsize+dx:w-bsize+dx]
+
+    center = shifted(0, 0)
+    is_max = (center > shifted(-1, -1))
+    for [dy, dx] in [[-1, 0], [-1, 1], [0, -1], [1, -1]]:
+        is_max &= (center > shifted(dy, dx))
+    for [dy, dx] in [[0, 1], [1, 0], [1, 1]]:
+        is_max &= (center >= shifted(dy, dx))
+    [rows, cols] = numpy.nonzero(is_max)
+    rows += bsize
+    cols += bsize
+
+    # Check that the local maxima are peaks.
+    heights = image[rows, cols]
+    bdy = image[rows[:,None] + bdy_offsets[:,0], cols[:,None] + bdy_offsets[:,1]]
+    mean = numpy.sum(bdy, axis = 1)//bdy_offsets.shape[0]
+    is_peak = numpy.all(heights[:,None] >= (bdy + threshold), axis = 1) & (mean > 0)
+
+    rows = rows[is_peak][:max_locs]
+    cols = cols[is_peak][:max_locs]
+    mean = mean[is_peak][:max_locs]
+    n = rows.size
+
+    # First moment of the peak center.
+    cnt = image[rows[:,None] + cnt_offsets[:,0], cols[:,None] + cnt_offsets[:,1]] - mean[:,None]
+    total = numpy.sum(cnt, axis = 1)
+    good = (total > 0)
+    safe_total = numpy.where(good, total, 1).astype(numpy.float32)
+    x[:n] = numpy.where(good, cols + numpy.dot(cnt, cnt_offsets[:,1])/safe_total, -1.0)
+    y[:n] = numpy.where(good, rows + numpy.dot(cnt, cnt_offsets[:,0])/safe_total, -1.0)
+
+    return [x, y, n]
+
+
+def initialize():
+    pass
+
+
+#
+# The MIT License
+#
+# Copyright (c) 2026 Babcock Lab, Harvard University
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
@@ -133,6 +133,7 @@ class SpotCounterView(halDialog.HalDialog):
 
         self.ui.countsLabel1.setText("0")
         self.ui.countsLabel2.setText("0")
+        self.ui.statsLabel.setText("")
         
         self.ui.analyzerComboBox.currentIndexChanged.connect(self.handleAnalyzerChange)
         self.ui.maxSpinBox.valueChanged.connect(self.handleMaxSpinBox)
@@ -202,9 +203,27 @@ class SpotCounterView(halDialog.HalDialog):
         self.ui.maxSpinBox.setValue(self.parameters.get("max_spots"))
         
         self.setEnabled(True)
+
+    def updateStatistics(self, stats):
+        """
+        Display the analysis latency and the number of dropped frames.
+        """
+        self.ui.statsLabel.setText("Latency {0:.1f} / {1:.1f}ms (mean / max), dropped {2:d} of {3:d}".format(1000.0 * stats["latency_mean"],
+                                                                                                          1000.0 * stats["latency_max"],
+                                                                                                          stats["dropped"],
+                                                                                                          stats["total"]))
         
         
 class SpotCounter(halModule.HalModule):
+    handled_messages = {"changing parameters",
+                        "configuration",
+                        "configure1",
+                        "new parameters",
+                        "show",
+                        "start",
+                        "start film",
+                        "stop film"}
+
 
     def __init__(self, module_params = None, qt_settings = None, **kwds):
         super().__init__(**kwds)
@@ -217,14 +236,24 @@ class SpotCounter(halModule.HalModule):
 
         configuration = module_params.get("configuration")
 
-        self.spot_counter = findSpots.SpotCounter(max_threads = configuration.get("max_threads"),
-                                                  max_size = configuration.get("max_size"))
+        self.spot_counter = findSpots.SpotCounter(analyze_every = configuration.get("analyze_every", 1),
+                                                  max_threads = configuration.get("max_threads"),
+                                                  max_size = configuration.get("max_size"),
+                                                  object_finder = configuration.get("object_finder", "lmm"),
+                                                  queue_policy = configuration.get("queue_policy", "drop_oldest"),
+                                                  queue_size = configuration.get("queue_size", 4),
+                                                  tile_size = configuration.get("tile_size", 0))
 
         self.view = SpotCounterView(module_name = self.module_name,
                                     configuration = configuration)
         self.view.halDialogInit(qt_settings,
                                 module_params.get("setup_name") + " spot counter")
 
+        # Timer for updating the analysis statistics while filming.
+        self.stats_timer = QtCore.QTimer(self)
+        self.stats_timer.setInterval(500)
+        self.stats_timer.timeout.connect(self.handleStatsTimer)
+
         # Spot counter parameters.
         self.parameters = params.StormXMLObject()
         
@@ -255,6 +284,7 @@ class SpotCounter(halModule.HalModule):
                                                    is_saved = False))
 
     def cleanUp(self, qt_settings):
+        self.stats_timer.stop()
         self.cleanUpAnalyzers()
         self.spot_counter.cleanUp()
         self.view.cleanUp(qt_settings)
@@ -284,6 +314,9 @@ class SpotCounter(halModule.HalModule):
                 self.view.newAnalyzers(self.parameters,
                                        self.analyzers)
                 
+    def handleStatsTimer(self):
+        self.view.updateStatistics(self.spot_counter.getStatistics())
+
     def processMessage(self, message):
 
         if message.isType("changing parameters"):
@@ -344,7 +377,14 @@ class SpotCounter(halModule.HalModule):
             for analyzer in self.analyzers:
                 analyzer.startFilm(film_settings)
 
+            self.spot_counter.resetStatistics()
+            self.handleStatsTimer()
+            self.stats_timer.start()
+
         elif message.isType("stop film"):
+            self.stats_timer.stop()
+            self.handleStatsTimer()
+
             total_spots = 0
             for analyzer in self.analyzers:
                 analyzer.stopFilm()
@@ -231,6 +231,13 @@ class StageView(halDialog.HalDialog):
 
 
 class Stage(halModule.HalModule):
+    handled_messages = {"change directory",
+                        "configure1",
+                        "new parameters",
+                        "show",
+                        "start",
+                        "stop film"}
+
 
     def __init__(self, module_params = None, qt_settings = None, **kwds):
         super().__init__(**kwds)
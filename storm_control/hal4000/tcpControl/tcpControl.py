@@ -512,6 +512,12 @@ class TCPControl(halModule.HalModule):
     """
     HAL TCP control module.
     """
+    handled_messages = {"change directory",
+                        "changing parameters",
+                        "configure2",
+                        "film lockout",
+                        "updated parameters"}
+
     def __init__(self, module_params = None, qt_settings = None, **kwds):
         super().__init__(**kwds)
         self.control_action = None
@@ -126,6 +126,38 @@ class GetParameters(TestAction):
         self.checkParameters()
 
 
+class GetProfile(TestAction):
+    """
+    Get the module profiles.
+    """
+    def __init__(self, **kwds):
+        super().__init__(**kwds)
+
+        self.m_type = "profile"
+        self.profiles = {}
+
+    def checkProfiles(self):
+        """
+        Sub-classes should override this run tests on the 
+        profiles that were returned.
+        """
+        pass
+
+    def finalizer(self):
+        super().finalizer()
+        if not self.message.hasResponses():
+            raise TestException("No response to message '" + self.m_type + "'")
+        self.actionDone.emit()
+
+    def getMessageData(self):
+        return {"reset" : False}
+
+    def handleResponses(self, message):
+        for response in message.getResponses():
+            self.profiles[response.source] = response.getData()["profile"]
+        self.checkProfiles()
+
+
 class LoadParameters(TestAction):
     """
     Load a parameters file.
@@ -67,6 +67,20 @@ class FindSum(TestActionTCP):
                                                  test_mode = self.test_mode)
 
         
+class GetFrameStatistics(TestActionTCP):
+    """
+    Query HAL for the statistics of the frames in a display.
+    """
+    def __init__(self, display_name = None, **kwds):
+        super().__init__(**kwds)
+        data = {}
+        if display_name is not None:
+            data["display_name"] = display_name
+        self.tcp_message = tcpMessage.TCPMessage(message_type = "Get Frame Statistics",
+                                                 message_data = data,
+                                                 test_mode = self.test_mode)
+
+
 class GetMosaicSettings(TestActionTCP):
     """
     Query HAL for the current mosaic settings.
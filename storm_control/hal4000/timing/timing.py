@@ -19,8 +19,12 @@ class TimingFunctionality(halFunctionality.HalFunctionality):
     """
     This is tied to the appropriate camera/feed so that it emits a newFrame
     signal whenever the camera/feed does the same.
+
+    It also emits a newFrames signal with a list of the frame numbers for
+    each group of frames from the camera/feed.
     """
     newFrame = QtCore.pyqtSignal(int)
+    newFrames = QtCore.pyqtSignal(list)
     stopped = QtCore.pyqtSignal()
 
     def __init__(self, time_base = None, **kwds):
@@ -36,11 +40,11 @@ class TimingFunctionality(halFunctionality.HalFunctionality):
         assert (camera_functionality.getCameraName() == self.time_base)
         
         self.cam_fn = camera_functionality
-        self.cam_fn.newFrame.connect(self.handleNewFrame)
+        self.cam_fn.newFrames.connect(self.handleNewFrames)
         self.cam_fn.stopped.connect(self.handleStopped)
 
     def disconnectCameraFunctionality(self):
-        self.cam_fn.newFrame.disconnect(self.handleNewFrame)
+        self.cam_fn.newFrames.disconnect(self.handleNewFrames)
         self.cam_fn.stopped.disconnect(self.handleStopped)
 
     def getCameraFunctionality(self):
@@ -55,8 +59,12 @@ class TimingFunctionality(halFunctionality.HalFunctionality):
     def getTimeBase(self):
         return self.time_base
     
-    def handleNewFrame(self, frame):
-        self.newFrame.emit(frame.frame_number)
+    def handleNewFrames(self, frames):
+        frame_numbers = []
+        for frame in frames:
+            self.newFrame.emit(frame.frame_number)
+            frame_numbers.append(frame.frame_number)
+        self.newFrames.emit(frame_numbers)
 
     def handleStopped(self):
         self.stopped.emit()
@@ -70,6 +78,12 @@ class Timing(halModule.HalModule):
     frame of a film are expected to time themselves using the timing
     functionality provided by this module.
     """
+    handled_messages = {"configuration",
+                        "configure1",
+                        "new parameters",
+                        "start film",
+                        "stop film"}
+
     def __init__(self, module_params = None, qt_settings = None, **kwds):
         super().__init__(**kwds)
         self.timing_functionality = None
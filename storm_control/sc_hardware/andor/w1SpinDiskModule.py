@@ -171,6 +171,9 @@ class W1Control(object):
 
 
 class W1SpinDiskModule(hardwareModule.HardwareModule):
+    handled_messages = {"configure1",
+                        "new parameters"}
+
 
     def __init__(self, module_params = None, qt_settings = None, **kwds):
         super().__init__(**kwds)
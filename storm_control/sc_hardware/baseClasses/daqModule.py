@@ -87,6 +87,13 @@ class DaqFunctionality(hardwareModule.HardwareFunctionality):
 
 
 class DaqModule(hardwareModule.HardwareModule):
+    handled_messages = {"configuration",
+                        "configure1",
+                        "daq waveforms",
+                        "get functionality",
+                        "start film",
+                        "stop film"}
+
     
     def __init__(self, **kwds):
         super().__init__(**kwds)
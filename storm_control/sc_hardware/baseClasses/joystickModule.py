@@ -251,6 +251,12 @@ class JoystickControl(QtCore.QObject):
 
 
 class JoystickModule(halModule.HalModule):
+    handled_messages = {"configuration",
+                        "configure1",
+                        "film lockout",
+                        "new parameters",
+                        "stop film"}
+
 
     def __init__(self, module_params = None, qt_settings = None, **kwds):
         super().__init__(**kwds)
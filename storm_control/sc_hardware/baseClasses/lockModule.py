@@ -83,6 +83,9 @@ class ZStageFunctionalityMixin(LockFunctionalityMixin):
     """
     Z stages are expected to work in units of microns.
 
+    The (optional) 'max_step' parameter in the z stage configuration
+    limits the size of the moves that the focus lock requests.
+
     A Z stage emits one signal:
     (1) zStagePosition() - The current z stage position.
     """
@@ -110,6 +113,16 @@ class ZStageFunctionalityMixin(LockFunctionalityMixin):
 
     def getMinimum(self):
         return self.getParameter("minimum")
+
+    def getMaximumStep(self):
+        """
+        Returns the largest move (in microns) that the focus lock should request
+        in a single update, or None if there is no limit. This is the (optional)
+        'max_step' parameter.
+        """
+        if self.hasParameter("max_step"):
+            return self.getParameter("max_step")
+        return None
     
     def goAbsolute(self, z_pos):
         pass
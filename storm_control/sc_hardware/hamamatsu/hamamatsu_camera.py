@@ -259,8 +259,9 @@ class HamamatsuCamera(object):
     Basic camera interface class.
     
     This version uses the Hamamatsu library to allocate camera buffers.
-    Storage for the data from the camera is allocated dynamically and
-    copied out of the camera buffers.
+    The data from the camera is copied out of the camera buffers, into
+    buffers borrowed from the frame pool (if there is one), otherwise
+    into dynamically allocated storage.
     """
     def __init__(self, camera_id = None, **kwds):
         """
@@ -273,6 +274,7 @@ class HamamatsuCamera(object):
         self.debug = False
         self.encoding = 'utf-8'
         self.frame_bytes = 0
+        self.frame_pool = None
         self.frame_x = 0
         self.frame_y = 0
         self.last_frame_number = 0
@@ -409,9 +411,13 @@ class HamamatsuCamera(object):
                                                 ctypes.byref(paramlock)),
                              "dcambuf_lockframe")
 
-            # Create storage for the frame & copy into this storage.
-            hc_data = HCamData(self.frame_bytes)
-            hc_data.copyData(paramlock.buf)
+            # Get storage for the frame & copy into this storage.
+            if self.frame_pool is not None:
+                hc_data = self.frame_pool.borrow(int(self.frame_bytes/2))
+                ctypes.memmove(hc_data.getDataPtr(), paramlock.buf, self.frame_bytes)
+            else:
+                hc_data = HCamData(self.frame_bytes)
+                hc_data.copyData(paramlock.buf)
 
             frames.append(hc_data)
 
@@ -648,6 +654,13 @@ class HamamatsuCamera(object):
 
         return new_frames
 
+    def setFramePool(self, frame_pool):
+        """
+        Set the pool (a hal4000.camera.frame.FramePool) to get storage
+        for the frames from.
+        """
+        self.frame_pool = frame_pool
+
     def setPropertyValue(self, property_name, property_value):
         """
         Set the value of a property.
@@ -803,6 +816,10 @@ class HamamatsuCameraMR(HamamatsuCamera):
     that there is a lot less memory allocation & shuffling compared
     to the basic class, which performs one allocation and (I believe)
     two copies for each frame that is acquired.
+
+    The frame pool (see setFramePool()) is not used by this class, the
+    frames are already in recycled memory so using the pool would only
+    add a copy.
     
     WARNING: There is the potential here for chaos. Since the memory
              is now shared there is the possibility that downstream code
@@ -25,6 +25,7 @@ class NoneQPDFunctionality(hardwareModule.BufferedFunctionality, lockModule.QPDF
         self.noise = noise
         self.tilt = tilt
         self.xy_stage_fn = None
+        self.z_drift = 0.0
         self.z_offset = 0.0
         self.z_stage_center = None
         self.z_stage_fn = None
@@ -35,26 +36,26 @@ class NoneQPDFunctionality(hardwareModule.BufferedFunctionality, lockModule.QPDF
         self.mustRun(task = self.scan,
                      ret_signal = self.qpdUpdate)
 
-    def scan(self):
-        if self.first_scan:
-            self.first_scan = False
-        else:
-            time.sleep(0.1)
-
+    def measure(self):
+        """
+        Returns the current QPD reading.
+        """
         #
         # Determine current z offset. This is the offset of the z stage from
-        # it's center position adjusted by xy stage tilt (if any).
+        # it's center position adjusted by xy stage tilt (if any) and by
+        # the sample drift.
         #
         z_offset = 0.0
-        if (self.xy_stage_fn is not None) and (self.z_stage_fn is not None):
-            z_center = self.z_stage_center
-            
-            pos_dict = self.xy_stage_fn.getCurrentPosition()
-            if pos_dict is not None:
-                dx = pos_dict["x"]
-                #dy = pos_dict["y"]
-                #dd = math.sqrt(dx*dx + dy*dy)
-                z_center += self.tilt * dx
+        if (self.z_stage_fn is not None):
+            z_center = self.z_stage_center + self.z_drift
+
+            if (self.xy_stage_fn is not None):
+                pos_dict = self.xy_stage_fn.getCurrentPosition()
+                if pos_dict is not None:
+                    dx = pos_dict["x"]
+                    #dy = pos_dict["y"]
+                    #dd = math.sqrt(dx*dx + dy*dy)
+                    z_center += self.tilt * dx
 
             if (z_center > self.z_stage_max):
                 z_center = self.z_stage_max
@@ -77,6 +78,20 @@ class NoneQPDFunctionality(hardwareModule.BufferedFunctionality, lockModule.QPDF
                 "x" : 100.0 * z_offset,
                 "y" : 0.0}
 
+    def scan(self):
+        if self.first_scan:
+            self.first_scan = False
+        else:
+            time.sleep(0.1)
+        return self.measure()
+
+    def setDrift(self, z_drift):
+        """
+        Set how far (in microns) the sample has drifted in z, this is
+        for simulating the focus lock.
+        """
+        self.z_drift = z_drift
+
     def setFunctionality(self, name, functionality):
         if (name == "xy_stage"):
             self.xy_stage_fn = functionality
@@ -89,6 +104,9 @@ class NoneQPDFunctionality(hardwareModule.BufferedFunctionality, lockModule.QPDF
             print(">> Warning unknown function", name)
 
 class NoneQPDModule(hardwareModule.HardwareModule):
+    handled_messages = {"configure2",
+                        "get functionality"}
+
 
     def __init__(self, module_params = None, qt_settings = None, **kwds):
         super().__init__(**kwds)
@@ -36,6 +36,8 @@ class NoneZStageFunctionality(hardwareModule.HardwareFunctionality, lockModule.Z
 
 
 class NoneZStageModule(hardwareModule.HardwareModule):
+    handled_messages = {"get functionality"}
+
 
     def __init__(self, module_params = None, qt_settings = None, **kwds):
         super().__init__(**kwds)
@@ -48,6 +48,12 @@ class PriorStageFunctionality(stageModule.StageFunctionalityNF):
 # have to duplicate most of the stage stuff, particularly the TCP control.
 #
 class PriorController(stageModule.StageModule):
+    handled_messages = {"configuration",
+                        "get functionality",
+                        "start film",
+                        "stop film",
+                        "tcp message"}
+
 
     def __init__(self, module_params = None, qt_settings = None, **kwds):
         super().__init__(**kwds)
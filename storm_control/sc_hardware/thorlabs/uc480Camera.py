@@ -23,7 +23,8 @@ import storm_control.sc_library.hdebug as hdebug
 
 # Import fitting libraries.
 
-# Numpy fitter, this should always be available.
+# Numpy fitters, these should always be available.
+import storm_control.sc_hardware.utility.batch_lock_fitter as batchLF
 import storm_control.sc_hardware.utility.np_lock_peak_finder as npLPF
 
 # Finding/fitting using the storm-analysis project.
@@ -366,6 +367,13 @@ class CameraQPD(object):
         self.half_y = int(self.y_width/2)
         self.X = numpy.arange(self.y_width) - 0.5*float(self.y_width)
 
+        # Work buffers for the moment calculation, these are the band sums and
+        # the pixel positions for the left and the right halves of the AOI.
+        self.band_sums = [numpy.zeros(self.half_x, dtype = numpy.int64),
+                          numpy.zeros(self.x_width - self.half_x, dtype = numpy.int64)]
+        self.band_x = [numpy.arange(self.half_x, dtype = numpy.int64),
+                       numpy.arange(self.x_width - self.half_x, dtype = numpy.int64)]
+
     def adjustAOI(self, dx, dy):
         self.x_start += dx
         self.y_start += dy
@@ -382,6 +390,33 @@ class CameraQPD(object):
     def adjustZeroDist(self, inc):
         self.zero_dist += inc
 
+    def calcOffset(self, total_good, dist1, dist2):
+        """
+        Calculate the offset from the distances of the two spots from the
+        center of the camera AOI.
+
+        In the event that only beam spot can be fit then this will
+        attempt to compensate. However this assumes that the two
+        spots are centered across the mid-line of camera ROI.
+
+        Returns [total_good, offset]
+        """
+        # No good fits.
+        if (total_good == 0):
+            return [0.0, 0.0]
+
+        # One good fit.
+        elif (total_good == 1):
+            if self.allow_single_fits:
+                return [1.0, ((dist1 + dist2) - 0.5*self.zero_dist)]
+            else:
+                return [0.0, 0.0]
+
+        # Two good fits. This gets twice the weight of one good fit
+        # if we are averaging.
+        else:
+            return [2.0, 2.0*((dist1 + dist2) - self.zero_dist)]
+
     def capture(self):
         """
         Get the next image from the camera.
@@ -407,31 +442,28 @@ class CameraQPD(object):
         total_good = 0
         data_band = data[self.half_y-15:self.half_y+15,:]
 
-        # Moment for the object in the left half of the picture.
-        x = numpy.arange(self.half_x)
-        data_ave = numpy.average(data_band[:,:self.half_x], axis = 0)
-        power1 = numpy.sum(data_ave)
+        # Moment for the object in the left half of the picture. We use
+        # the sums over the band rather than the averages as the number
+        # of rows cancels out.
+        band_sum = numpy.sum(data_band[:,:self.half_x], axis = 0, dtype = numpy.int64, out = self.band_sums[0])
+        power1 = numpy.sum(band_sum)
 
         dist1 = 0.0
-        if (power1 > 0.0):
+        if (power1 > 0):
             total_good += 1
-            self.y_off1 = numpy.sum(x * data_ave) / power1 - self.half_x
+            self.y_off1 = float(numpy.dot(self.band_x[0], band_sum)) / power1 - self.half_x
             dist1 = abs(self.y_off1)
 
         # Moment for the object in the right half of the picture.
-        data_ave = numpy.average(data_band[:,self.half_x:], axis = 0)
-        power2 = numpy.sum(data_ave)
+        band_sum = numpy.sum(data_band[:,self.half_x:], axis = 0, dtype = numpy.int64, out = self.band_sums[1])
+        power2 = numpy.sum(band_sum)
 
         dist2 = 0.0
-        if (power2 > 0.0):
+        if (power2 > 0):
             total_good += 1
-            self.y_off2 = numpy.sum(x * data_ave) / power2
+            self.y_off2 = float(numpy.dot(self.band_x[1], band_sum)) / power2
             dist2 = abs(self.y_off2)
 
-        # The moment calculation is too fast. This is to slow things
-        # down so that (hopefully) the camera doesn't freeze up.
-        time.sleep(0.02)
-        
         return [total_good, dist1, dist2]
 
     def getImage(self):
@@ -483,10 +515,12 @@ class CameraQPD(object):
 
         Returns [power, total_good, offset]
         """
-        data = self.capture().copy()
+        # The fitters don't change the image so we don't need to copy it.
+        data = self.capture()
 
         # The power number is the sum over the camera AOI minus the background.
-        power = numpy.sum(data.astype(numpy.int64)) - self.background
+        # The camera is 8 bit so a 32 bit sum will not overflow.
+        power = int(numpy.sum(data, dtype = numpy.uint32)) - self.background
         
         # (Simple) Check for duplicate frames.
         if (power == self.last_power):
@@ -497,10 +531,6 @@ class CameraQPD(object):
         self.last_power = power
 
         # Determine offset by fitting gaussians to the two beam spots.
-        # In the event that only beam spot can be fit then this will
-        # attempt to compensate. However this assumes that the two
-        # spots are centered across the mid-line of camera ROI.
-        #
         if (self.fit_mode == 1):
             [total_good, dist1, dist2] = self.doFit(data)
 
@@ -509,23 +539,106 @@ class CameraQPD(object):
             [total_good, dist1, dist2] = self.doMoments(data)
                         
         # Calculate offset.
-        #
+        [total_good, offset] = self.calcOffset(total_good, dist1, dist2)
+        return [power, total_good, offset]
 
-        # No good fits.
-        if (total_good == 0):
-            return [power, 0.0, 0.0]
 
-        # One good fit.
-        elif (total_good == 1):
-            if self.allow_single_fits:
-                return [power, 1.0, ((dist1 + dist2) - 0.5*self.zero_dist)]
-            else:
-                return [power, 0.0, 0.0]
+class CameraQPDBatchFit(CameraQPD):
+    """
+    This version uses batch_lock_fitter to fit both spots in all of
+    the images of a scan at once.
+    """
+    def __init__(self, **kwds):
+        super().__init__(**kwds)
 
-        # Two good fits. This gets twice the weight of one good fit
-        # if we are averaging.
+        self.fitter = batchLF.BatchLockFitter(n_spots = 2,
+                                              roi_size = int(3.0 * self.sigma),
+                                              sigma = self.sigma,
+                                              threshold = 10)
+        self.images = None
+
+    def adjustAOI(self, dx, dy):
+        super().adjustAOI(dx, dy)
+
+        # The spots will have moved.
+        self.fitter.reset()
+
+    def doFit(self, data):
+        [rows, cols, good] = self.fitter.fitSpots([data[None,:,:self.half_x],
+                                                   data[None,:,self.half_x:]])
+        return self.spotDistances(rows[:,0], cols[:,0], good[:,0])
+
+    def qpdScan(self, reps = 4):
+        """
+        Returns [power, offset, is_good]
+        """
+        if (self.fit_mode != 1):
+            return super().qpdScan(reps = reps)
+
+        if (self.images is None) or (self.images.shape[0] != reps):
+            self.images = numpy.zeros((reps, self.y_width, self.x_width), dtype = numpy.uint8)
+
+        # Capture all of the images, skipping duplicates.
+        n_images = 0
+        power_total = 0.0
+        for i in range(reps):
+            data = self.capture()
+            power = int(numpy.sum(data, dtype = numpy.uint32)) - self.background
+            power_total += power
+            if (power == self.last_power):
+                time.sleep(0.05)
+                continue
+            self.last_power = power
+            self.images[n_images] = data
+            n_images += 1
+
+        power_total = power_total/float(reps)
+        if (n_images == 0):
+            return [power_total, 0, False]
+
+        # Fit the spots in all of the images.
+        images = self.images[:n_images]
+        [rows, cols, good] = self.fitter.fitSpots([images[:,:,:self.half_x],
+                                                   images[:,:,self.half_x:]])
+        offset_total = 0.0
+        good_total = 0.0
+        for i in range(n_images):
+            [total_good, dist1, dist2] = self.spotDistances(rows[:,i], cols[:,i], good[:,i])
+            [n_good, offset] = self.calcOffset(total_good, dist1, dist2)
+            good_total += n_good
+            offset_total += offset
+
+        if (good_total > 0):
+            return [power_total, offset_total/good_total, True]
         else:
-            return [power, 2.0, 2.0*((dist1 + dist2) - self.zero_dist)]
+            return [power_total, 0, False]
+
+    def spotDistances(self, rows, cols, good):
+        """
+        Returns [total_good, dist1, dist2] for the fits to the
+        spots in the left and right halves of a single image.
+        """
+        dist1 = 0
+        dist2 = 0
+        self.x_off1 = 0.0
+        self.y_off1 = 0.0
+        self.x_off2 = 0.0
+        self.y_off2 = 0.0
+
+        total_good = 0
+        if good[0]:
+            total_good += 1
+            self.x_off1 = rows[0] - self.half_y
+            self.y_off1 = cols[0] - self.half_x
+            dist1 = abs(self.y_off1)
+
+        if good[1]:
+            total_good += 1
+            self.x_off2 = rows[1] - self.half_y
+            self.y_off2 = cols[1]
+            dist2 = abs(self.y_off2)
+
+        return [total_good, dist1, dist2]
 
 
 class CameraQPDCorrFit(CameraQPD):
@@ -4,6 +4,7 @@ UC480 Camera QPD functionality.
 
 Hazen 04/17
 """
+import time
 
 from PyQt5 import QtCore
 
@@ -18,14 +19,15 @@ class UC480QPDCameraFunctionality(hardwareModule.BufferedFunctionality, lockModu
     qpdUpdate = QtCore.pyqtSignal(dict)
     threadUpdate = QtCore.pyqtSignal(dict)
 
-    def __init__(self, camera = None, reps = None, **kwds):
+    def __init__(self, camera = None, reps = None, update_rate = None, **kwds):
         super().__init__(**kwds)
         self.camera = camera
         self.scan_thread = UC480ScanThread(camera = self.camera,
                                            device_mutex = self.device_mutex,
                                            qpd_update_signal = self.threadUpdate,
                                            reps = reps,
-                                           units_to_microns = self.units_to_microns)
+                                           units_to_microns = self.units_to_microns,
+                                           update_rate = update_rate)
         self.threadUpdate.connect(self.handleThreadUpdate)
 
     def adjustAOI(self, dx, dy):
@@ -69,6 +71,11 @@ class UC480ScanThread(QtCore.QThread):
     Handles periodic polling of the camera to determine the current offset. 
     In testing this approach appeared more performant than starting a new
     QRunnable for each scan.
+
+    The scans are started at update_rate (in Hz) if the camera and the
+    fitting can keep up, an update_rate of 0 means as fast as possible. The
+    achieved update rate and the time per scan (latency) are included in
+    the QPD update and a summary is printed when scanning stops.
     """
     def __init__(self,
                  camera = None,
@@ -76,45 +83,112 @@ class UC480ScanThread(QtCore.QThread):
                  qpd_update_signal = None,
                  reps = None,
                  units_to_microns = None,
+                 update_rate = None,
                  **kwds):
         super().__init__(**kwds)
         self.camera = camera
         self.device_mutex = device_mutex
+        self.latency_max = 0.0
+        self.latency_total = 0.0
+        self.n_scans = 0
         self.qpd_update_signal = qpd_update_signal
         self.reps = reps
         self.running = False
+        self.scan_time = 0.0
         self.units_to_microns = units_to_microns
+
+        self.period = 0.0
+        if (update_rate is not None) and (update_rate > 0.0):
+            self.period = 1.0/update_rate
+
+    def getStatistics(self):
+        """
+        Returns the number of scans, the achieved update rate and the
+        mean and maximum scan latency (in seconds).
+        """
+        stats = {"n_scans" : self.n_scans,
+                 "latency_max" : self.latency_max,
+                 "latency_mean" : 0.0,
+                 "update_rate" : 0.0}
+        if (self.n_scans > 0):
+            stats["latency_mean"] = self.latency_total/self.n_scans
+            stats["update_rate"] = self.n_scans/self.scan_time
+        return stats
     
     def isRunning(self):
         return self.running
         
     def run(self):
+        self.latency_max = 0.0
+        self.latency_total = 0.0
+        self.n_scans = 0
         self.running = True
+
+        # The update rate is smoothed over the last ~10 scans.
+        mean_period = self.period
+        start_time = time.perf_counter()
+        next_time = start_time
+        last_time = start_time
         while(self.running):
+            scan_start = time.perf_counter()
             [power, offset, is_good] = self.camera.qpdScan(reps = self.reps)
             [image, x_off1, y_off1, x_off2, y_off2, sigma] = self.camera.getImage()
+            scan_end = time.perf_counter()
+
+            latency = scan_end - scan_start
+            self.latency_max = max(self.latency_max, latency)
+            self.latency_total += latency
+            self.n_scans += 1
+            self.scan_time = scan_end - start_time
+
+            mean_period += 0.1 * ((scan_start - last_time) - mean_period)
+            last_time = scan_start
+
+            update_rate = 0.0
+            if (mean_period > 0.0):
+                update_rate = 1.0/mean_period
+            
             self.qpd_update_signal.emit({"is_good" : is_good, # This is the flag for good fit values.
                                          "image" : image,
+                                         "latency" : latency,
                                          "offset" : offset * self.units_to_microns,
                                          "sigma" : sigma,
                                          "sum" : power,
+                                         "update_rate" : update_rate,
                                          "x_off1" : x_off1,
                                          "y_off1" : y_off1,
                                          "x_off2" : x_off2,
                                          "y_off2" : y_off2})
 
+            # Wait until it is time for the next scan. If we have fallen behind
+            # we start the next scan immediately, but we don't try to catch up.
+            if (self.period > 0.0):
+                next_time += self.period
+                wait_time = next_time - time.perf_counter()
+                if (wait_time > 0.0):
+                    time.sleep(wait_time)
+                else:
+                    next_time = time.perf_counter()
+
     def startScan(self):
         self.start(QtCore.QThread.NormalPriority)
 
     def stopScan(self):
         self.running = False
         self.wait()
+        stats = self.getStatistics()
+        if (stats["n_scans"] > 0):
+            print("> UC480-QPD {0:.1f}Hz, latency {1:.2f}ms mean, {2:.2f}ms max".format(stats["update_rate"],
+                                                                                       1000.0 * stats["latency_mean"],
+                                                                                       1000.0 * stats["latency_max"]))
             
 
 class UC480Camera(hardwareModule.HardwareModule):
     """
     HAL module that interfaces with a Thorlabs UC480 camera.
     """
+    handled_messages = {"get functionality"}
+
     def __init__(self, module_params = None, qt_settings = None, **kwds):
         super().__init__(**kwds)
         self.camera = None
@@ -123,11 +197,27 @@ class UC480Camera(hardwareModule.HardwareModule):
         configuration = module_params.get("configuration")
         uc480Camera.loadDLL(configuration.get("uc480_dll"))
 
+        # Fit both spots in all of the images of a scan at once. This only
+        # uses numpy/scipy and is hopefully fast enough to increase the
+        # lock update rate on computers without storm-analysis.
+        #
+        if (configuration.get("use_batch_fit", False)):
+            print("> using batch fitting.")
+            self.camera = uc480Camera.CameraQPDBatchFit(allow_single_fits = configuration.get("allow_single_fits", False),
+                                                        background = configuration.get("background"),
+                                                        camera_id = configuration.get("camera_id"),
+                                                        ini_file = configuration.get("ini_file"),
+                                                        offset_file = configuration.get("offset_file"),
+                                                        pixel_clock = configuration.get("pixel_clock", 30),
+                                                        sigma = configuration.get("sigma"),
+                                                        x_width = configuration.get("x_width"),
+                                                        y_width = configuration.get("y_width"))
+
         # Use the storm-analysis project for finding and image correlation for
         # fitting. This is hopefully less sensitive to the fringes than a
         # Gaussian fitting approach.
         #
-        if (configuration.get("use_correlation", False)):
+        elif (configuration.get("use_correlation", False)):
             print("> using correlation for fitting.")
             self.camera = uc480Camera.CameraQPDCorrFit(allow_single_fits = configuration.get("allow_single_fits", False),
                                                        background = configuration.get("background"),
@@ -171,7 +261,8 @@ class UC480Camera(hardwareModule.HardwareModule):
                                                                 device_mutex = QtCore.QMutex(),
                                                                 parameters = configuration.get("parameters"),
                                                                 reps = configuration.get("reps", 1),
-                                                                units_to_microns = configuration.get("units_to_microns"))
+                                                                units_to_microns = configuration.get("units_to_microns"),
+                                                                update_rate = configuration.get("update_rate", 50.0))
 
     def cleanUp(self, qt_settings):
         self.camera_functionality.wait()
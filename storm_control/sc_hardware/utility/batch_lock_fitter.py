@@ -0,0 +1,267 @@
+#!/usr/bin/env python
+"""
+Batch fitting of the spots for the camera based focus locks. This
+version uses numpy/scipy only.
+
+All the spots in a stack of images (for example the 'reps' images of
+a single QPD scan) are fit with a fixed width 2D Gaussian in a single
+vectorized Levenberg-Marquardt pass. The fit results of the previous
+call are used as the starting point (warm start) for the next call and
+to limit the peak search (and the convolution) to a small region
+around the last known location of each spot.
+"""
+import numpy
+import scipy
+import scipy.ndimage
+
+
+class BatchLockFitter(object):
+    """
+    Each spot is fit in its own stack of images. As an example, the
+    camera focus lock has two spots, one in the left half and one in
+    the right half of the camera AOI.
+
+    Positions are in pixels, with the center of the first pixel at 0.0.
+    """
+    def __init__(self,
+                 max_iterations = 20,
+                 n_spots = None,
+                 roi_size = None,
+                 search_size = None,
+                 sigma = None,
+                 threshold = None,
+                 tolerance = 1.0e-3,
+                 **kwds):
+        """
+        max_iterations - The maximum number of Levenberg-Marquardt iterations.
+        n_spots - The number of spots (image stacks) to fit.
+        roi_size - The fitting ROI is 2 x roi_size pixels on a side.
+        search_size - How far (in pixels) to search for the peak around
+                      its last location, the default is roi_size.
+        sigma - The (fixed) Gaussian sigma in pixels.
+        threshold - The minimum peak height in the smoothed image.
+        tolerance - Stop iterating when the center moves less than this.
+        """
+        super().__init__(**kwds)
+
+        self.max_iterations = max_iterations
+        self.n_spots = n_spots
+        self.roi_size = roi_size
+        self.search_size = search_size
+        self.sigma = sigma
+        self.threshold = threshold
+        self.tolerance = tolerance
+
+        if self.search_size is None:
+            self.search_size = self.roi_size
+
+        # ROI pixel coordinates.
+        size = 2 * self.roi_size
+        [rr, cc] = numpy.mgrid[0:size,0:size]
+        self.roi_offsets = numpy.arange(size)
+        self.rr = rr.ravel().astype(numpy.float64)
+        self.cc = cc.ravel().astype(numpy.float64)
+
+        # The last good fit for each spot, [background, height, row, column].
+        self.last_fit = [None] * self.n_spots
+
+    def findPeaks(self, spot, images):
+        """
+        Returns the integer peak locations and a flag for whether a
+        peak was found in each of the images. If we know where the spot
+        was last time only that part of the image is searched.
+        """
+        [n, h, w] = images.shape
+        [r0, c0, r1, c1] = [0, 0, h, w]
+        if self.last_fit[spot] is not None:
+            [row, col] = [int(round(x)) for x in self.last_fit[spot][2:]]
+            r0 = max(0, row - self.search_size - self.roi_size)
+            c0 = max(0, col - self.search_size - self.roi_size)
+            r1 = min(h, row + self.search_size + self.roi_size + 1)
+            c1 = min(w, col + self.search_size + self.roi_size + 1)
+
+        smoothed = images[:,r0:r1,c0:c1].astype(numpy.float32)
+        smoothed = scipy.ndimage.gaussian_filter1d(smoothed, self.sigma, axis = 1)
+        smoothed = scipy.ndimage.gaussian_filter1d(smoothed, self.sigma, axis = 2)
+
+        flat = smoothed.reshape(n, -1)
+        index = numpy.argmax(flat, axis = 1)
+        height = flat[numpy.arange(n), index] - numpy.min(flat, axis = 1)
+        rows = index // smoothed.shape[2] + r0
+        cols = index % smoothed.shape[2] + c0
+
+        # The peak must be tall enough and far enough from the edge
+        # of the image for the ROI to fit.
+        rs = self.roi_size
+        found = (height > self.threshold)
+        found &= (rows >= rs) & (rows <= (h - rs)) & (cols >= rs) & (cols <= (w - rs))
+        return [rows, cols, found]
+
+    def fitROIs(self, rois, params):
+        """
+        Fit a fixed width Gaussian to each of the ROIs, these are
+        (N, roi pixels) arrays. params is the (N, 4) array of starting
+        values for the background, height, row and column.
+
+        Returns the fit parameters and whether the fit converged.
+        """
+        n = rois.shape[0]
+        diag = numpy.arange(4)
+        lam = numpy.full(n, 1.0e-3)
+        converged = numpy.zeros(n, dtype = bool)
+        s2 = self.sigma * self.sigma
+
+        def model(p):
+            dr = self.rr[None,:] - p[:,2,None]
+            dc = self.cc[None,:] - p[:,3,None]
+            e = numpy.exp(-0.5 * (dr * dr + dc * dc)/s2)
+            return [dr, dc, e, p[:,0,None] + p[:,1,None] * e]
+
+        [dr, dc, e, f] = model(params)
+        resid = rois - f
+        error = numpy.sum(resid * resid, axis = 1)
+        jac = numpy.empty((n, rois.shape[1], 4))
+
+        for i in range(self.max_iterations):
+
+            # Jacobian of the model.
+            jac[:,:,0] = 1.0
+            jac[:,:,1] = e
+            jac[:,:,2] = (params[:,1,None]/s2) * e * dr
+            jac[:,:,3] = (params[:,1,None]/s2) * e * dc
+
+            jtj = numpy.einsum("npi,npj->nij", jac, jac)
+            jtr = numpy.einsum("npi,np->ni", jac, resid)
+
+            # Levenberg-Marquardt damping, the small constant keeps the
+            # matrix invertible if the height goes to zero.
+            jtj[:,diag,diag] *= (1.0 + lam[:,None])
+            jtj[:,diag,diag] += 1.0e-12
+            delta = numpy.linalg.solve(jtj, jtr[:,:,None])[:,:,0]
+
+            new_params = params + delta
+            [new_dr, new_dc, new_e, new_f] = model(new_params)
+            new_resid = rois - new_f
+            new_error = numpy.sum(new_resid * new_resid, axis = 1)
+
+            # Keep the updates that reduced the error.
+            better = (new_error < error) & numpy.logical_not(converged)
+            params[better] = new_params[better]
+            dr[better] = new_dr[better]
+            dc[better] = new_dc[better]
+            e[better] = new_e[better]
+            resid[better] = new_resid[better]
+            error[better] = new_error[better]
+            lam = numpy.where(better, 0.1 * lam, 10.0 * lam)
+
+            converged |= better & (numpy.max(numpy.abs(delta[:,2:]), axis = 1) < self.tolerance)
+            converged |= (lam > 1.0e10)
+            if numpy.all(converged):
+                break
+
+        # The fit must have a positive height with the peak inside the ROI.
+        size = float(2 * self.roi_size)
+        good = (params[:,1] > 0.0)
+        good &= (params[:,2] > 0.0) & (params[:,2] < size) & (params[:,3] > 0.0) & (params[:,3] < size)
+        return [params, good]
+
+    def fitSpots(self, images):
+        """
+        images is a list of n_spots image stacks, each (N, height, width).
+
+        Returns [rows, columns, good], these are (n_spots, N) arrays.
+        """
+        assert (len(images) == self.n_spots)
+        n = images[0].shape[0]
+        rs = self.roi_size
+
+        # Find the peaks and slice out the ROIs.
+        all_rois = []
+        all_params = []
+        all_found = []
+        roi_origins = []
+        for spot, stack in enumerate(images):
+            [rows, cols, found] = self.findPeaks(spot, stack)
+            r0 = numpy.clip(rows - rs, 0, stack.shape[1] - 2*rs)
+            c0 = numpy.clip(cols - rs, 0, stack.shape[2] - 2*rs)
+            rois = stack[numpy.arange(n)[:,None,None],
+                         r0[:,None,None] + self.roi_offsets[None,:,None],
+                         c0[:,None,None] + self.roi_offsets[None,None,:]]
+            rois = rois.reshape(n, -1).astype(numpy.float64)
+
+            # Starting values, from the last fit if the spot has not moved
+            # much since then, otherwise from the ROI.
+            params = numpy.empty((n, 4))
+            params[:,2] = rows - r0
+            params[:,3] = cols - c0
+            if self.last_fit[spot] is not None:
+                [last_row, last_col] = self.last_fit[spot][2:]
+                params[:,:2] = self.last_fit[spot][:2]
+                near = (numpy.abs(rows - last_row) < 1.0) & (numpy.abs(cols - last_col) < 1.0)
+                params[near,2] = last_row - r0[near]
+                params[near,3] = last_col - c0[near]
+            else:
+                params[:,0] = numpy.min(rois, axis = 1)
+                params[:,1] = numpy.max(rois, axis = 1) - params[:,0]
+
+            all_rois.append(rois)
+            all_params.append(params)
+            all_found.append(found)
+            roi_origins.append([r0, c0])
+
+        # Fit all the ROIs together.
+        [params, good] = self.fitROIs(numpy.concatenate(all_rois),
+                                      numpy.concatenate(all_params))
+        params = params.reshape(self.n_spots, n, 4)
+        good = good.reshape(self.n_spots, n) & numpy.array(all_found)
+
+        rows = numpy.zeros((self.n_spots, n))
+        cols = numpy.zeros((self.n_spots, n))
+        for spot in range(self.n_spots):
+            [r0, c0] = roi_origins[spot]
+            rows[spot] = params[spot,:,2] + r0
+            cols[spot] = params[spot,:,3] + c0
+
+            # Save the average of the good fits for the next warm start.
+            sg = good[spot]
+            if numpy.any(sg):
+                self.last_fit[spot] = [numpy.mean(params[spot,sg,0]),
+                                       numpy.mean(params[spot,sg,1]),
+                                       numpy.mean(rows[spot,sg]),
+                                       numpy.mean(cols[spot,sg])]
+            else:
+                self.last_fit[spot] = None
+
+        return [rows, cols, good]
+
+    def reset(self):
+        """
+        Forget the last fit, the next call to fitSpots() will search
+        the whole image for each spot.
+        """
+        self.last_fit = [None] * self.n_spots
+
+
+#
+# The MIT License
+#
+# Copyright (c) 2026 Babcock Lab, Harvard University
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
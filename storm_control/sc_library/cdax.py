@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+"""
+The chunked (and optionally compressed) .cdax movie format.
+
+The frames are stored in chunks of N frames. Each chunk is (optionally)
+byte shuffled, so that the mostly constant high bytes of the 16 bit
+pixels are grouped together, and then compressed with zlib. Dark
+STORM movies typically compress 3-5x this way.
+
+File layout (all values little endian):
+
+  1. Header, see header_struct.
+  2. The chunks, one after another.
+  3. The chunk index table, one chunk_dtype entry per chunk.
+  4. The per-frame metadata table, one frame_dtype entry per frame.
+  5. Footer, see footer_struct.
+
+The index and metadata tables are written when the file is closed.
+"""
+
+import numpy
+import struct
+import zlib
+
+
+# Compression modes.
+COMPRESSION_NONE = 0
+COMPRESSION_SHUFFLE_ZLIB = 1
+
+magic = b"CDAX"
+version = 1
+
+# magic, version, x pixels, y pixels, frames per chunk, compression.
+header_struct = struct.Struct("<4sIIIII")
+
+# chunk index table offset, number of chunks, frame table offset, number of frames, magic.
+footer_struct = struct.Struct("<QQQQ4s")
+
+chunk_dtype = numpy.dtype([("offset", "<u8"),
+                           ("nbytes", "<u8"),
+                           ("first_frame", "<u8"),
+                           ("n_frames", "<u8")])
+
+# 'time' is the (host) time at which the frame was received. The stage
+# position is in microns, the lock offset is in the focus lock units.
+# Values that were not available are NaN.
+frame_dtype = numpy.dtype([("frame_number", "<i8"),
+                           ("time", "<f8"),
+                           ("stage_x", "<f8"),
+                           ("stage_y", "<f8"),
+                           ("lock_offset", "<f8")])
+
+
+class CDaxException(Exception):
+    pass
+
+
+def compressChunk(frames, compression, level = 1):
+    """
+    frames is a numpy.uint16 array, returns a bytes object.
+    """
+    if (compression == COMPRESSION_NONE):
+        return frames.astype("<u2", copy = False).tobytes()
+    elif (compression == COMPRESSION_SHUFFLE_ZLIB):
+        as_bytes = numpy.ascontiguousarray(frames, dtype = "<u2").view(numpy.uint8).reshape(-1, 2)
+        return zlib.compress(numpy.ascontiguousarray(as_bytes.T).tobytes(), level)
+    else:
+        raise CDaxException("Unknown compression mode " + str(compression))
+
+def decompressChunk(data, compression, n_pixels):
+    """
+    Returns a 1D numpy.uint16 array with n_pixels elements.
+    """
+    if (compression == COMPRESSION_NONE):
+        return numpy.frombuffer(data, dtype = "<u2", count = n_pixels).astype(numpy.uint16)
+    elif (compression == COMPRESSION_SHUFFLE_ZLIB):
+        planes = numpy.frombuffer(zlib.decompress(data), dtype = numpy.uint8).reshape(2, n_pixels)
+        return numpy.ascontiguousarray(planes.T).view("<u2").reshape(-1).astype(numpy.uint16)
+    else:
+        raise CDaxException("Unknown compression mode " + str(compression))
+
+
+class CDaxWriter(object):
+    """
+    Writes a .cdax file. Frames must all be the same size.
+    """
+    def __init__(self, filename = None, x_pixels = None, y_pixels = None, chunk_frames = 16, compression = COMPRESSION_SHUFFLE_ZLIB, **kwds):
+        super().__init__(**kwds)
+        self.chunk_frames = chunk_frames
+        self.chunks = []
+        self.compression = compression
+        self.frame_pixels = x_pixels * y_pixels
+        self.n_buffered = 0
+        self.n_frames = 0
+
+        self.chunk_buffer = numpy.zeros((chunk_frames, self.frame_pixels), dtype = numpy.uint16)
+
+        self.fp = open(filename, "wb")
+        self.fp.write(header_struct.pack(magic, version, x_pixels, y_pixels, chunk_frames, compression))
+
+    def addFrames(self, frames):
+        """
+        frames is a 2D numpy.uint16 array with one frame per row.
+        """
+        i = 0
+        while (i < frames.shape[0]):
+            n = min(frames.shape[0] - i, self.chunk_frames - self.n_buffered)
+            self.chunk_buffer[self.n_buffered:self.n_buffered+n,:] = frames[i:i+n,:]
+            self.n_buffered += n
+            i += n
+            if (self.n_buffered == self.chunk_frames):
+                self.writeChunk()
+
+    def close(self, frame_table = None):
+        """
+        frame_table is a numpy array of type frame_dtype, if it is not
+        specified (or too short) then only the frame numbers are saved.
+        """
+        if (self.n_buffered > 0):
+            self.writeChunk()
+
+        table = numpy.zeros(self.n_frames, dtype = frame_dtype)
+        table["frame_number"] = numpy.arange(self.n_frames)
+        for elt in ["time", "stage_x", "stage_y", "lock_offset"]:
+            table[elt] = numpy.nan
+        if frame_table is not None:
+            n = min(self.n_frames, frame_table.size)
+            table[:n] = frame_table[:n]
+
+        index_offset = self.fp.tell()
+        self.fp.write(numpy.array(self.chunks, dtype = chunk_dtype).tobytes())
+        table_offset = self.fp.tell()
+        self.fp.write(table.tobytes())
+        self.fp.write(footer_struct.pack(index_offset, len(self.chunks), table_offset, self.n_frames, magic))
+        self.fp.close()
+
+    def writeChunk(self):
+        data = compressChunk(self.chunk_buffer[:self.n_buffered,:], self.compression)
+        self.chunks.append((self.fp.tell(), len(data), self.n_frames, self.n_buffered))
+        self.fp.write(data)
+        self.n_frames += self.n_buffered
+        self.n_buffered = 0
+
+
+class CDaxReader(object):
+    """
+    Reads a .cdax file. The most recently decompressed chunk is cached.
+    """
+    def __init__(self, filename = None, **kwds):
+        super().__init__(**kwds)
+        self.cached_chunk = None
+        self.cached_index = None
+
+        self.fp = open(filename, "rb")
+        [m, v, self.x_pixels, self.y_pixels, self.chunk_frames, self.compression] = header_struct.unpack(self.fp.read(header_struct.size))
+        if (m != magic):
+            raise CDaxException(filename + " is not a .cdax file.")
+
+        self.fp.seek(-footer_struct.size, 2)
+        [index_offset, n_chunks, table_offset, self.n_frames, m] = footer_struct.unpack(self.fp.read(footer_struct.size))
+        if (m != magic):
+            raise CDaxException(filename + " is incomplete, the file was not closed properly.")
+
+        self.fp.seek(index_offset)
+        self.chunks = numpy.frombuffer(self.fp.read(n_chunks * chunk_dtype.itemsize), dtype = chunk_dtype)
+        self.fp.seek(table_offset)
+        self.frame_table = numpy.frombuffer(self.fp.read(self.n_frames * frame_dtype.itemsize), dtype = frame_dtype)
+
+    def close(self):
+        self.fp.close()
+
+    def getFrameTable(self):
+        return self.frame_table
+
+    def loadFrame(self, frame_number):
+        """
+        Returns the frame as a numpy.uint16 array of shape (y_pixels, x_pixels).
+        """
+        index = int(numpy.searchsorted(self.chunks["first_frame"], frame_number, side = "right")) - 1
+        if (index != self.cached_index):
+            chunk = self.chunks[index]
+            self.fp.seek(int(chunk["offset"]))
+            data = self.fp.read(int(chunk["nbytes"]))
+            n_pixels = int(chunk["n_frames"]) * self.x_pixels * self.y_pixels
+            self.cached_chunk = decompressChunk(data, self.compression, n_pixels).reshape(-1, self.y_pixels, self.x_pixels)
+            self.cached_index = index
+        return self.cached_chunk[frame_number - int(self.chunks[index]["first_frame"])]
+
+#
+# The MIT License
+#
+# Copyright (c) 2026 Babcock Lab, Harvard University
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
@@ -19,6 +19,7 @@ import os
 from PIL import Image
 import re
 
+import storm_control.sc_library.cdax as cdax
 import storm_control.sc_library.parameters as parameters
 
 
@@ -138,7 +139,10 @@ def reader(filename):
 
     file_type = xml.get("film.filetype")
 
-    if (file_type == ".dax"):
+    if (file_type == ".cdax"):
+        return CDaxReader(filename = filename,
+                          xml = xml)
+    elif (file_type == ".dax"):
         return DaxReader(filename = filename,
                          xml = xml)
     elif (file_type == ".spe"):
@@ -149,7 +153,7 @@ def reader(filename):
                          xml = xml)
     else:
         print(file_type, "is not a recognized file type")
-    raise IOError("only .dax, .spe and .tif are supported (case sensitive..)")
+    raise IOError("only .cdax, .dax, .spe and .tif are supported (case sensitive..)")
 
 
 class DataReader(object):
@@ -214,6 +218,33 @@ class DataReader(object):
         return [self.image_width, self.image_height, self.number_frames]
 
 
+class CDaxReader(DataReader):
+    """
+    Chunked & compressed .dax reader class, see cdax.py.
+    """
+    def __init__(self, **kwds):
+        super().__init__(**kwds)
+
+        # The size and the length come from the file, not the XML.
+        self.fileptr = cdax.CDaxReader(filename = self.filename)
+        self.image_height = self.fileptr.y_pixels
+        self.image_width = self.fileptr.x_pixels
+        self.number_frames = self.fileptr.n_frames
+
+    def frameMetadata(self):
+        """
+        Returns the per-frame metadata (frame number, time, stage position
+        and focus lock offset) as a numpy structured array.
+        """
+        return self.fileptr.getFrameTable()
+        
+    # load a frame & return it as a numpy array
+    def loadAFrame(self, frame_number):
+        if self.fileptr:
+            self.checkFrameNumber(frame_number)
+            return numpy.transpose(self.fileptr.loadFrame(frame_number))
+
+    
 class DaxReader(DataReader):
     """
     Dax reader class. This is a Zhuang lab custom format.
@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+"""
+Low overhead tracing of (HAL message) events.
+
+Events are tuples of (time, event, message id, module name, message
+type). The time is time.monotonic_ns(). Recording an event only appends
+the tuple to a deque, which is thread safe without a lock. A background
+thread periodically writes the events to a binary trace file.
+
+The trace file starts with the 8 byte magic string b"HALTRACE". This
+is followed by records that start with the same fixed size header:
+
+  int64 time, int32 message id, uint16 event, uint16 module, uint16 type
+
+The strings (event, module, type) are stored as indices into a string
+table. The string table is stored in the file as records with a message
+id of -1. For these records 'event' is the string index and 'module' is
+the length of the UTF-8 encoded string which follows the record header.
+"""
+import collections
+import os
+import struct
+import threading
+import time
+
+
+magic = b"HALTRACE"
+record = struct.Struct("<qiHHH")
+
+a_tracer = None
+
+
+class EventTracer(object):
+    """
+    Writes events to a trace file in a background thread.
+    """
+    def __init__(self, filename = None, period = 0.1, **kwds):
+        super().__init__(**kwds)
+        self.events = collections.deque()
+        self.filename = filename
+        self.fp = None
+        self.lock = threading.Lock()
+        self.period = period
+        self.running = True
+        self.strings = {}
+        self.wake = threading.Event()
+
+        self.thread = threading.Thread(target = self.run, daemon = True)
+        self.thread.start()
+
+    def addEvent(self, event):
+        self.events.append(event)
+
+    def flush(self):
+        """
+        Write all the events that have been recorded so far.
+        """
+        with self.lock:
+            if (len(self.events) == 0):
+                return
+
+            if self.fp is None:
+                self.fp = open(self.filename, "wb")
+                self.fp.write(magic)
+
+            data = bytearray()
+            while True:
+                try:
+                    [t_ns, event, m_id, module, m_type] = self.events.popleft()
+                except IndexError:
+                    break
+                data += record.pack(t_ns,
+                                    m_id,
+                                    self.stringIndex(event, data),
+                                    self.stringIndex(module, data),
+                                    self.stringIndex(m_type, data))
+            self.fp.write(data)
+            self.fp.flush()
+
+    def run(self):
+        while self.running:
+            self.wake.wait(self.period)
+            self.flush()
+
+    def stop(self):
+        self.running = False
+        self.wake.set()
+        self.thread.join()
+        self.flush()
+        if self.fp is not None:
+            self.fp.close()
+            self.fp = None
+
+    def stringIndex(self, a_string, data):
+        """
+        Returns the index of a_string in the string table, adding
+        it to the table (and data) if necessary.
+        """
+        a_string = str(a_string)
+        if not a_string in self.strings:
+            index = len(self.strings)
+            self.strings[a_string] = index
+            encoded = a_string.encode("utf-8")
+            data += record.pack(0, -1, index, len(encoded), 0)
+            data += encoded
+        return self.strings[a_string]
+
+
+def flush():
+    if a_tracer is not None:
+        a_tracer.flush()
+
+def getTracing():
+    """
+    Return True/False if tracing has been started.
+    """
+    return a_tracer is not None
+
+def readTrace(filename):
+    """
+    Returns a list of the events in a trace file. Each event is a
+    tuple of (time (ns), event, message id, module, message type).
+    """
+    events = []
+    strings = []
+    with open(filename, "rb") as fp:
+        data = fp.read()
+
+    if (data[:len(magic)] != magic):
+        raise IOError(filename + " is not a trace file.")
+
+    offset = len(magic)
+    while ((offset + record.size) <= len(data)):
+        [t_ns, m_id, event, module, m_type] = record.unpack_from(data, offset)
+        offset += record.size
+        if (m_id == -1):
+            strings.append(data[offset:offset+module].decode("utf-8"))
+            offset += module
+        else:
+            events.append((t_ns, strings[event], m_id, strings[module], strings[m_type]))
+    return events
+
+def startTracing(directory, program_name):
+    """
+    Start tracing to program_name.trace in directory. An existing
+    trace file with the same name is overwritten.
+    """
+    global a_tracer
+    stopTracing()
+    a_tracer = EventTracer(filename = os.path.join(directory, program_name + ".trace"))
+
+def stopTracing():
+    global a_tracer
+    if a_tracer is not None:
+        a_tracer.stop()
+        a_tracer = None
+
+def traceEvent(event, m_id, module, m_type):
+    """
+    Record an event, this does nothing if tracing has not been started.
+    """
+    if a_tracer is not None:
+        a_tracer.addEvent((time.monotonic_ns(), event, m_id, module, m_type))
+
+
+#
+# The MIT License
+#
+# Copyright (c) 2026 Babcock Lab, Harvard University
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
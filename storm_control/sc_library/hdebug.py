@@ -11,6 +11,8 @@ import logging.handlers
 
 from PyQt5 import QtCore
 
+import storm_control.sc_library.eventTrace as eventTrace
+
 a_logger = False
 logging_mutex = QtCore.QMutex()
 
@@ -86,6 +88,8 @@ def startLogging(directory, program_name):
     a new index (1-10) each time that it is called so that (hopefully) we can
     log from multiple programs with the same name.
 
+    This also starts event tracing to program_name_index.trace.
+
     FIXME? As this seems to just append to existing log files, it would probably
            be better to delete the existing files first.
     """
@@ -120,6 +124,10 @@ def startLogging(directory, program_name):
     if a_logger:
         rf_handler.setFormatter(rt_formatter)
         a_logger.addHandler(rf_handler)
+
+    # HAL message events are traced to a separate (binary) file, see
+    # eventTrace.py and log_timing.py.
+    eventTrace.startTracing(directory, program_name + "_" + str(index))
         
 
 #
@@ -1,15 +1,15 @@
 #!/usr/bin/env python
 """
-This parses a log file series (i.e. log, log.1, log.2, etc..) and
-outputs timing and call frequency information for HAL messages.
+This parses a HAL event trace file (see eventTrace.py) and outputs
+timing and call frequency information for HAL messages, including
+latency histograms by message type and by module.
 
 Hazen 5/18
 """
-from datetime import datetime
+import numpy
 import os
 
-
-pattern = '%Y-%m-%d %H:%M:%S,%f'
+import storm_control.sc_library.eventTrace as eventTrace
 
 
 class Message(object):
@@ -20,29 +20,36 @@ class Message(object):
         super().__init__(**kwds)
         self.created_time = None
         self.handled_by = {}
+        self.handled_times = {}
         self.m_type = m_type
         self.n_workers = 0
         self.processing_time = None
         self.queued_time = None
+        self.sent_time = None
         self.source = source
         
-        self.temp = self.parseTime(time)
+        self.temp = time
         self.created(zero_time)
 
     def created(self, time):
-        t_time = self.parseTime(time)
-        self.created_time = (self.temp - t_time).total_seconds()
+        self.created_time = self.toSeconds(self.temp - time)
 
-    def handledBy(self, module_name):
+    def handledBy(self, module_name, time):
         if module_name in self.handled_by:
             self.handled_by[module_name] += 1
         else:
             self.handled_by[module_name] = 1
+
+        # The time from when the message was sent until the module
+        # finished with it (this includes the time spent waiting
+        # in the module's message queue).
+        if self.sent_time is not None:
+            self.handled_times[module_name] = self.toSeconds(time - self.sent_time)
         
     def getCreatedTime(self):
         """
         Returns the time when the message was created relative to first
-        time in the log file in seconds.
+        time in the trace file in seconds.
         """
         return self.created_time
 
@@ -51,6 +58,13 @@ class Message(object):
         Get dictionary of modules that handled this message.
         """
         return self.handled_by
+
+    def getHandledTimes(self):
+        """
+        Get dictionary of the time in seconds that each module took
+        to handle this message.
+        """
+        return self.handled_times
     
     def getNWorkers(self):
         """
@@ -92,17 +106,16 @@ class Message(object):
         """
         return (self.processing_time != None)
 
-    def parseTime(self, time):
-        return datetime.strptime(time, pattern)
-
     def processed(self, time):
-        t_time = self.parseTime(time)
-        self.processing_time = (t_time - self.temp).total_seconds()
+        self.processing_time = self.toSeconds(time - self.temp)
         
     def sent(self, time):
-        t_time = self.parseTime(time)
-        self.queued_time = (t_time - self.temp).total_seconds()
-        self.temp = t_time
+        self.queued_time = self.toSeconds(time - self.temp)
+        self.sent_time = time
+        self.temp = time
+
+    def toSeconds(self, time):
+        return 1.0e-9 * time
 
 
 def getIterable(dict_or_list):
@@ -153,61 +166,66 @@ def groupByX(grp_fn, messages):
     return m_grp
         
 
+def histogram(times, n_bins = 10):
+    """
+    Returns [counts, bin edges] for a logarithmic histogram of
+    times (in seconds).
+    """
+    times = numpy.array(times)
+    times = times[(times > 0.0)]
+    if (times.size == 0):
+        return [numpy.zeros(n_bins, dtype = int), numpy.zeros(n_bins + 1)]
+
+    t_min = numpy.min(times)
+    t_max = max(numpy.max(times), 1.001 * t_min)
+    return numpy.histogram(times, bins = numpy.geomspace(t_min, t_max, n_bins + 1))
+
+
 def logTiming(basename, ignore_incomplete = True):
     """
     Returns a dictionary of Message objects keyed by their ID number.
+
+    basename is the name of the trace file without the '.trace'
+    extension, e.g. 'logs/hal4000_2'.
     """
     zero_time = None
     messages = {}
 
-    for ext in [".5", ".4", ".3", ".2", ".1", ""]:
+    fname = basename + ".trace"
+    if not os.path.exists(fname):
+        print(fname, "not found.")
+        return messages
 
-        fname = basename + ".out" + ext
-        if not os.path.exists(fname):
-            print(fname, "not found.")
-            continue
-    
-        with open(fname) as fp:
-            for line in fp:
-
-                try:
-                    [time, command] = map(lambda x: x.strip(), line.split(":hal4000:INFO:"))
-                except ValueError:
-                    continue
-
-                if zero_time is None:
-                    zero_time = time
-
-                # Message handled by.
-                if (command.startswith("handled by,")):
-                    [m_id, module_name, m_type] = command.split(",")[1:]
-                    if m_id in messages:
-                        messages[m_id].handledBy(module_name)
-
-                # Message queued.
-                elif (command.startswith("queued,")):
-                    [m_id, source, m_type] = command.split(",")[1:]
-                    messages[m_id] = Message(m_type = m_type,
-                                             source = source,
-                                             time = time,
-                                             zero_time = zero_time)
-                              
-                # Message sent.
-                elif (command.startswith("sent,")):
-                    m_id = command.split(",")[1]
-                    if m_id in messages:
-                        messages[m_id].sent(time)
-
-                # Message processed.
-                elif (command.startswith("processed,")):
-                    m_id = command.split(",")[1]
-                    if m_id in messages:
-                        messages[m_id].processed(time)
-
-                elif (command.startswith("worker done,")):
-                    m_id = command.split(",")[1]
-                    if m_id in messages:
-                        messages[m_id].incNWorkers()
+    for [time, event, m_id, module_name, m_type] in eventTrace.readTrace(fname):
+
+        if zero_time is None:
+            zero_time = time
+
+        # Message handled by.
+        if (event == "handled by"):
+            if m_id in messages:
+                messages[m_id].handledBy(module_name, time)
+
+        # Message queued.
+        elif (event == "queued"):
+            messages[m_id] = Message(m_type = m_type,
+                                     source = module_name,
+                                     time = time,
+                                     zero_time = zero_time)
+
+        # Message sent.
+        elif (event == "sent"):
+            if m_id in messages:
+                messages[m_id].sent(time)
+
+        # Message processed.
+        elif (event == "processed"):
+            if m_id in messages:
+                messages[m_id].processed(time)
+
+        elif (event == "worker done"):
+            if m_id in messages:
+                messages[m_id].incNWorkers()
 
     # Ignore messages that we don't have all the timing for.
     if ignore_incomplete:
@@ -221,6 +239,38 @@ def logTiming(basename, ignore_incomplete = True):
         return messages
 
 
+def moduleTimes(messages):
+    """
+    Returns a dictionary keyed by module name with a list of the
+    times that the module took to handle each message.
+    """
+    m_times = {}
+    for msg in getIterable(messages):
+        for [module_name, time] in msg.getHandledTimes().items():
+            if module_name in m_times:
+                m_times[module_name].append(time)
+            else:
+                m_times[module_name] = [time]
+    return m_times
+
+
+def printHistogram(name, times):
+    """
+    Print a (text) histogram of times.
+    """
+    times = numpy.array(times)
+    print(name + ", {0:0d} counts, median {1:.3f} ms, max {2:.3f} ms".format(times.size,
+                                                                          1000.0 * numpy.median(times),
+                                                                          1000.0 * numpy.max(times)))
+    [counts, edges] = histogram(times)
+    scale = 40.0/max(1, numpy.max(counts))
+    for i in range(counts.size):
+        print("  {0:9.3f} - {1:9.3f} ms {2:6d} {3:s}".format(1000.0 * edges[i],
+                                                            1000.0 * edges[i+1],
+                                                            counts[i],
+                                                            "#" * int(round(scale * counts[i]))))
+
+
 def processingTime(messages):
     """
     Returns the total processing time for a collection of messages.
@@ -254,7 +304,7 @@ if (__name__ == "__main__"):
     import sys
     
     if (len(sys.argv) != 2):
-        print("usage: <log file>")
+        print("usage: <trace file basename>")
         exit()
 
     messages = logTiming(sys.argv[1])
@@ -276,5 +326,14 @@ if (__name__ == "__main__"):
         print(key + ", {0:0d} counts, {1:.3f} seconds".format(len(grp), processingTime(grp)))
     print("Total processing time {0:.3f} seconds".format(processingTime(groups)))
 
+    print()
+    print("Processing time histograms by message type:")
+    groups = groupByMsgType(messages)
+    for key in sorted(groups):
+        printHistogram(key, [msg.getProcessingTime() for msg in groups[key]])
 
-
+    print()
+    print("Handling time histograms by module:")
+    m_times = moduleTimes(messages)
+    for key in sorted(m_times):
+        printHistogram(key, m_times[key])
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+"""
+Hand run benchmark of the camera display, not designed for CI.
+
+This measures the rate (frames / second) at which frames from the none
+camera can be converted to a QImage and painted, for several ROI sizes
+and for each of the render modes of QtCameraGraphicsItem. The view is
+zoomed so that the whole frame is visible.
+
+The 'opengl' render mode is only tested if OpenGL is available.
+"""
+import numpy
+import sys
+import time
+
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+import storm_control.hal4000.camera.frame as frame
+import storm_control.hal4000.qtWidgets.qtCameraGraphicsScene as qtCameraGraphicsScene
+import storm_control.hal4000.qtWidgets.qtCameraOpenGL as qtCameraOpenGL
+
+import storm_control.test.benchmark_imagewriters as benchmarkImagewriters
+
+
+def benchmark(x_pixels, y_pixels, render_mode = "max", n_frames = 200, view_size = 512):
+    [cam_fn, fake_frame] = benchmarkImagewriters.noneCamera(x_pixels, y_pixels)
+
+    frames = []
+    for i in range(min(n_frames, 10)):
+        frames.append(frame.Frame(numpy.roll(fake_frame, i), i, x_pixels, y_pixels, "camera1"))
+
+    scene = qtCameraGraphicsScene.QtCameraGraphicsScene()
+    view = QtWidgets.QGraphicsView(scene)
+    view.setHorizontalScrollBarPolicy(QtCore.Qt.ScrollBarAlwaysOff)
+    view.setVerticalScrollBarPolicy(QtCore.Qt.ScrollBarAlwaysOff)
+    view.resize(view_size, view_size)
+
+    if (render_mode == "opengl"):
+        view.setViewport(QtWidgets.QOpenGLWidget())
+        item = qtCameraOpenGL.QtCameraGLGraphicsItem()
+    else:
+        item = qtCameraGraphicsScene.QtCameraGraphicsItem(render_mode = render_mode)
+    view.show()
+
+    item.newColorTable([[i, i, i] for i in range(256)])
+    item.newConfiguration(cam_fn)
+    item.newRange(0, 1000)
+    scene.addItem(item)
+
+    scale = view_size/max(x_pixels, y_pixels)
+    view.setTransform(QtGui.QTransform().scale(scale, scale))
+    view.centerOn(0.5 * x_pixels, 0.5 * y_pixels)
+    QtWidgets.QApplication.processEvents()
+
+    start_time = time.perf_counter()
+    for i in range(n_frames):
+        item.updateImageWithFrame(frames[i%len(frames)])
+        view.viewport().repaint()
+    elapsed = time.perf_counter() - start_time
+
+    view.close()
+    return n_frames/elapsed
+
+
+if (__name__ == "__main__"):
+    app = QtWidgets.QApplication(sys.argv)
+    render_modes = ["full", "max", "mean"]
+    if qtCameraOpenGL.openGLAvailable():
+        render_modes.append("opengl")
+        
+    for [x_pixels, y_pixels] in [[256, 256], [512, 512], [1024, 1024], [2048, 2048]]:
+        print("{0:d} x {1:d} frames:".format(x_pixels, y_pixels))
+        for render_mode in render_modes:
+            rate = benchmark(x_pixels, y_pixels, render_mode = render_mode)
+            print("  {0:5s} {1:8.1f} frames / second".format(render_mode, rate))
+        print()
@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+"""
+Hand run benchmark of HAL message passing, not designed for CI.
+
+1. Round trip, this measures the time from when a module sends a
+   message until the message finalizer is called after all the
+   modules that receive it have processed it. The messages are sent
+   one at a time, the next message is sent by the finalizer of the
+   previous message. Extra 'filler' modules that do not handle the
+   message are added to HAL to simulate a HAL setup with lots of
+   hardware modules.
+
+2. Storm, this measures the throughput (messages / second) when a
+   module sends lots of messages at once, in strict mode (with
+   message validation) and without.
+
+3. Validation, the time to check message data with validateData() and
+   with the compiled validators that strict mode uses (checkData()).
+"""
+import numpy
+import sys
+import time
+
+from PyQt5 import QtWidgets
+
+import storm_control.hal4000.hal4000 as hal4000
+import storm_control.sc_library.parameters as params
+import storm_control.test as test
+
+import storm_control.hal4000.halLib.halMessage as halMessage
+import storm_control.hal4000.halLib.halModule as halModule
+
+
+ping_validator = {"data" : {"index" : [True, int],
+                            "note" : [False, str]},
+                  "resp" : {"index" : [True, int]}}
+
+
+class Filler(halModule.HalModule):
+    """
+    A module that does nothing.
+    """
+    handled_messages = {"configure1"}
+
+    def __init__(self, module_params = None, qt_settings = None, **kwds):
+        super().__init__(**kwds)
+
+    def processMessage(self, message):
+        pass
+
+
+class Responder(halModule.HalModule):
+    """
+    A module that responds to 'benchmark ping' messages.
+    """
+    handled_messages = {"benchmark ping"}
+
+    def __init__(self, module_params = None, qt_settings = None, **kwds):
+        super().__init__(**kwds)
+
+    def processMessage(self, message):
+        if message.isType("benchmark ping"):
+            message.addResponse(halMessage.HalMessageResponse(source = self.module_name,
+                                                              data = {"index" : message.getData()["index"]}))
+
+
+class MessageTimer(halModule.HalModule):
+    """
+    Sends 'benchmark ping' messages and records the round trip times
+    or the total time to process all of the messages.
+    """
+    handled_messages = {"start"}
+
+    def __init__(self, module_params = None, qt_settings = None, **kwds):
+        super().__init__(**kwds)
+        self.n_finalized = 0
+        self.n_messages = module_params.get("n_messages")
+        self.start_time = None
+        self.storm = module_params.get("storm")
+        self.times = []
+
+        halMessage.addMessage("benchmark ping",
+                              validator = ping_validator)
+
+        halMessage.addMessage("tests done",
+                              validator = {"data" : None, "resp" : None})
+
+    def done(self):
+        self.newMessage.emit(halMessage.HalMessage(source = self,
+                                                   m_type = "tests done"))
+
+    def handleRoundTripFinalizer(self):
+        self.times.append(time.perf_counter() - self.start_time)
+        if (len(self.times) < self.n_messages):
+            self.sendPing(len(self.times), self.handleRoundTripFinalizer)
+        else:
+            times = 1.0e6 * numpy.array(self.times)
+            print("  round trip, {0:d} messages, mean {1:.1f} us, median {2:.1f} us".format(times.size,
+                                                                                             numpy.mean(times),
+                                                                                             numpy.median(times)))
+            self.done()
+
+    def handleStormFinalizer(self):
+        self.n_finalized += 1
+        if (self.n_finalized == self.n_messages):
+            elapsed = time.perf_counter() - self.start_time
+            print("  storm, {0:d} messages, {1:.1f} messages / second".format(self.n_messages,
+                                                                               self.n_messages/elapsed))
+            self.done()
+
+    def processMessage(self, message):
+        if message.isType("start"):
+            if self.storm:
+                self.start_time = time.perf_counter()
+                for i in range(self.n_messages):
+                    self.sendPing(i, self.handleStormFinalizer)
+            else:
+                self.sendPing(0, self.handleRoundTripFinalizer)
+
+    def sendPing(self, index, finalizer):
+        if not self.storm:
+            self.start_time = time.perf_counter()
+        self.newMessage.emit(halMessage.HalMessage(source = self,
+                                                   m_type = "benchmark ping",
+                                                   data = {"index" : index, "note" : "ping"},
+                                                   finalizer = finalizer))
+
+
+def benchmark(broadcast_messages = False, n_fillers = 20, n_messages = 2000, storm = False, strict = True):
+    config = params.config(test.halXmlFilePathAndName("none_classic_config.xml"))
+    config.add(params.ParameterSetBoolean(name = "broadcast_messages",
+                                          value = broadcast_messages))
+    config.setv("strict", strict)
+
+    for i in range(n_fillers):
+        c_filler = config.addSubSection("modules.filler_{0:02d}".format(i))
+        c_filler.add("class_name", "Filler")
+        c_filler.add("module_name", "storm_control.test.benchmark_hal_messages")
+
+    c_responder = config.addSubSection("modules.responder")
+    c_responder.add("class_name", "Responder")
+    c_responder.add("module_name", "storm_control.test.benchmark_hal_messages")
+
+    c_timer = config.addSubSection("modules.testing")
+    c_timer.add("class_name", "MessageTimer")
+    c_timer.add("module_name", "storm_control.test.benchmark_hal_messages")
+    c_timer.add("n_messages", n_messages)
+    c_timer.add("storm", storm)
+
+    hal = hal4000.HalCore(config = config,
+                          testing_mode = True,
+                          show_gui = False)
+    QtWidgets.QApplication.instance().exec_()
+
+
+def benchmarkValidation(n_checks = 100000):
+    halMessage.initializeMessages()
+    halMessage.addMessage("benchmark ping",
+                          validator = ping_validator)
+    message = halMessage.HalMessage(m_type = "benchmark ping",
+                                    data = {"index" : 1, "note" : "ping"},
+                                    source = Filler(module_name = "filler"))
+
+    start_time = time.perf_counter()
+    for i in range(n_checks):
+        halMessage.validateData(ping_validator["data"], message)
+    elapsed = time.perf_counter() - start_time
+    print("  validateData(), {0:.2f} us".format(1.0e6 * elapsed/n_checks))
+
+    start_time = time.perf_counter()
+    for i in range(n_checks):
+        halMessage.checkData(message)
+    elapsed = time.perf_counter() - start_time
+    print("  checkData(), {0:.2f} us".format(1.0e6 * elapsed/n_checks))
+
+
+if (__name__ == "__main__"):
+    app = QtWidgets.QApplication(sys.argv)
+    for broadcast_messages in [True, False]:
+        print("broadcast_messages", broadcast_messages)
+        benchmark(broadcast_messages = broadcast_messages)
+        print()
+
+    for strict in [True, False]:
+        print("strict", strict)
+        benchmark(storm = True, strict = strict, n_messages = 5000)
+        print()
+
+    print("validation")
+    benchmarkValidation()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+"""
+Hand run benchmark of the image writers, not designed for CI.
+
+This measures the sustained rate (MB/second) at which each file format
+can save frames from the none camera. Frames are sent to the writers as
+fast as possible rather than at the camera frame rate.
+
+Note: The none camera is at most 512 x 512, larger frames are tiled from
+      the none camera frame.
+"""
+import numpy
+import os
+import time
+
+import storm_control.sc_library.parameters as params
+import storm_control.test as test
+
+import storm_control.hal4000.camera.frame as frame
+import storm_control.hal4000.camera.noneCameraControl as noneCameraControl
+import storm_control.hal4000.film.filmSettings as filmSettings
+import storm_control.hal4000.halLib.imagewriters as imagewriters
+
+
+def noneCamera(x_pixels, y_pixels):
+    """
+    Returns the none camera configured for an x_pixels x y_pixels frame.
+    """
+    config = params.StormXMLObject()
+    config.add(params.ParameterFloat(name = "roll", value = 1.0))
+    camera = noneCameraControl.NoneCameraControl(camera_name = "camera1",
+                                                 config = config)
+
+    # Expand the camera chip if necessary.
+    for pname in ["x_start", "x_end", "y_start", "y_end"]:
+        camera.parameters.getp(pname).setMaximum(max(x_pixels, y_pixels))
+    camera.parameters.setv("x_chip", x_pixels)
+    camera.parameters.setv("y_chip", y_pixels)
+
+    if (x_pixels <= 512) and (y_pixels <= 512):
+        p = camera.parameters.copy()
+        p.setv("x_end", x_pixels)
+        p.setv("y_end", y_pixels)
+        camera.newParameters(p)
+        fake_frame = camera.fake_frame
+    else:
+        tile = camera.fake_frame.reshape(512, 512)
+        fake_frame = numpy.tile(tile, (y_pixels//512 + 1, x_pixels//512 + 1))[:y_pixels,:x_pixels].ravel()
+        camera.parameters.setv("x_pixels", x_pixels)
+        camera.parameters.setv("y_pixels", y_pixels)
+        camera.parameters.setv("bytes_per_frame", 2 * x_pixels * y_pixels)
+
+    return [camera.getCameraFunctionality(), fake_frame]
+
+
+def benchmark(filetype, x_pixels = 512, y_pixels = 512, n_frames = 200, writer_buffers = 0):
+    [cam_fn, fake_frame] = noneCamera(x_pixels, y_pixels)
+
+    # Pre-compute the frames so that we are only measuring the writer.
+    frames = []
+    for i in range(min(n_frames, 10)):
+        frames.append(numpy.roll(fake_frame, i))
+
+    basename = os.path.join(test.dataDirectory(), "benchmark")
+    film_settings = filmSettings.FilmSettings(basename = basename,
+                                              filetype = filetype,
+                                              film_length = n_frames,
+                                              pixel_size = 0.16,
+                                              writer_buffers = writer_buffers)
+
+    start_time = time.perf_counter()
+    writer = imagewriters.createFileWriter(cam_fn, film_settings)
+    for i in range(n_frames):
+        cam_fn.emitFrames([frame.Frame(frames[i%len(frames)], i, x_pixels, y_pixels, "camera1")])
+    cam_fn.stopped.emit()
+    writer.closeWriter()
+    elapsed = time.perf_counter() - start_time
+
+    size = os.path.getsize(writer.filename) * 0.000000953674
+    os.remove(writer.filename)
+    if os.path.exists(basename + ".inf"):
+        os.remove(basename + ".inf")
+
+    mb = writer.number_frames * writer.frame_size
+    return [mb/elapsed, size, writer.getDroppedFrames()]
+
+
+if (__name__ == "__main__"):
+    for [x_pixels, y_pixels] in [[512, 512], [2048, 2048]]:
+        print("{0:d} x {1:d} frames:".format(x_pixels, y_pixels))
+        for filetype in [".dax", ".cdax", ".tif", ".big.tif"]:
+            for writer_buffers in [0, 64]:
+                [rate, size, dropped] = benchmark(filetype,
+                                                  x_pixels = x_pixels,
+                                                  y_pixels = y_pixels,
+                                                  writer_buffers = writer_buffers)
+                print("  {0:9s} buffers {1:3d} {2:8.1f} MB/s, file size {3:8.1f} MB, {4:d} dropped".format(filetype,
+                                                                                                         writer_buffers,
+                                                                                                         rate,
+                                                                                                         size,
+                                                                                                         dropped))
+        print()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+"""
+Hand run benchmark of the camera focus lock fitters, not designed for CI.
+
+This measures the time per QPD scan (reps images) for the batch fitter,
+the numpy/scipy fitter and, if storm-analysis is available, the
+correlation fitter. The images are the QPD camera images recorded in
+focus lock diagnostics mode, or synthetic images if no files are given.
+
+Usage:
+  python benchmark_lock_fitters.py [reps] [sigma] [movie_qpd.tif ...]
+"""
+import numpy
+import sys
+import tifffile
+import time
+
+import storm_control.sc_hardware.utility.batch_lock_fitter as batchLF
+import storm_control.sc_hardware.utility.np_lock_peak_finder as npLPF
+
+cl2DG = None
+try:
+    import storm_control.sc_hardware.utility.corr_lock_c2dg as cl2DG
+except (ModuleNotFoundError, OSError) as e:
+    print("Correlation fitter not available,", e)
+
+
+def loadImages(filenames):
+    images = []
+    for filename in filenames:
+        with tifffile.TiffFile(filename) as tf:
+            for page in tf.pages:
+                images.append(page.asarray())
+    return numpy.array(images)
+
+
+def makeImages(n_images, sigma, im_size = (100, 700)):
+    """
+    Two spots that drift together, with camera noise.
+    """
+    [rr, cc] = numpy.mgrid[0:im_size[0],0:im_size[1]]
+    images = []
+    for i in range(n_images):
+        d = 2.0 * numpy.sin(0.01 * i)
+        image = numpy.zeros(im_size)
+        for col in [0.25 * im_size[1] - d, 0.75 * im_size[1] + d]:
+            image += 150.0 * numpy.exp(-0.5 * ((rr - 0.5 * im_size[0])**2 + (cc - col)**2)/(sigma * sigma))
+        images.append(numpy.random.poisson(image + 5.0))
+    return numpy.array(images).astype(numpy.uint8)
+
+
+def benchmark(fitter, images, reps):
+    """
+    Returns [milliseconds / scan, distances between the spots].
+    """
+    half_x = int(images.shape[2]/2)
+    n_scans = int(images.shape[0]/reps)
+    dist = numpy.zeros((n_scans * reps))
+    start_time = time.perf_counter()
+    for i in range(n_scans):
+        scan = images[i*reps:(i+1)*reps]
+        [rows, cols, good] = fitter(scan[:,:,:half_x], scan[:,:,-half_x:])
+        dist[i*reps:(i+1)*reps] = numpy.where(good[0] & good[1], cols[1] + half_x - cols[0], numpy.nan)
+    elapsed = time.perf_counter() - start_time
+    return [1000.0 * elapsed/n_scans, dist]
+
+
+def batchFitter(sigma):
+    blf = batchLF.BatchLockFitter(n_spots = 2,
+                                  roi_size = int(3.0 * sigma),
+                                  sigma = sigma,
+                                  threshold = 10)
+    return lambda left, right : blf.fitSpots([left, right])
+
+
+def corrFitter(sigma):
+    fits = [cl2DG.CorrLockFitter(roi_size = int(3.0 * sigma), sigma = sigma, threshold = 10) for i in range(2)]
+    return lambda left, right : serialFit([fit.findFitPeak for fit in fits], left, right)
+
+
+def scipyFitter(sigma):
+    fit_size = int(1.5 * sigma)
+
+    def fitGaussian(data):
+        # This is the same as CameraQPDScipyFit.fitGaussian().
+        [max_x, max_y] = numpy.unravel_index(numpy.argmax(data), data.shape)
+        if (numpy.max(data) < 25) or (max_x < fit_size) or (max_x >= (data.shape[0] - fit_size)) or \
+           (max_y < fit_size) or (max_y >= (data.shape[1] - fit_size)):
+            return [0, 0, False]
+        [params, status] = npLPF.fitFixedEllipticalGaussian(data[max_x-fit_size:max_x+fit_size,max_y-fit_size:max_y+fit_size], sigma)
+        return [max_x + params[2] - fit_size, max_y + params[3] - fit_size, status]
+
+    return lambda left, right : serialFit([fitGaussian, fitGaussian], left, right)
+
+
+def serialFit(fit_fns, left, right):
+    rows = numpy.zeros((2, left.shape[0]))
+    cols = numpy.zeros((2, left.shape[0]))
+    good = numpy.zeros((2, left.shape[0]), dtype = bool)
+    for i in range(left.shape[0]):
+        for j, image in enumerate([left[i], right[i]]):
+            [rows[j,i], cols[j,i], good[j,i]] = fit_fns[j](image)
+    return [rows, cols, good]
+
+
+if (__name__ == "__main__"):
+    reps = 4
+    sigma = 3.5
+    if (len(sys.argv) > 1):
+        reps = int(sys.argv[1])
+    if (len(sys.argv) > 2):
+        sigma = float(sys.argv[2])
+    if (len(sys.argv) > 3):
+        images = loadImages(sys.argv[3:])
+    else:
+        images = makeImages(400, sigma)
+    print("{0:d} images, {1:d} x {2:d} pixels, {3:d} reps".format(images.shape[0], images.shape[1], images.shape[2], reps))
+
+    fitters = [["batch", batchFitter], ["scipy", scipyFitter]]
+    if cl2DG is not None:
+        fitters.append(["corr", corrFitter])
+
+    all_dist = {}
+    for [name, fitter] in fitters:
+        [ms, dist] = benchmark(fitter(sigma), images, reps)
+        all_dist[name] = dist
+        print("  {0:6s} {1:8.2f} ms / scan, {2:8.1f} scans / second, {3:5.1f}% good".format(name, ms, 1000.0/ms, 100.0 * numpy.mean(numpy.isfinite(dist))))
+
+    # Agreement of the spot distance with the batch fitter.
+    for [name, fitter] in fitters[1:]:
+        diff = all_dist[name] - all_dist["batch"]
+        diff = diff[numpy.isfinite(diff)]
+        if (diff.size > 0):
+            print("  {0:6s} vs batch, distance difference {1:.3f} +- {2:.3f} pixels".format(name, numpy.mean(diff), numpy.std(diff)))
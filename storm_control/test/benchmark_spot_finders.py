@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+"""
+Hand run benchmark of the spot counter object finders, not designed for CI.
+
+This measures the time to analyze synthetic frames with a known density
+of emitters, and the fraction of the emitters that were found (within
+one pixel), for the NumPy object finder and, if it can be loaded, the
+LMMoment C library object finder.
+"""
+import numpy
+import time
+
+import storm_control.hal4000.camera.frame as frame
+import storm_control.hal4000.spotCounter.lmmObjectFinder as lmmObjectFinder
+import storm_control.hal4000.spotCounter.npObjectFinder as npObjectFinder
+
+
+def makeFrames(size, density, n_frames = 10, background = 100.0, height = 500.0, sigma = 1.2):
+    """
+    Create frames with emitters at random locations. density is the number
+    of emitters per 1000 pixels^2.
+
+    Returns a list of [frame, emitter x locations, emitter y locations].
+    """
+    n_emitters = int(density * size * size/1000.0)
+    [yy, xx] = numpy.mgrid[-4:5,-4:5]
+
+    frames = []
+    for i in range(n_frames):
+        image = numpy.zeros((size + 10, size + 10))
+        x_locs = numpy.random.uniform(5.0, size - 5.0, n_emitters)
+        y_locs = numpy.random.uniform(5.0, size - 5.0, n_emitters)
+        for [x, y] in zip(x_locs, y_locs):
+            [ix, iy] = [int(round(x)), int(round(y))]
+            [dx, dy] = [x - ix, y - iy]
+            spot = height * numpy.exp(-((xx - dx)**2 + (yy - dy)**2)/(2.0 * sigma * sigma))
+            image[iy+1:iy+10,ix+1:ix+10] += spot
+        image = image[5:size+5,5:size+5] + background
+        image = numpy.random.poisson(image).astype(numpy.uint16)
+        frames.append([frame.Frame(image.ravel(), i, size, size, "camera1"), x_locs, y_locs])
+    return frames
+
+
+def benchmark(object_finder, frames, threshold = 150):
+    """
+    Returns [milliseconds / frame, fraction of emitters found].
+    """
+    [x_buffer, y_buffer] = object_finder.createBuffers()
+
+    elapsed = 0.0
+    found = 0
+    total = 0
+    for [a_frame, x_locs, y_locs] in frames:
+        start_time = time.perf_counter()
+        [x, y, n] = object_finder.findObjects(a_frame, threshold, x = x_buffer, y = y_buffer)
+        elapsed += time.perf_counter() - start_time
+
+        # Emitters within one pixel of a localization were found.
+        if (n > 0):
+            dist = (x_locs[:,None] - x[:n])**2 + (y_locs[:,None] - y[:n])**2
+            found += numpy.count_nonzero(numpy.min(dist, axis = 1) < 1.0)
+        total += x_locs.size
+
+    return [1000.0 * elapsed/len(frames), found/total]
+
+
+if (__name__ == "__main__"):
+    object_finders = [["numpy", npObjectFinder]]
+    try:
+        lmmObjectFinder.initialize()
+    except Exception as e:
+        print("LMMoment C library not available,", e)
+    else:
+        object_finders.append(["lmm", lmmObjectFinder])
+
+    for size in [256, 512, 1024]:
+        print("{0:d} x {0:d} frames:".format(size))
+        for density in [0.5, 2.0, 5.0]:
+            frames = makeFrames(size, density)
+            for [name, object_finder] in object_finders:
+                [ms, recall] = benchmark(object_finder, frames)
+                print("  {0:5s} density {1:4.1f} {2:8.2f} ms / frame, {3:5.1f}% found".format(name, density, ms, 100.0 * recall))
+        print()
@@ -0,0 +1,32 @@
+#!/usr/bin/env python
+import storm_control.hal4000.testing.testActions as testActions
+import storm_control.hal4000.testing.testing as testing
+
+
+class CheckProfile(testActions.GetProfile):
+
+    def checkProfiles(self):
+
+        # Modules that only handle some message types.
+        for module_name in ["camera1", "film", "settings"]:
+            profile = self.profiles[module_name]
+            assert("configure1" in profile["messages"])
+            assert(not "profile" in profile["messages"])
+            [count, total, max_time] = profile["messages"]["configure1"]
+            assert(count == 1)
+            assert(total >= max_time)
+
+        # The camera starts using a worker.
+        assert("start camera" in self.profiles["camera1"]["workers"])
+
+        
+#
+# Test getting the module profiles.
+#
+class ProfileTest1(testing.Testing):
+
+    def __init__(self, **kwds):
+        super().__init__(**kwds)
+
+        self.test_actions = [testActions.Timer(timeout = 200),
+                             CheckProfile()]
@@ -238,6 +238,39 @@ class FindSum4(testing.TestingTCP):
                                             test_mode = True)]
 
 
+#
+# Test "Get Frame Statistics" message.
+#
+class GetFrameStatisticsAction1(testActionsTCP.GetFrameStatistics):
+
+    def checkMessage(self, tcp_message):
+        assert not tcp_message.hasError()
+        assert(tcp_message.getResponse("feed_name") == "camera1")
+        assert(tcp_message.getResponse("n_frames") > 0)
+        assert(tcp_message.getResponse("low") <= tcp_message.getResponse("high"))
+
+class GetFrameStatistics1(testing.TestingTCP):
+
+    def __init__(self, **kwds):
+        super().__init__(**kwds)
+
+        self.test_actions = [testActions.Timer(200),
+                             GetFrameStatisticsAction1()]
+
+class GetFrameStatisticsAction2(testActionsTCP.GetFrameStatistics):
+
+    def checkMessage(self, tcp_message):
+        assert tcp_message.hasError()
+        
+class GetFrameStatistics2(testing.TestingTCP):
+
+    def __init__(self, **kwds):
+        super().__init__(**kwds)
+
+        self.test_actions = [GetFrameStatisticsAction2(display_name = "display99",
+                                                       test_mode = True)]
+
+
 #
 # Test "Get Mosaic Settings" message.
 #
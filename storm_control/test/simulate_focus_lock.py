@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+"""
+Hand run simulation of the focus lock control laws, not designed for CI.
+
+This locks the none QPD / none z stage pair with an always on lock
+mode, injects a sample drift profile and measures the settle time and
+the RMS lock error for each control law. The QPD updates are simulated
+at 10Hz, the same rate as the none QPD.
+
+QPD dropouts (periods when the QPD reading is not good) can also be
+injected, the number of updates where the lock was not good is reported.
+"""
+import math
+import random
+import sys
+
+from PyQt5 import QtCore
+
+import storm_control.sc_library.parameters as params
+
+import storm_control.hal4000.focusLock.lockModes as lockModes
+import storm_control.sc_hardware.none.noneQPDModule as noneQPDModule
+import storm_control.sc_hardware.none.noneZStageModule as noneZStageModule
+
+# Seconds per QPD update.
+dt = 0.1
+
+#
+# Drift profiles, these return a function that gives the sample drift
+# in microns at time t (seconds).
+#
+def rampDrift(rate = 0.05):
+    return lambda t : rate * t
+
+def randomWalkDrift(step = 0.01):
+    z = [0.0]
+    def drift(t):
+        z[0] += random.gauss(0.0, step)
+        return z[0]
+    return drift
+
+def sineDrift(amplitude = 0.2, period = 20.0):
+    return lambda t : amplitude * math.sin(2.0 * math.pi * t / period)
+
+def stepDrift(size = 0.5, t_step = 1.0):
+    return lambda t : size if (t >= t_step) else 0.0
+
+drift_profiles = {"ramp" : rampDrift,
+                  "sine" : sineDrift,
+                  "step" : stepDrift,
+                  "walk" : randomWalkDrift}
+
+control_laws = {"proportional" : {"control_law" : "proportional"},
+                "pid" : {"control_law" : "pid"},
+                "pid+d" : {"control_law" : "pid",
+                           "pid_kd" : 0.2},
+                "pid+predict" : {"control_law" : "pid",
+                                 "drift_prediction" : True}}
+
+# Periodic QPD dropouts, [start, end] in seconds.
+dropouts = [[t, t + 0.5] for t in range(10, 60, 10)]
+
+
+def makeParameters(values):
+    p = params.StormXMLObject()
+    lockModes.FindSumMixin.addParameters(p)
+    lockModes.LockedMixin.addParameters(p)
+    lockModes.ScanMixin.addParameters(p)
+    for pname in values:
+        p.setv(lockModes.LockedMixin.lm_pname + "." + pname, values[pname])
+    return p
+
+
+def makeStages(noise, max_step):
+    z_params = params.StormXMLObject()
+    for [pname, value] in [["center", 50.0], ["maximum", 100.0], ["minimum", 0.0]]:
+        z_params.add(params.ParameterFloat(name = pname, value = value))
+    if max_step is not None:
+        z_params.add(params.ParameterFloat(name = "max_step", value = max_step))
+    z_fn = noneZStageModule.NoneZStageFunctionality(parameters = z_params)
+    z_fn.goAbsolute(50.0)
+
+    qpd_params = params.StormXMLObject()
+    qpd_params.add(params.ParameterFloat(name = "sum_warning_low", value = 200.0))
+    qpd_fn = noneQPDModule.NoneQPDFunctionality(device_mutex = QtCore.QMutex(),
+                                                noise = noise,
+                                                parameters = qpd_params,
+                                                units_to_microns = 1.0)
+    qpd_fn.setFunctionality("z_stage", z_fn)
+    return [qpd_fn, z_fn]
+
+
+def simulate(law_values, drift_fn, duration = 60.0, noise = 0.005, max_step = None, threshold = 0.02, dropouts = []):
+    """
+    Returns [settle time (seconds), RMS error after settling (microns),
+             number of updates where the lock was not good].
+    """
+    t = [0.0]
+    [qpd_fn, z_fn] = makeStages(noise, max_step)
+    parameters = makeParameters(law_values)
+    lock_mode = lockModes.AlwaysOnLockMode(parameters = parameters)
+    lock_mode.newParameters(parameters)
+    if lock_mode.lm_drift_estimator is not None:
+        lock_mode.lm_drift_estimator.clock = lambda : t[0]
+    lock_mode.setZStageFunctionality(z_fn)
+    lock_mode.handleQPDUpdate(qpd_fn.measure())
+    lock_mode.startLock(target = 0.0)
+
+    errors = []
+    lost = 0
+    for i in range(int(duration/dt)):
+        t[0] = i * dt
+        drift = drift_fn(t[0])
+        qpd_fn.setDrift(drift)
+        qpd_state = qpd_fn.measure()
+        for [start, end] in dropouts:
+            if (t[0] >= start) and (t[0] < end):
+                qpd_state["is_good"] = False
+        lock_mode.handleQPDUpdate(qpd_state)
+        if not lock_mode.isGoodLock():
+            lost += 1
+
+        # The true error is the distance of the stage from the sample.
+        errors.append(z_fn.getCurrentPosition() - (50.0 + drift))
+
+    # Settled after the last update with an error above threshold.
+    settle = 0
+    for i, err in enumerate(errors):
+        if (abs(err) > threshold):
+            settle = i + 1
+    settled = errors[settle:]
+    rms = float("nan")
+    if (len(settled) > 0):
+        rms = math.sqrt(sum([err * err for err in settled])/len(settled))
+
+    lock_mode.stopLock()
+    return [settle * dt, rms, lost]
+
+
+if (__name__ == "__main__"):
+    app = QtCore.QCoreApplication(sys.argv)
+
+    max_step = None
+    if (len(sys.argv) > 1):
+        max_step = float(sys.argv[1])
+
+    sim_dropouts = []
+    if (len(sys.argv) > 2) and (sys.argv[2] == "dropouts"):
+        sim_dropouts = dropouts
+
+    for drift_name in sorted(drift_profiles):
+        print(drift_name)
+        for law_name in sorted(control_laws):
+            random.seed(0)
+            [settle, rms, lost] = simulate(control_laws[law_name],
+                                           drift_profiles[drift_name](),
+                                           dropouts = sim_dropouts,
+                                           max_step = max_step)
+            print("  {0:14s} settle {1:6.1f}s, RMS error {2:6.1f}nm, lost {3:d}".format(law_name, settle, 1000.0 * rms, lost))
@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+"""
+Test batch focus lock fitting.
+"""
+import numpy
+
+import storm_control.sc_hardware.utility.batch_lock_fitter as batchLF
+
+
+def drawSpot(im_size, row, col, sigma = 2.0, height = 50.0, background = 5.0):
+    [rr, cc] = numpy.mgrid[0:im_size[0],0:im_size[1]]
+    return background + height * numpy.exp(-0.5 * ((rr - row)**2 + (cc - col)**2)/(sigma * sigma))
+
+
+def test_blf_1():
+    """
+    Test fitting two spots in a stack of images, with and without a
+    warm start.
+    """
+    sigma = 2.0
+    blf = batchLF.BatchLockFitter(n_spots = 2,
+                                  roi_size = 6,
+                                  sigma = sigma,
+                                  threshold = 10)
+    im_size = (50, 100)
+    reps = 4
+
+    for i in range(5):
+        rows = 25.0 + numpy.random.uniform(-5.0, 5.0, size = (2, reps))
+        cols = 50.0 + numpy.random.uniform(-5.0, 5.0, size = (2, reps))
+        images = []
+        for spot in range(2):
+            images.append(numpy.array([drawSpot(im_size, rows[spot,j], cols[spot,j], sigma = sigma) for j in range(reps)]))
+
+        [fit_rows, fit_cols, good] = blf.fitSpots(images)
+        assert numpy.all(good)
+        assert numpy.allclose(fit_rows, rows, atol = 1.0e-2)
+        assert numpy.allclose(fit_cols, cols, atol = 1.0e-2)
+        assert (blf.last_fit[0] is not None)
+
+    # No spot in the second image stack.
+    images[1] = numpy.zeros((reps,) + im_size)
+    [fit_rows, fit_cols, good] = blf.fitSpots(images)
+    assert numpy.all(good[0])
+    assert not numpy.any(good[1])
+    assert (blf.last_fit[1] is None)
+
+
+if (__name__ == "__main__"):
+    test_blf_1()
+
@@ -38,6 +38,54 @@ def testCImageManipulation():
 
 
 
+def testRescaleImageNumpy():
+    """
+    Test the numpy (look up table) version of rescaleImage() against
+    a floating point calculation, with and without tiles.
+    """
+    import storm_control.hal4000.halLib.c_image_manipulation_c as cIM
+
+    nim = numpy.random.randint(300, size = (100,64)).astype(numpy.uint16)
+
+    for max_v in [None, 250]:
+        if max_v is None:
+            max_range = 255.0
+        else:
+            max_range = 254.0
+        expected = max_range * (nim.astype(numpy.float64) - 10.0)/(200.0 - 10.0)
+        expected = numpy.clip(expected, 0.0, max_range)
+        if max_v is not None:
+            expected[(nim >= max_v)] = 255.0
+        expected = (expected + 0.5).astype(numpy.uint8)
+
+        for [n_threads, tile_threshold] in [[1, cIM.tile_threshold], [3, 0]]:
+            [old_n_threads, old_tile_threshold] = [cIM.n_threads, cIM.tile_threshold]
+            [cIM.n_threads, cIM.tile_threshold] = [n_threads, tile_threshold]
+            try:
+                [py_nim, py_image_min, py_image_max] = cIM.rescaleImage(nim, False, False, True, [10, 200], max_v, True)
+            finally:
+                [cIM.n_threads, cIM.tile_threshold] = [old_n_threads, old_tile_threshold]
+
+            assert(py_nim.flags["C_CONTIGUOUS"])
+            assert(numpy.array_equal(py_nim, numpy.transpose(expected)))
+            assert(py_image_min == numpy.min(nim))
+            assert(py_image_max == numpy.max(nim))
+
+
+def testRescaleImageLUTCache():
+    """
+    Test that the look up tables for two different display ranges
+    are both kept, so alternating between them does not rebuild them.
+    """
+    import storm_control.hal4000.halLib.c_image_manipulation_c as cIM
+
+    lut1 = cIM.getLUT([0, 100], 65535, 255.0)
+    lut2 = cIM.getLUT([10, 200], 65535, 255.0)
+    assert(lut1 is not lut2)
+    assert(cIM.getLUT([0, 100], 65535, 255.0) is lut1)
+    assert(cIM.getLUT([10, 200], 65535, 255.0) is lut2)
+
+
 def testFocusQuality():
     import storm_control.hal4000.camera.frame as frame
     import storm_control.hal4000.focusLock.focusQuality as fq
@@ -62,6 +110,13 @@ def testFocusQuality():
 
     grad = fq.imageGradient(a_frame)
     assert(grad == 0.0)
+
+    # Frames from slice feeds are not contiguous.
+    image = numpy.random.randint(1000, size = (image_y, image_x)).astype(numpy.uint16)
+    sliced = image[10:110, 20:220]
+    a_frame = frame.Frame(sliced, 0, 200, 100, "na")
+    expected = fq.imageGradient(frame.Frame(sliced.copy(), 0, 200, 100, "na"))
+    assert(fq.imageGradient(a_frame) == expected)
     
 
 def testLMMoment():
@@ -86,9 +141,37 @@ def testLMMoment():
     lof.cleanUp()
 
 
+def testLMMomentNumpy():
+    """
+    Test that the NumPy object finder finds the same objects as LMMoment.
+    """
+    import storm_control.hal4000.camera.frame as frame
+    import storm_control.hal4000.spotCounter.lmmObjectFinder as lof
+    import storm_control.hal4000.spotCounter.npObjectFinder as npof
+
+    lof.initialize()
+
+    image = numpy.random.poisson(lam = 100.0, size = (256, 300)).astype(numpy.uint16)
+    for i in range(100):
+        [y, x] = numpy.random.randint(5, 250, size = 2)
+        image[y-1:y+2,x-1:x+2] += numpy.random.randint(100, 1000, size = (3,3)).astype(numpy.uint16)
+    a_frame = frame.Frame(image.ravel(), 0, 300, 256, "na")
+
+    [x1, y1, n1] = lof.findObjects(a_frame, 100)
+    [x2, y2, n2] = npof.findObjects(a_frame, 100)
+    assert(n1 == n2)
+    assert(numpy.allclose(x1[:n1], x2[:n2], atol = 1.0e-3))
+    assert(numpy.allclose(y1[:n1], y2[:n2], atol = 1.0e-3))
+
+    lof.cleanUp()
+
+
 if (__name__ == "__main__"):
     testCImageManipulation()
+    testRescaleImageNumpy()
+    testRescaleImageLUTCache()
     testFocusQuality()
     testLMMoment()
+    testLMMomentNumpy()
     
     
@@ -0,0 +1,249 @@
+#!/usr/bin/env python
+"""
+Tests of rendering camera frames for display.
+"""
+import numpy
+
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+import storm_control.hal4000.camera.frame as frame
+import storm_control.hal4000.display.frameStatistics as frameStatistics
+import storm_control.hal4000.halLib.c_image_manipulation_c as cIM
+import storm_control.hal4000.qtWidgets.qtCameraGraphicsScene as qtCameraGraphicsScene
+import storm_control.hal4000.qtWidgets.qtCameraOpenGL as qtCameraOpenGL
+
+
+def test_downsample_image_1():
+    """
+    Test max and mean downsampling.
+    """
+    image = numpy.random.randint(1000, size = (50, 33)).astype(numpy.uint16)
+    for factor in [1, 2, 5]:
+        [h, w] = [50//factor, 33//factor]
+        blocks = image[:h*factor,:w*factor].reshape(h, factor, w, factor)
+
+        small = cIM.downsampleImage(image, factor, "max")
+        assert(numpy.array_equal(small, numpy.max(blocks, axis = (1,3))))
+
+        small = cIM.downsampleImage(image, factor, "mean")
+        assert(small.dtype == numpy.uint16)
+        assert(numpy.array_equal(small, numpy.sum(blocks, axis = (1,3))//(factor*factor)))
+
+
+def test_camera_graphics_item_1(qtbot):
+    """
+    Test that only the visible part of the frame is rendered, at
+    (approximately) the screen resolution.
+    """
+    [w, h] = [1024, 512]
+    
+    scene = QtWidgets.QGraphicsScene()
+    view = QtWidgets.QGraphicsView(scene)
+    view.resize(300, 300)
+    qtbot.addWidget(view)
+    
+    item = qtCameraGraphicsScene.QtCameraGraphicsItem()
+    [item.chip_x, item.chip_y] = [w, h]
+    scene.addItem(item)
+
+    image = numpy.random.randint(1000, size = (h, w)).astype(numpy.uint16)
+    image[100, 200] = 5000
+    a_frame = frame.Frame(image.ravel(), 0, w, h, "camera1")
+
+    # Zoomed out, the frame should be downsampled.
+    view.setTransform(QtGui.QTransform().scale(0.25, 0.25))
+    item.updateImageWithFrame(a_frame)
+    assert(item.q_image.width() < (w//2))
+    assert(item.getAutoScale() == [int(numpy.min(image)), 5000])
+
+    # Zoomed in, only the visible part of the frame should be rendered.
+    view.setTransform(QtGui.QTransform().scale(4.0, 4.0))
+    view.centerOn(200, 100)
+    item.updateImageWithFrame(a_frame)
+    assert(item.q_image.width() < 200)
+    assert(item.q_image.height() < 200)
+    assert(item.image_rect.contains(200, 100))
+    assert(item.getAutoScale() == [int(numpy.min(image)), 5000])
+
+    # Full frame.
+    item.render_mode = "full"
+    item.updateImageWithFrame(a_frame)
+    assert(item.q_image.width() == w)
+    assert(item.q_image.height() == h)
+
+
+def test_camera_graphics_item_2(qtbot):
+    """
+    Test that the image buffer is re-used and that the rendered image
+    has the right contents and color table.
+    """
+    [w, h] = [256, 128]
+
+    scene = QtWidgets.QGraphicsScene()
+    view = QtWidgets.QGraphicsView(scene)
+    view.resize(300, 300)
+    qtbot.addWidget(view)
+    
+    item = qtCameraGraphicsScene.QtCameraGraphicsItem()
+    [item.chip_x, item.chip_y] = [w, h]
+    item.newColorTable([[i, 0, 255 - i] for i in range(256)])
+    item.newRange(0, 1000)
+    scene.addItem(item)
+
+    image = numpy.random.randint(1000, size = (h, w)).astype(numpy.uint16)
+    a_frame = frame.Frame(image.ravel(), 0, w, h, "camera1")
+
+    # Zoomed in, so the image is cropped (and not contiguous).
+    view.setTransform(QtGui.QTransform().scale(4.0, 4.0))
+    view.centerOn(100, 50)
+    item.updateImageWithFrame(a_frame)
+    q_image = item.q_image
+    assert(q_image.colorTable()[10] == QtGui.qRgb(10, 0, 245))
+
+    rect = item.image_rect
+    [x, y] = [int(rect.x()), int(rect.y())]
+    [expected, i_min, i_max] = cIM.rescaleImage(numpy.ascontiguousarray(image[y:y+q_image.height(),x:x+q_image.width()]),
+                                                False,
+                                                False,
+                                                False,
+                                                [0, 1000],
+                                                None)
+    assert(numpy.array_equal(item.buffer, expected))
+    assert(q_image.pixelIndex(1, 2) == expected[2, 1])
+
+    # Same size, so the same image.
+    item.updateImageWithFrame(a_frame)
+    assert(item.q_image is q_image)
+
+    # A different frame changes the pixels of the (same) image.
+    old_index = q_image.pixelIndex(0, 0)
+    image = (image + 500) % 1000
+    item.updateImageWithFrame(frame.Frame(image.ravel(), 1, w, h, "camera1"))
+    assert(item.q_image is q_image)
+    assert(q_image.pixelIndex(0, 0) == item.buffer[0, 0])
+    assert(q_image.pixelIndex(0, 0) != old_index)
+
+    # Changing the color table updates the image.
+    item.newColorTable([[i, i, i] for i in range(256)])
+    assert(q_image.colorTable()[10] == QtGui.qRgb(10, 10, 10))
+
+
+def test_camera_gl_item_1(qtbot):
+    """
+    Test the OpenGL item when it has to use QPainter.
+    """
+    [w, h] = [64, 32]
+
+    assert(qtCameraOpenGL.openGLAvailable() in [True, False])
+
+    # The QPainter render mode is set by the caller.
+    assert(qtCameraOpenGL.QtCameraGLGraphicsItem().render_mode == "max")
+    assert(qtCameraOpenGL.QtCameraGLGraphicsItem(render_mode = "full").render_mode == "full")
+
+    scene = QtWidgets.QGraphicsScene()
+    item = qtCameraOpenGL.QtCameraGLGraphicsItem()
+    [item.chip_x, item.chip_y] = [w, h]
+    item.newColorTable([[i, 0, 255 - i] for i in range(256)])
+    item.newRange(0, 255)
+    item.setClickPos(3, 2)
+    scene.addItem(item)
+
+    image = numpy.random.randint(256, size = (h, w)).astype(numpy.uint16)
+    image[2, 3] = 10
+    item.updateImageWithFrame(frame.Frame(image.ravel(), 0, w, h, "camera1"))
+    assert(item.getIntensityInfo() == [3, 2, 10])
+    assert(item.getAutoScale() == [int(numpy.min(image)), int(numpy.max(image))])
+
+    q_image = QtGui.QImage(w, h, QtGui.QImage.Format_RGB32)
+    painter = QtGui.QPainter(q_image)
+    scene.render(painter, QtCore.QRectF(0, 0, w, h), QtCore.QRectF(0, 0, w, h))
+    painter.end()
+    for [x, y] in [[0, 0], [3, 2], [50, 20]]:
+        i = int(image[y, x])
+        assert(q_image.pixel(x, y) == QtGui.qRgb(i, 0, 255 - i))
+
+
+def test_camera_gl_item_2(qtbot):
+    """
+    Test the OpenGL item with a slice feed frame, the data that is
+    uploaded as a texture must be contiguous.
+    """
+    [w, h] = [20, 10]
+
+    scene = QtWidgets.QGraphicsScene()
+    item = qtCameraOpenGL.QtCameraGLGraphicsItem()
+    [item.chip_x, item.chip_y] = [w, h]
+    item.newColorTable([[i, 0, 255 - i] for i in range(256)])
+    item.newRange(0, 255)
+    scene.addItem(item)
+
+    image = numpy.random.randint(256, size = (3*h, 2*w)).astype(numpy.uint16)
+    sliced = image[5:5+h,3:3+w]
+    assert not sliced.flags["C_CONTIGUOUS"]
+    item.updateImageWithFrame(frame.Frame(sliced, 0, w, h, "camera1"))
+    assert(item.image_data.flags["C_CONTIGUOUS"])
+    assert(numpy.array_equal(item.image_data, sliced))
+
+    q_image = QtGui.QImage(w, h, QtGui.QImage.Format_RGB32)
+    painter = QtGui.QPainter(q_image)
+    scene.render(painter, QtCore.QRectF(0, 0, w, h), QtCore.QRectF(0, 0, w, h))
+    painter.end()
+    for [x, y] in [[0, 0], [w-1, h-1], [7, 4]]:
+        i = int(sliced[y, x])
+        assert(q_image.pixel(x, y) == QtGui.qRgb(i, 0, 255 - i))
+
+
+def test_frame_statistics_1():
+    """
+    Test that the auto-scale range ignores a few hot pixels and that
+    only the most recent frames are used.
+    """
+    [w, h] = [64, 32]
+    f_stats = frameStatistics.FrameStatistics(n_bins = 256, window = 2)
+    f_stats.reset(max_intensity = 1023)
+    assert(f_stats.getNFrames() == 0)
+
+    image = numpy.random.randint(100, 200, size = (h, w)).astype(numpy.uint16)
+    image[0, 0:4] = 1023
+    f_stats.addFrame(frame.Frame(image.ravel(), 0, w, h, "camera1"))
+    [low, high] = f_stats.getAutoScale()
+    assert(low >= 96) and (high <= 204)
+
+    stats = f_stats.getStatistics()
+    assert(stats["max"] == 1023)
+    assert(stats["n_frames"] == 1)
+    assert(sum(stats["histogram"]) == w*h)
+
+    # Older frames drop out of the window.
+    for i in range(2):
+        image = numpy.full((h, w), 500, dtype = numpy.uint16)
+        f_stats.addFrame(frame.Frame(image.ravel(), i + 1, w, h, "camera1"))
+    stats = f_stats.getStatistics()
+    assert(stats["n_frames"] == 2)
+    assert(stats["min"] == 500) and (stats["max"] == 500)
+    assert(abs(stats["mean"] - 500) < 1.0e-6)
+    assert(abs(stats["median"] - 500) < 4)
+
+
+def test_frame_statistics_2():
+    """
+    Test that the auto-scale range of low count (sCMOS like) frames is
+    not quantized when max_intensity is large.
+    """
+    [w, h] = [256, 256]
+    f_stats = frameStatistics.FrameStatistics()
+    f_stats.reset(max_intensity = 65535)
+
+    image = numpy.random.poisson(lam = 110.0, size = (h, w)).astype(numpy.uint16)
+    f_stats.addFrame(frame.Frame(image.ravel(), 0, w, h, "camera1"))
+    expected = numpy.percentile(image, f_stats.percentiles)
+    for [value, percentile] in zip(f_stats.getAutoScale(), expected):
+        assert(abs(value - percentile) <= 1)
+
+    stats = f_stats.getStatistics()
+    assert(len(stats["bin_edges"]) == (len(stats["histogram"]) + 1))
+    assert(stats["bin_edges"][-1] == 65536)
+
+
+if (__name__ == "__main__"):
+    test_downsample_image_1()
@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+"""
+Test the focus lock drift estimator.
+"""
+import random
+
+import storm_control.hal4000.focusLock.lockModes as lockModes
+
+
+def test_drift_estimator_1():
+    """
+    Test that the estimator follows a sample drifting at a constant
+    rate and that the confidence decreases without measurements.
+    """
+    random.seed(0)
+    rate = 0.01
+    estimator = lockModes.DriftEstimator()
+    assert (estimator.getConfidence(0.0, 0.02) == 0.0)
+
+    for i in range(100):
+        t = 0.1 * i
+        estimator.update(t, 50.0 + rate * t + random.gauss(0.0, 0.005))
+
+    last_confidence = 1.0
+    for dt in [0.1, 0.5, 1.0, 2.0]:
+        t = 9.9 + dt
+        assert (abs(estimator.predict(t) - (50.0 + rate * t)) < 0.005)
+        confidence = estimator.getConfidence(t, 0.02)
+        assert (confidence < last_confidence)
+        last_confidence = confidence
+    assert (estimator.getConfidence(10.4, 0.02) > 0.9)
+    assert (estimator.getTimeSinceMeasurement(10.4) > 0.49)
+
+    estimator.reset()
+    assert (estimator.getTimeSinceMeasurement(10.4) is None)
+
+
+if (__name__ == "__main__"):
+    test_drift_estimator_1()
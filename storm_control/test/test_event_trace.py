@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+"""
+Tests of HAL message event tracing.
+"""
+import storm_control.sc_library.eventTrace as eventTrace
+import storm_control.sc_library.log_timing as log_timing
+import storm_control.test as test
+
+
+def test_event_trace_1():
+    """
+    Test that traced events can be read back by log_timing.
+    """
+    eventTrace.startTracing(test.dataDirectory(), "trace_test")
+    assert eventTrace.getTracing()
+
+    for m_id in range(10):
+        eventTrace.traceEvent("queued", m_id, "film", "start film")
+        eventTrace.traceEvent("sent", m_id, "film", "start film")
+        for module_name in ["camera1", "display"]:
+            eventTrace.traceEvent("handled by", m_id, module_name, "start film")
+        if ((m_id % 2) == 0):
+            eventTrace.traceEvent("processed", m_id, "film", "start film")
+    eventTrace.stopTracing()
+    assert not eventTrace.getTracing()
+
+    # Only the even messages are complete.
+    messages = log_timing.logTiming(test.dataDirectory() + "trace_test")
+    assert(sorted(messages) == [0, 2, 4, 6, 8])
+    for msg in messages.values():
+        assert(msg.getType() == "start film")
+        assert(msg.getSource() == "film")
+        assert(msg.getHandledBy() == {"camera1" : 1, "display" : 1})
+        assert(msg.getProcessingTime() >= msg.getHandledTimes()["display"])
+
+    m_times = log_timing.moduleTimes(messages)
+    assert(sorted(m_times) == ["camera1", "display"])
+    assert(len(m_times["camera1"]) == 5)
+
+    
+if (__name__ == "__main__"):
+    test_event_trace_1()
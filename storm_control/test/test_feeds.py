@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+"""
+Tests of the feeds.
+"""
+import numpy
+
+import storm_control.sc_library.parameters as params
+
+import storm_control.hal4000.camera.cameraFunctionality as cameraFunctionality
+import storm_control.hal4000.camera.frame as frame
+import storm_control.hal4000.feeds.feeds as feeds
+
+
+def makeCameraFunctionality(x_pixels, y_pixels):
+    parameters = params.StormXMLObject()
+    for [pname, value] in [["default_max", 2000],
+                           ["default_min", 100],
+                           ["fps", 10],
+                           ["max_intensity", 65535],
+                           ["x_bin", 1],
+                           ["x_chip", x_pixels],
+                           ["x_end", x_pixels],
+                           ["x_pixels", x_pixels],
+                           ["x_start", 1],
+                           ["y_bin", 1],
+                           ["y_chip", y_pixels],
+                           ["y_end", y_pixels],
+                           ["y_pixels", y_pixels],
+                           ["y_start", 1]]:
+        parameters.add(params.ParameterInt(name = pname, value = value))
+    for pname in ["flip_horizontal", "flip_vertical", "transpose"]:
+        parameters.add(params.ParameterSetBoolean(name = pname, value = False))
+    return cameraFunctionality.CameraFunctionality(camera_name = "camera1",
+                                                   parameters = parameters)
+
+def makeFeedController(feed_dicts):
+    feed_params = params.StormXMLObject()
+    for feed_name in sorted(feed_dicts):
+        for pname, value in feed_dicts[feed_name].items():
+            feed_params.add(feed_name + "." + pname, value)
+    return feeds.FeedController(parameters = feed_params)
+
+def keepFrames(frame_list, frames):
+    """
+    Frames must be acquired if they are kept after the newFrames signal.
+    """
+    for elt in frames:
+        elt.acquire()
+    frame_list.extend(frames)
+
+def makeFrames(x_pixels, y_pixels, n_frames):
+    frames = []
+    for i in range(n_frames):
+        np_data = numpy.random.randint(1000, size = x_pixels * y_pixels).astype(numpy.uint16)
+        frames.append(frame.Frame(np_data, i, x_pixels, y_pixels, "camera1"))
+    return frames
+
+
+def test_feeds_1():
+    """
+    Test average, interval and slice feeds driven by the same camera.
+    """
+    [w, h] = [16, 12]
+    cam_fn = makeCameraFunctionality(w, h)
+    controller = makeFeedController({"avg" : {"feed_type" : "average",
+                                              "frames_to_average" : 3,
+                                              "source" : "camera1"},
+                                     "int" : {"capture_frames" : "1",
+                                              "cycle_length" : 2,
+                                              "feed_type" : "interval",
+                                              "source" : "camera1"},
+                                     "roi" : {"feed_type" : "slice",
+                                              "source" : "camera1",
+                                              "x_end" : 8,
+                                              "x_start" : 5,
+                                              "y_end" : 6,
+                                              "y_start" : 2}})
+
+    feed_frames = {}
+    for feed_name in controller.getFeedNames():
+        controller.setCameraFunctionality(feed_name, cam_fn)
+        feed_frames[feed_name] = []
+        feed_fn = controller.getFeed(feed_name)
+        feed_fn.newFrames.connect(lambda frames, name = feed_name : keepFrames(feed_frames[name], frames))
+
+    frames = makeFrames(w, h, 7)
+    cam_fn.emitFrames(frames[:4])
+    cam_fn.emitFrames(frames[4:])
+
+    images = [elt.getData().reshape(h, w) for elt in frames]
+
+    # Average feed.
+    avg_frames = feed_frames["camera1.avg"]
+    assert(len(avg_frames) == 2)
+    for i, avg_frame in enumerate(avg_frames):
+        expected = numpy.sum(numpy.array(images[3*i:3*i+3], dtype = numpy.uint32), axis = 0)//3
+        assert(avg_frame.frame_number == i)
+        assert(numpy.array_equal(avg_frame.getData().reshape(h, w), expected))
+
+    # Interval feed.
+    int_frames = feed_frames["camera1.int"]
+    assert(len(int_frames) == 3)
+    for i, int_frame in enumerate(int_frames):
+        assert(numpy.array_equal(int_frame.getData().reshape(h, w), images[2*i+1]))
+
+    # Slice feed, this is a view of the camera frame until a C pointer is needed.
+    roi_frames = feed_frames["camera1.roi"]
+    assert(len(roi_frames) == 7)
+    for i, roi_frame in enumerate(roi_frames):
+        assert([roi_frame.image_x, roi_frame.image_y] == [4, 5])
+        assert(numpy.may_share_memory(roi_frame.getData(), frames[i].getData()))
+        assert(numpy.array_equal(roi_frame.getData(), images[i][1:6,4:8]))
+    roi_frames[0].getDataPtr()
+    assert(roi_frames[0].getData().flags["C_CONTIGUOUS"])
+
+    controller.disconnectFeeds()
+
+
+def test_feeds_2():
+    """
+    Test the rolling background and maximum projection feeds.
+    """
+    [w, h, n] = [8, 4, 5]
+    cam_fn = makeCameraFunctionality(w, h)
+    controller = makeFeedController({"max" : {"feed_type" : "max_projection",
+                                              "source" : "camera1",
+                                              "window_size" : n},
+                                     "median" : {"background" : "median",
+                                                 "feed_type" : "background",
+                                                 "source" : "camera1",
+                                                 "window_size" : n},
+                                     "min" : {"background" : "minimum",
+                                              "feed_type" : "background",
+                                              "source" : "camera1",
+                                              "window_size" : n}})
+
+    feed_frames = {}
+    for feed_name in controller.getFeedNames():
+        controller.setCameraFunctionality(feed_name, cam_fn)
+        feed_frames[feed_name] = []
+        feed_fn = controller.getFeed(feed_name)
+        feed_fn.newFrames.connect(lambda frames, name = feed_name : feed_frames[name].extend([elt.getData().copy() for elt in frames]))
+
+    # Use a small range of values so that there are lots of ties.
+    frames = []
+    for i in range(20):
+        np_data = numpy.random.randint(10, size = w * h).astype(numpy.uint16)
+        frames.append(frame.Frame(np_data, i, w, h, "camera1"))
+    for i in range(0, len(frames), 3):
+        cam_fn.emitFrames(frames[i:i+3])
+
+    for i in range(len(frames)):
+        window = numpy.array([elt.getData() for elt in frames[max(0, i-n+1):i+1]])
+        data = frames[i].getData().astype(numpy.int32)
+
+        assert(numpy.array_equal(feed_frames["camera1.max"][i], numpy.max(window, axis = 0)))
+
+        background = numpy.floor(numpy.median(window, axis = 0)).astype(numpy.int32)
+        assert(numpy.array_equal(feed_frames["camera1.median"][i], numpy.maximum(data - background, 0)))
+
+        background = numpy.min(window, axis = 0).astype(numpy.int32)
+        assert(numpy.array_equal(feed_frames["camera1.min"][i], data - background))
+
+    controller.disconnectFeeds()
+
+
+def test_sorted_window_1():
+    """
+    Test that the sorted window stays sorted.
+    """
+    [n_frames, n_pixels] = [7, 100]
+    sorted_window = feeds.SortedWindow(n_frames = n_frames, n_pixels = n_pixels)
+    frames = numpy.random.randint(20, size = (30, n_pixels)).astype(numpy.uint16)
+    for i in range(frames.shape[0]):
+        sorted_window.addFrame(frames[i])
+        window = frames[max(0, i-n_frames+1):i+1]
+        assert(numpy.array_equal(sorted_window.sorted[:window.shape[0]], numpy.sort(window, axis = 0)))
+
+
+if (__name__ == "__main__"):
+    test_feeds_1()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+"""
+Tests of the frame buffer pool.
+"""
+import numpy
+
+import storm_control.sc_library.parameters as params
+
+import storm_control.hal4000.camera.cameraControl as cameraControl
+import storm_control.hal4000.camera.frame as frame
+
+
+class PoolCamera(object):
+    """
+    A minimal camera that copies its frames into buffers from
+    the frame pool, like hamamatsu_camera.HamamatsuCamera.
+    """
+    def __init__(self, **kwds):
+        super().__init__(**kwds)
+        self.frame_pool = None
+
+    def getFrames(self):
+        frame_buffer = self.frame_pool.borrow(16)
+        frame_buffer.getData()[:] = 1
+        return [[frame_buffer], [4, 4]]
+
+    def setFramePool(self, frame_pool):
+        self.frame_pool = frame_pool
+
+    def startAcquisition(self):
+        pass
+
+    def stopAcquisition(self):
+        pass
+
+
+def test_frame_pool_1():
+    """
+    Test that buffers are re-used once all the references are released.
+    """
+    pool = frame.FramePool(n_buffers = 2)
+
+    fb1 = pool.borrow(16)
+    fb2 = pool.borrow(16)
+    assert(pool.getFreeBuffers() == 0)
+
+    # A frame that is acquired by another consumer is not returned
+    # until the consumer also releases it.
+    aframe = frame.Frame(fb1.getData(), 0, 4, 4, "camera1", frame_buffer = fb1)
+    aframe.acquire()
+    aframe.release()
+    assert(pool.getFreeBuffers() == 0)
+    aframe.release()
+    assert(pool.getFreeBuffers() == 1)
+
+    # This should be the same storage.
+    fb3 = pool.borrow(16)
+    assert(fb3 is fb1)
+    fb2.release()
+    fb3.release()
+    assert(pool.getFreeBuffers() == 2)
+
+
+def test_frame_pool_2():
+    """
+    Test that the pool size stays bounded when the pool is empty.
+    """
+    pool = frame.FramePool(n_buffers = 2)
+    fbs = [pool.borrow(16) for i in range(5)]
+    assert(pool.getMisses() == 3)
+    for fb in fbs:
+        fb.release()
+    assert(pool.getFreeBuffers() == 2)
+
+
+def test_frame_pool_3():
+    """
+    Test that buffers of the old size are discarded when the frame size changes.
+    """
+    pool = frame.FramePool(n_buffers = 2)
+    fb1 = pool.borrow(16)
+    fb2 = pool.borrow(32)
+    assert(fb2.getData().size == 32)
+    fb1.release()
+    assert(pool.getFreeBuffers() == 0)
+    fb2.release()
+    assert(pool.getFreeBuffers() == 1)
+
+
+def test_frame_pool_4():
+    """
+    Test that frames that are not from a pool can still be acquired and released.
+    """
+    aframe = frame.Frame(numpy.zeros(16, dtype = numpy.uint16), 0, 4, 4, "camera1")
+    aframe.acquire()
+    aframe.release()
+
+
+def test_frame_pool_5():
+    """
+    Test that a hardware camera control gives its frame pool to the camera.
+    """
+    camera_control = cameraControl.HWCameraControl(camera_name = "camera1",
+                                                   config = params.StormXMLObject())
+    camera_control.camera = PoolCamera()
+    camera_control.film_length = 3
+
+    frames = []
+    camera_control.newData.connect(frames.extend)
+    camera_control.run()
+
+    assert(len(frames) == 3)
+    for aframe in frames:
+        assert(isinstance(aframe.frame_buffer, frame.FrameBuffer))
+        aframe.release()
+    assert(camera_control.frame_pool.getFreeBuffers() == 3)
+    assert(camera_control.frame_pool.getMisses() == 0)
+
+
+if (__name__ == "__main__"):
+    test_frame_pool_1()
+    test_frame_pool_2()
+    test_frame_pool_3()
+    test_frame_pool_4()
+    test_frame_pool_5()
+
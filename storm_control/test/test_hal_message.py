@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+"""
+Tests of HAL message validation.
+"""
+import storm_control.hal4000.halLib.halMessage as halMessage
+
+
+def isValid(validator, data):
+    try:
+        halMessage.validate(validator, data, "test")
+    except halMessage.HalMessageException:
+        return False
+    return True
+
+
+def test_compiled_validator_1():
+    """
+    Test that the compiled validators agree with validate().
+    """
+    validators = [None,
+                  {},
+                  {"a" : [True, int]},
+                  {"a" : [True, int], "b" : [False, str]},
+                  {"a" : [False, (int, float)]}]
+
+    data = [None,
+            {},
+            {"a" : 1},
+            {"a" : 1.0},
+            {"a" : "1"},
+            {"a" : 1, "b" : "b"},
+            {"a" : 1, "b" : 2},
+            {"b" : "b"},
+            {"c" : 1}]
+
+    for validator in validators:
+        compiled = halMessage.CompiledValidator(validator)
+        for elt in data:
+            assert(compiled.isValid(elt) == isValid(validator, elt))
+
+
+def test_compiled_validator_2():
+    """
+    Test that messages added with addMessage() are compiled.
+    """
+    halMessage.initializeMessages()
+    halMessage.addMessage("test validator",
+                          validator = {"data" : {"a" : [True, int]}, "resp" : None})
+
+    [data, resp] = halMessage.compiled_validators["test validator"]
+    assert(data.isValid({"a" : 1}))
+    assert(not data.isValid({"a" : "1"}))
+    assert(resp.isValid(None))
+
+    # Modules also add messages with the default (empty) validator.
+    halMessage.addMessage("test validator 2")
+    [data, resp] = halMessage.compiled_validators["test validator 2"]
+    assert(data.isValid(None))
+    assert(not data.isValid({"a" : 1}))
+    
+    # Re-initializing removes the messages added by modules.
+    halMessage.initializeMessages()
+    assert(not "test validator" in halMessage.compiled_validators)
+    assert("configure1" in halMessage.compiled_validators)
+
+
+if (__name__ == "__main__"):
+    test_compiled_validator_1()
+    test_compiled_validator_2()
@@ -0,0 +1,15 @@
+#!/usr/bin/env python
+"""
+Test the module profiles.
+"""
+from storm_control.test.hal.standardHalTest import halTest
+
+
+def test_hal_profile_1():
+    halTest(config_xml = "none_classic_config.xml",
+            class_name = "ProfileTest1",
+            test_module = "storm_control.test.hal.profile_tests")
+
+
+if (__name__ == "__main__"):
+    test_hal_profile_1()
@@ -0,0 +1,225 @@
+#!/usr/bin/env python
+"""
+Tests of the image writers.
+"""
+import numpy
+import os
+import tifffile
+
+import storm_control.sc_library.cdax as cdax
+import storm_control.sc_library.parameters as params
+import storm_control.test as test
+
+import storm_control.hal4000.camera.cameraFunctionality as cameraFunctionality
+import storm_control.hal4000.camera.frame as frame
+import storm_control.hal4000.film.filmSettings as filmSettings
+import storm_control.hal4000.halLib.imagewriters as imagewriters
+
+
+def makeCameraFunctionality(x_pixels, y_pixels):
+    parameters = params.StormXMLObject()
+    parameters.add(params.ParameterInt(name = "bytes_per_frame",
+                                       value = 2 * x_pixels * y_pixels))
+    parameters.add(params.ParameterString(name = "extension",
+                                          value = ""))
+    parameters.add(params.ParameterInt(name = "x_pixels",
+                                       value = x_pixels))
+    parameters.add(params.ParameterInt(name = "y_pixels",
+                                       value = y_pixels))
+    return cameraFunctionality.CameraFunctionality(camera_name = "camera1",
+                                                   parameters = parameters)
+
+def makeFrames(x_pixels, y_pixels, n_frames):
+    frames = []
+    for i in range(n_frames):
+        np_data = numpy.arange(x_pixels * y_pixels, dtype = numpy.uint16) + i
+        frames.append(frame.Frame(np_data, i, x_pixels, y_pixels, "camera1"))
+    return frames
+
+def recordFilm(cam_fn, film_settings, frames, frame_metadata = None):
+    writer = imagewriters.createFileWriter(cam_fn, film_settings, frame_metadata = frame_metadata)
+
+    # Cameras usually return frames in small groups.
+    for i in range(0, len(frames), 3):
+        cam_fn.emitFrames(frames[i:i+3])
+    cam_fn.stopped.emit()
+    writer.closeWriter()
+    return writer
+
+def test_dax_writer_1():
+    """
+    Test that the writer thread saves the same data as the main thread.
+    """
+    [x_pixels, y_pixels, n_frames] = [64, 32, 20]
+    cam_fn = makeCameraFunctionality(x_pixels, y_pixels)
+    frames = makeFrames(x_pixels, y_pixels, n_frames)
+
+    for n_buffers in [0, 4, 100]:
+        basename = os.path.join(test.dataDirectory(), "iw_test_{0:d}".format(n_buffers))
+        film_settings = filmSettings.FilmSettings(basename = basename,
+                                                  filetype = ".dax",
+                                                  writer_buffers = n_buffers)
+        writer = recordFilm(cam_fn, film_settings, frames)
+
+        n_saved = writer.number_frames
+        assert((n_saved + writer.getDroppedFrames()) == n_frames)
+        assert(writer.getQueueDepth() == 0)
+        assert(numpy.allclose(writer.getSize(), n_saved * writer.frame_size))
+
+        data = numpy.fromfile(basename + ".dax", dtype = numpy.uint16)
+        assert(data.size == (n_saved * x_pixels * y_pixels))
+
+        with open(basename + ".inf") as inf_fp:
+            assert("number of frames = " + str(n_saved) + "\n" in inf_fp.readlines())
+
+        # Only a writer thread with all the buffers filled can drop frames.
+        if (n_buffers == 0) or (n_buffers >= n_frames):
+            assert(n_saved == n_frames)
+            data = data.reshape((n_frames, -1))
+            for i in range(n_frames):
+                assert(numpy.array_equal(data[i], frames[i].getData()))
+
+
+def test_dax_writer_2():
+    """
+    Test pre-allocated (fixed length) films that are shorter or longer
+    than expected.
+    """
+    [x_pixels, y_pixels, film_length] = [64, 32, 10]
+    cam_fn = makeCameraFunctionality(x_pixels, y_pixels)
+
+    for n_buffers in [0, 4]:
+        for n_frames in [3, film_length, 15]:
+            frames = makeFrames(x_pixels, y_pixels, n_frames)
+            basename = os.path.join(test.dataDirectory(), "iw_test_{0:d}_{1:d}".format(n_buffers, n_frames))
+            film_settings = filmSettings.FilmSettings(basename = basename,
+                                                      film_length = film_length,
+                                                      filetype = ".dax",
+                                                      writer_buffers = n_buffers)
+            writer = recordFilm(cam_fn, film_settings, frames)
+            n_saved = writer.number_frames
+            assert(os.path.getsize(basename + ".dax") == (n_saved * 2 * x_pixels * y_pixels))
+
+            data = numpy.fromfile(basename + ".dax", dtype = numpy.uint16).reshape((n_saved, -1))
+            if (n_buffers == 0):
+                assert(n_saved == n_frames)
+                for i in range(n_frames):
+                    assert(numpy.array_equal(data[i], frames[i].getData()))
+
+
+def test_cdax_writer_1():
+    """
+    Test that .cdax files can be read back, including the per-frame metadata.
+    """
+    [x_pixels, y_pixels, n_frames] = [64, 32, 20]
+    cam_fn = makeCameraFunctionality(x_pixels, y_pixels)
+    frames = makeFrames(x_pixels, y_pixels, n_frames)
+
+    for n_buffers in [0, 100]:
+        basename = os.path.join(test.dataDirectory(), "iw_test_{0:d}".format(n_buffers))
+        film_settings = filmSettings.FilmSettings(basename = basename,
+                                                  filetype = ".cdax",
+                                                  writer_buffers = n_buffers)
+        recordFilm(cam_fn, film_settings, frames, frame_metadata = {"stage_x" : 1.0, "stage_y" : 2.0})
+
+        reader = cdax.CDaxReader(filename = basename + ".cdax")
+        assert(reader.n_frames == n_frames)
+        for i in [0, 15, 16, 19, 3]:
+            assert(numpy.array_equal(reader.loadFrame(i).ravel(), frames[i].getData()))
+
+        table = reader.getFrameTable()
+        assert(numpy.array_equal(table["frame_number"], numpy.arange(n_frames)))
+        assert(numpy.allclose(table["stage_x"], 1.0))
+        assert(numpy.allclose(table["stage_y"], 2.0))
+        assert(numpy.all(numpy.isnan(table["lock_offset"])))
+        reader.close()
+
+
+def test_writer_thread_1():
+    """
+    Test that frames are dropped (without an exception) once the writer
+    thread fails, and that the error is raised when the writer is stopped.
+    """
+    def writeFn(frames):
+        raise IOError("disk full")
+
+    writer = imagewriters.WriterThread(frame_pixels = 10, n_buffers = 4, write_fn = writeFn)
+    writer.startWriter()
+    writer.addFrame(numpy.zeros(10, dtype = numpy.uint16))
+
+    # The thread exits when write_fn() fails.
+    writer.wait()
+
+    for i in range(10):
+        assert not writer.addFrame(numpy.zeros(10, dtype = numpy.uint16))
+    assert(writer.getDroppedFrames() == 11)
+
+    try:
+        writer.stopWriter()
+    except imagewriters.ImageWriterException:
+        pass
+    else:
+        assert False
+
+
+def test_tif_writer_1():
+    """
+    Test that (big) tif files can be read with tifffile, both for pre-written
+    IFD chains (fixed length films) and for batched IFDs.
+    """
+    [x_pixels, y_pixels, film_length] = [64, 32, 10]
+    cam_fn = makeCameraFunctionality(x_pixels, y_pixels)
+
+    for filetype in [".tif", ".big.tif"]:
+        for acq_mode in ["fixed_length", "run_till_abort"]:
+            for n_frames in [3, film_length, 100]:
+                frames = makeFrames(x_pixels, y_pixels, n_frames)
+                basename = os.path.join(test.dataDirectory(), "iw_test_{0:d}".format(n_frames))
+                film_settings = filmSettings.FilmSettings(acq_mode = acq_mode,
+                                                          basename = basename,
+                                                          film_length = film_length,
+                                                          filetype = filetype,
+                                                          pixel_size = 0.16)
+                recordFilm(cam_fn, film_settings, frames)
+
+                with tifffile.TiffFile(basename + filetype) as tif:
+                    assert(len(tif.pages) == n_frames)
+                    for i in range(n_frames):
+                        image = tif.pages[i].asarray()
+                        assert(image.shape == (y_pixels, x_pixels))
+                        assert(numpy.array_equal(image.ravel(), frames[i].getData()))
+
+
+
+def test_tif_writer_2():
+    """
+    Test that tifffile reads the whole movie correctly when the IFDs
+    are between the frames (not fixed length and more than one batch).
+    """
+    [x_pixels, y_pixels, n_frames] = [64, 32, 150]
+    cam_fn = makeCameraFunctionality(x_pixels, y_pixels)
+    frames = makeFrames(x_pixels, y_pixels, n_frames)
+    expected = numpy.array([elt.getData().reshape(y_pixels, x_pixels) for elt in frames])
+
+    for acq_mode in ["fixed_length", "run_till_abort"]:
+        basename = os.path.join(test.dataDirectory(), "iw_test_" + acq_mode)
+        film_settings = filmSettings.FilmSettings(acq_mode = acq_mode,
+                                                  basename = basename,
+                                                  film_length = n_frames,
+                                                  filetype = ".tif",
+                                                  pixel_size = 0.16)
+        recordFilm(cam_fn, film_settings, frames)
+
+        with tifffile.TiffFile(basename + ".tif") as tif:
+            assert(tif.is_imagej == (acq_mode == "fixed_length"))
+            assert(numpy.array_equal(tif.asarray(), expected))
+
+
+if (__name__ == "__main__"):
+    test_dax_writer_1()
+    test_dax_writer_2()
+    test_cdax_writer_1()
+    test_writer_thread_1()
+    test_tif_writer_1()
+    test_tif_writer_2()
+
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+"""
+Tests of the focus lock control laws.
+"""
+import storm_control.hal4000.focusLock.lockControllers as lockControllers
+
+
+def lockToDrift(controller, rate, n_updates = 200):
+    """
+    Returns the error measured at the last update when locking to a
+    sample that is drifting at a constant rate (microns / update).
+    """
+    [sample, z] = [0.0, 0.0]
+    for i in range(n_updates):
+        sample += rate
+        error = z - sample
+        z += controller.update(error, 0.0)
+    return error
+
+
+def test_proportional_1():
+    """
+    Test that the proportional controller is the original control law.
+    """
+    controller = lockControllers.ProportionalController(gain = 0.5, max_gain = 0.7)
+    assert (abs(controller.update(0.0, 0.0)) < 1.0e-12)
+    assert (abs(controller.update(1.0e-3, 0.0) + 0.5e-3) < 1.0e-6)
+    assert (abs(controller.update(-10.0, 0.0) - 7.0) < 1.0e-6)
+
+
+def test_pid_1():
+    """
+    Test that the PID controller removes the lag when the sample is
+    drifting at a constant rate.
+    """
+    rate = 0.005
+    error = lockToDrift(lockControllers.ProportionalController(), rate)
+    assert (abs(error + 0.01) < 1.0e-3)
+
+    error = lockToDrift(lockControllers.PIDController(), rate)
+    assert (abs(error) < 1.0e-6)
+
+
+def test_pid_2():
+    """
+    Test step limiting and anti-windup.
+    """
+    controller = lockControllers.PIDController(integral_limit = 0.1, ki = 0.5, kp = 0.5)
+    controller.setMaxStep(0.2)
+
+    # A large error saturates the output, the integral term is clamped.
+    for i in range(10):
+        assert (abs(controller.update(1.0, 0.0) + 0.2) < 1.0e-12)
+        assert controller.getState()["saturated"]
+    assert (abs(controller.getState()["i"]) <= 0.1)
+
+    # Once the error is gone the integral term unwinds quickly.
+    controller.update(0.0, 0.0)
+    controller.update(0.0, 0.0)
+    assert (abs(controller.update(0.0, 0.0)) <= 0.1)
+
+    # Feed-forward moves with the lock target.
+    controller = lockControllers.PIDController(feed_forward = 1.0, ki = 0.0, kp = 0.0)
+    controller.update(0.0, 0.0)
+    assert (abs(controller.update(0.0, 0.3) - 0.3) < 1.0e-12)
+    assert (abs(controller.update(0.0, 0.3)) < 1.0e-12)
+
+
+if (__name__ == "__main__"):
+    test_proportional_1()
+    test_pid_1()
+    test_pid_2()
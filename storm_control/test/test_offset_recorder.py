@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+"""
+Test the focus lock offset recorder.
+"""
+import numpy
+import os
+import tifffile
+
+import storm_control.test as test
+
+import storm_control.hal4000.focusLock.offsetRecorder as offsetRecorder
+
+
+def test_offset_recorder_1():
+    """
+    Test saving offsets and QPD images, and exporting the offsets as text.
+    """
+    basename = os.path.join(test.dataDirectory(), "offsets_test")
+
+    recorder = offsetRecorder.OffsetRecorder(basename = basename, save_images = True)
+    images = []
+    for i in range(100):
+        image = numpy.random.randint(255, size = (10, 20)).astype(numpy.uint8)
+        images.append(image.copy())
+        recorder.addImage(image)
+
+        # The image buffer is re-used by the camera.
+        image[:] = 0
+        recorder.addOffset(frame_number = i + 1,
+                           offset = 0.01 * i,
+                           power = 100.0 + i,
+                           stage_z = 50.0,
+                           is_good = (i % 2),
+                           target = 0.0,
+                           control_state = {"dz" : -0.001 * i,
+                                            "p" : -0.002 * i,
+                                            "saturated" : False})
+    recorder.close()
+    assert (recorder.getDroppedFrames() == [0, 0])
+
+    offsets = offsetRecorder.loadOffsets(basename + ".offb")
+    assert (offsets.size == 100)
+    assert numpy.array_equal(offsets["frame"], numpy.arange(1, 101))
+    assert numpy.allclose(offsets["offset"], 0.01 * numpy.arange(100))
+    assert numpy.array_equal(offsets["tif_counter"], numpy.arange(1, 101))
+    assert numpy.allclose(offsets["dz"], -0.001 * numpy.arange(100))
+    assert numpy.allclose(offsets["p"], -0.002 * numpy.arange(100))
+    assert numpy.allclose(offsets["i"], 0.0)
+
+    with tifffile.TiffFile(basename + "_qpd.tif") as tf:
+        assert (len(tf.pages) == 100)
+        for i, page in enumerate(tf.pages):
+            assert numpy.array_equal(page.asarray(), images[i])
+
+    offsetRecorder.exportText(basename)
+    with open(basename + ".off") as fp:
+        lines = fp.readlines()
+    assert (lines[0] == "frame offset power stage-z good-offset tif-counter\n")
+    assert (lines[2] == "2 0.010000 101.000000 50.000000 1 2\n")
+    assert (len(lines) == 101)
+
+
+if (__name__ == "__main__"):
+    test_offset_recorder_1()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+"""
+Tests of the spot counter analysis queue.
+"""
+import numpy
+
+import storm_control.hal4000.camera.frame as frame
+import storm_control.hal4000.spotCounter.findSpots as findSpots
+import storm_control.hal4000.spotCounter.npObjectFinder as npObjectFinder
+
+
+def test_np_object_finder_1():
+    """
+    Test the NumPy object finder.
+    """
+    image = numpy.ones((100, 120), dtype = numpy.uint16)
+    image[20, 10] = 200
+    image[60, 80:82] = 200
+    image[3, 50] = 200
+    a_frame = frame.Frame(image.ravel(), 0, 120, 100, "camera1")
+
+    # The peak with a tie is found once, the peak at the edge is ignored.
+    [x, y, n] = npObjectFinder.findObjects(a_frame, 100)
+    assert(n == 2)
+    assert([x[0], y[0]] == [10.0, 20.0])
+    assert([x[1], y[1]] == [80.5, 60.0])
+
+    # The number of objects is limited to max_locs.
+    image = numpy.ones((800, 800), dtype = numpy.uint16)
+    image[10:790:10,10:790:10] = 200
+    [x, y, n] = npObjectFinder.findObjects(frame.Frame(image.ravel(), 0, 800, 800, "camera1"), 100)
+    assert(n == npObjectFinder.max_locs)
+
+
+def test_tiles_1():
+    """
+    Test that analyzing a frame in tiles gives the same localizations
+    as analyzing the whole frame.
+    """
+    [w, h] = [300, 260]
+    image = numpy.random.poisson(lam = 100.0, size = (h, w)).astype(numpy.uint16)
+    for i in range(200):
+        [y, x] = [numpy.random.randint(1, h-1), numpy.random.randint(1, w-1)]
+        image[y-1:y+2,x-1:x+2] += numpy.random.randint(200, 1000, size = (3,3)).astype(numpy.uint16)
+    a_frame = frame.Frame(image.ravel(), 0, w, h, "camera1")
+
+    [x, y, n] = npObjectFinder.findObjects(a_frame, 100)
+    expected = sorted(zip(x[:n], y[:n]))
+
+    tiles = findSpots.makeTiles(w, h, 64)
+    assert(len(tiles) == 25)
+    frame_analysis = findSpots.FrameAnalysis(camera_name = "camera1",
+                                             frame = a_frame,
+                                             threshold = 100,
+                                             tiles = tiles)
+    [x_buffer, y_buffer] = npObjectFinder.createBuffers()
+    done = [frame_analysis.analyzeTile(npObjectFinder, tile, x_buffer, y_buffer) for tile in tiles]
+    assert(done == ([False] * 24 + [True]))
+
+    [x, y] = frame_analysis.getLocalizations()
+    assert(frame_analysis.getCounts() == n)
+    assert(numpy.allclose(numpy.array(sorted(zip(x, y))), numpy.array(expected)))
+
+
+def analyzeFrames(qtbot, n_frames, max_size = 300000, **kwds):
+    """
+    Returns the spot counter statistics and the frame analysis
+    results for n_frames frames.
+    """
+    spot_counter = findSpots.SpotCounter(max_size = max_size, object_finder = "numpy", **kwds)
+    results = []
+    spot_counter.imageProcessed.connect(results.append)
+
+    image = numpy.ones((512, 512), dtype = numpy.uint16)
+    image[200, 100] = 200
+    image[300, 255] = 200
+    for i in range(n_frames):
+        spot_counter.newFrameToAnalyze("camera1", frame.Frame(image.ravel(), i, 512, 512, "camera1"), 100)
+
+    stats = spot_counter.getStatistics()
+    qtbot.waitUntil(lambda : (len(results) == (stats["total"] - stats["dropped"])))
+    spot_counter.cleanUp()
+    return [spot_counter.getStatistics(), results]
+
+
+def test_spot_counter_1(qtbot):
+    """
+    Test the 'drop_oldest' policy, the most recent frame is always analyzed.
+    """
+    [stats, results] = analyzeFrames(qtbot, 20, max_threads = 1, queue_policy = "drop_oldest", queue_size = 2)
+    assert(stats["total"] == 20)
+    assert(stats["n_analyzed"] + stats["dropped"] == 20)
+    assert(stats["latency_max"] >= stats["latency_mean"] > 0.0)
+    assert(results[-1].getFrameNumber() == 19)
+    for elt in results:
+        assert(elt.getCounts() == 2)
+        [x, y] = elt.getLocalizations()
+        assert([x[0], y[0]] == [100.0, 200.0])
+
+
+def test_spot_counter_2(qtbot):
+    """
+    Test the 'drop_newest' policy, the first frame is always analyzed.
+    """
+    [stats, results] = analyzeFrames(qtbot, 20, max_threads = 2, queue_policy = "drop_newest", queue_size = 2)
+    assert(stats["n_analyzed"] + stats["dropped"] == 20)
+    assert(0 in [elt.getFrameNumber() for elt in results])
+
+
+def test_spot_counter_3(qtbot):
+    """
+    Test the 'every_nth' policy.
+    """
+    [stats, results] = analyzeFrames(qtbot, 20, analyze_every = 5, max_threads = 2, queue_policy = "every_nth", queue_size = 10)
+    assert(stats["n_analyzed"] == 4)
+    assert(sorted([elt.getFrameNumber() for elt in results]) == [0, 5, 10, 15])
+
+
+def test_spot_counter_4(qtbot):
+    """
+    Test analyzing frames that are larger than max_size in tiles.
+    """
+    [stats, results] = analyzeFrames(qtbot, 5, max_size = 100000, max_threads = 4, queue_size = 10, tile_size = 256)
+    assert(stats["n_analyzed"] == 5)
+    for elt in results:
+        assert(elt.getCounts() == 2)
+        [x, y] = elt.getLocalizations()
+        assert(sorted(zip(x, y)) == [(100.0, 200.0), (255.0, 300.0)])
+
+
+def test_spot_counter_5(qtbot):
+    """
+    Test analyzing a frame that has more tiles than there are workers.
+    """
+    [stats, results] = analyzeFrames(qtbot, 1, max_size = 100000, max_threads = 4, queue_size = 10, tile_size = 128)
+    assert(stats["n_analyzed"] == 1)
+    assert(stats["dropped"] == 0)
+    assert(len(results[0].getTiles()) == 16)
+    [x, y] = results[0].getLocalizations()
+    assert(sorted(zip(x, y)) == [(100.0, 200.0), (255.0, 300.0)])
+
+
+def test_spot_counter_statistics_1(qtbot):
+    """
+    Test resetting the statistics (at the start of a film).
+    """
+    spot_counter = findSpots.SpotCounter(max_size = 300000, max_threads = 1, object_finder = "numpy")
+    results = []
+    spot_counter.imageProcessed.connect(results.append)
+
+    image = numpy.ones((512, 512), dtype = numpy.uint16)
+    spot_counter.newFrameToAnalyze("camera1", frame.Frame(image.ravel(), 0, 512, 512, "camera1"), 100)
+    qtbot.waitUntil(lambda : (len(results) == 1))
+    assert(spot_counter.getStatistics()["n_analyzed"] == 1)
+
+    spot_counter.resetStatistics()
+    stats = spot_counter.getStatistics()
+    assert([stats["n_analyzed"], stats["total"], stats["dropped"]] == [0, 0, 0])
+    assert(stats["latency_max"] == 0.0)
+    spot_counter.cleanUp()